@@ -3,43 +3,143 @@
 # File: ebs_modify_volume.py
 # ----------------------------------------------------
 import boto3
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Throttled calls are retried below, under the rate limiter, instead of by botocore
+CLIENT_CONFIG = Config(retries={'total_max_attempts': 1})
 
 # Initialize EC2 client
-ec2 = boto3.client('ec2')
+ec2 = boto3.client('ec2', config=CLIENT_CONFIG)
 
-def lambda_handler(event, context):
+# ModifyVolume calls per second and burst size allowed by the token bucket. Every concurrent
+# invocation has its own bucket, so the account-wide rate is this times the Map's MaxConcurrency.
+MODIFY_RATE = float(os.environ.get('MODIFY_RATE', '5'))
+MODIFY_BURST = int(os.environ.get('MODIFY_BURST', '10'))
+# Volumes of a batch modified at the same time
+MODIFY_WORKERS = int(os.environ.get('MODIFY_WORKERS', '8'))
+# Throttled calls are retried this often, after a jittered, exponentially growing delay
+MAX_RETRIES = int(os.environ.get('MAX_RETRIES', '5'))
+RETRY_BASE_DELAY = 0.5 # Seconds, doubled on every retry
+RETRY_MAX_DELAY = 20
+THROTTLING_ERRORS = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException')
+
+# Clients for volumes in other regions, kept between invocations of a warm Lambda
+_ec2_clients = {ec2.meta.region_name: ec2}
+
+def get_ec2_client(region):
+    """Returns the EC2 client for a region, creating it on first use."""
+    if region not in _ec2_clients:
+        _ec2_clients[region] = boto3.client('ec2', region_name=region, config=CLIENT_CONFIG)
+    return _ec2_clients[region]
+
+class TokenBucket:
+    """Allows `rate` calls per second on average and bursts of up to `capacity` calls, across threads."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def volume_result(volume, status, throttled, message):
+    """Builds the status message of one volume."""
+    return {
+        'Status': status,
+        'VolumeId': volume['VolumeId'],
+        'Region': volume.get('Region', 'N/A'),
+        'Throttled': throttled,
+        'Message': message
+    }
+
+def modify_volume(volume, bucket):
     """
-    Receives details for a single volume and modifies its type to gp3.
+    Modifies a single volume's type to gp3, retrying throttled calls.
     Returns a status message.
     """
-    # The input 'event' is a single item from the Step Functions Map state
-    volume_id = event['VolumeId']
-    
+    volume_id = volume['VolumeId']
+    region = volume.get('Region') or ec2.meta.region_name
+
     print(f"Attempting to modify Volume ID: {volume_id} to gp3.")
 
-    try:
-        # Call the modify_volume API to change the type to gp3
-        response = ec2.modify_volume(
-            VolumeId=volume_id,
-            VolumeType='gp3'
-        )
-        
+    throttled = 0
+    while True:
+        bucket.acquire()
+        try:
+            # Call the modify_volume API to change the type to gp3
+            response = get_ec2_client(region).modify_volume(
+                VolumeId=volume_id,
+                VolumeType='gp3'
+            )
+        except Exception as e:
+            error_code = e.response['Error']['Code'] if isinstance(e, ClientError) else None
+            if error_code in THROTTLING_ERRORS and throttled < MAX_RETRIES:
+                throttled += 1
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** throttled))
+                print(f"Throttled modifying {volume_id}, retrying in {delay:.1f} s ({throttled}/{MAX_RETRIES}).")
+                time.sleep(delay)
+                continue
+            error_message = str(e)
+            print(f"Error modifying volume {volume_id}: {error_message}")
+            return volume_result(volume, 'Error', throttled, f'Error converting {volume_id}: {error_message}')
+
         modification_state = response.get('VolumeModification', {}).get('ModificationState', 'unknown')
         print(f"Modification initiated for {volume_id}. State: {modification_state}")
-        
-        return {
-            'Status': 'Success',
-            'VolumeId': volume_id,
-            'Region': event.get('Region', 'N/A'),
-            'Message': f'Successfully initiated conversion of {volume_id} to gp3. Current state: {modification_state}'
-        }
-
-    except Exception as e:
-        error_message = str(e)
-        print(f"Error modifying volume {volume_id}: {error_message}")
-        return {
-            'Status': 'Error',
-            'VolumeId': volume_id,
-            'Region': event.get('Region', 'N/A'),
-            'Message': f'Error converting {volume_id}: {error_message}'
-        }
+        return volume_result(volume, 'Success', throttled,
+                             f'Successfully initiated conversion of {volume_id} to gp3. Current state: {modification_state}')
+
+def format_report(results):
+    """Formats the results of a batch as one notification message."""
+    succeeded = sum(1 for r in results if r['Status'] == 'Success')
+    lines = [f"Converted {succeeded} of {len(results)} volumes to gp3 ({len(results) - succeeded} failed).", ""]
+    lines += [f"{r['Status']}: {r['VolumeId']} ({r['Region']}) - {r['Message']}" for r in results]
+    return "\n".join(lines)
+
+def lambda_handler(event, context):
+    """
+    Receives a batch of volumes and modifies their type to gp3, several at a time
+    and at most MODIFY_RATE calls per second. Returns the result of every volume
+    and a report for the whole batch.
+
+    The batch is a list of volumes, or {'volumes': [...]}. A single volume is also
+    accepted, and gets the single-volume status message back.
+    """
+    # The input 'event' is a batch of volumes from the Step Functions Map state
+    if isinstance(event, dict) and 'VolumeId' in event:
+        return modify_volume(event, TokenBucket(MODIFY_RATE, MODIFY_BURST))
+    volumes = event.get('volumes', []) if isinstance(event, dict) else event
+
+    print(f"Modifying {len(volumes)} volumes to gp3 with up to {MODIFY_WORKERS} at a time...")
+    bucket = TokenBucket(MODIFY_RATE, MODIFY_BURST)
+    with ThreadPoolExecutor(max_workers=max(1, min(len(volumes), MODIFY_WORKERS))) as pool:
+        results = list(pool.map(lambda volume: modify_volume(volume, bucket), volumes))
+
+    succeeded = sum(1 for r in results if r['Status'] == 'Success')
+    print(f"Converted {succeeded} of {len(results)} volumes to gp3.")
+    return {
+        'Status': 'Success' if succeeded == len(results) else 'Error' if succeeded == 0 else 'Partial',
+        'Succeeded': succeeded,
+        'Failed': len(results) - succeeded,
+        'Throttled': sum(r['Throttled'] for r in results),
+        'Results': results,
+        'Report': format_report(results)
+    }
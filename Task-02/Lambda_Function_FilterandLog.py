@@ -4,58 +4,172 @@
 # ----------------------------------------------------
 import boto3
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from dynamodb_batch import batch_write_items
 
 # Initialize clients
-ec2 = boto3.client('ec2')
 dynamodb = boto3.resource('dynamodb')
 
 # Get table name from environment variable
 TABLE_NAME = os.environ.get('DYNAMODB_TABLE', 'EBSOptimizationLog')
-table = dynamodb.Table(TABLE_NAME)
 
-def lambda_handler(event, context):
-    """
-    Scans for gp2 volumes with the 'AutoConvert=true' tag,
-    logs their details to DynamoDB, and returns a list of eligible volumes.
+# Regions to scan, comma-separated, or 'all' for every region enabled in the account.
+# Defaults to the Lambda's own region.
+SCAN_REGIONS = os.environ.get('SCAN_REGIONS', os.environ.get('AWS_REGION', 'us-east-1'))
+MAX_REGION_WORKERS = int(os.environ.get('MAX_REGION_WORKERS', '8'))
+
+# Volumes are returned in batches of this many, one batch per Map iteration
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', '50'))
+# Step Functions limits a state's payload to 256 KB. Volumes beyond this budget are left
+# for the next invocation, which continues from the cursor returned in 'next_start_after'.
+MAX_PAYLOAD_BYTES = int(os.environ.get('MAX_PAYLOAD_BYTES', '200000'))
+# Volumes per describe_volumes page, 5 to 500. A page that does not fit in the payload budget
+# is requested again by the next invocation, so pages well below the budget waste fewer calls.
+DESCRIBE_PAGE_SIZE = int(os.environ.get('DESCRIBE_PAGE_SIZE', '200'))
+
+# Clients are kept between invocations of a warm Lambda
+_ec2_clients = {}
+
+class RegionScanError(Exception):
+    """Raised when a failed region scan leaves no volumes that can be returned before it."""
+
+def get_ec2_client(region):
+    """Returns the EC2 client for a region, creating it on first use."""
+    if region not in _ec2_clients:
+        _ec2_clients[region] = boto3.client('ec2', region_name=region)
+    return _ec2_clients[region]
+
+def get_regions(event):
+    """Returns the regions to scan: from the event if given, otherwise from SCAN_REGIONS."""
+    regions = event.get('regions') or [r.strip() for r in SCAN_REGIONS.split(',') if r.strip()]
+    if regions == ['all']:
+        response = get_ec2_client(os.environ.get('AWS_REGION', 'us-east-1')).describe_regions()
+        regions = [r['RegionName'] for r in response['Regions']]
+    return sorted(set(regions))
+
+def describe_page(region, next_token=None):
     """
-    print("Scanning for gp2 volumes tagged with AutoConvert=true...")
+    Returns one page of the gp2 volumes tagged with 'AutoConvert=true' in a region.
 
+    Returns:
+        tuple: (volumes of the page, NextToken of the page after it, or None after the last)
+    """
     # Define filters for the EC2 describe_volumes call
     filters = [
         {'Name': 'volume-type', 'Values': ['gp2']},
         {'Name': 'tag:AutoConvert', 'Values': ['true']}
     ]
 
-    response = ec2.describe_volumes(Filters=filters)
-    eligible_volumes = []
-
+    kwargs = {'Filters': filters, 'MaxResults': DESCRIBE_PAGE_SIZE}
+    if next_token:
+        kwargs['NextToken'] = next_token
+    response = get_ec2_client(region).describe_volumes(**kwargs)
+    volumes = []
     for volume in response['Volumes']:
-        volume_id = volume['VolumeId']
-        
-        # Prepare item details for logging
         instance_id = volume['Attachments'][0]['InstanceId'] if volume.get('Attachments') else "N/A"
-        volume_details = {
-            'VolumeId': volume_id,
+        volumes.append({
+            'VolumeId': volume['VolumeId'],
             'InstanceId': instance_id,
             'VolumeType': volume['VolumeType'],
             'Size': volume['Size'],
-            'Region': volume['AvailabilityZone'],
-            'Timestamp': datetime.utcnow().isoformat()
-        }
-        
-        # Log the volume details to the DynamoDB table
-        try:
-            table.put_item(Item=volume_details)
-            print(f"Successfully logged {volume_id} to DynamoDB.")
-            eligible_volumes.append(volume_details)
-        except Exception as e:
-            print(f"Error logging {volume_id} to DynamoDB: {str(e)}")
-
-    print(f"Found {len(eligible_volumes)} volumes to convert.")
-    
+            'Region': region,
+            'AvailabilityZone': volume['AvailabilityZone'],
+        })
+    return volumes, response.get('NextToken')
+
+def scan_pages(pool, regions, first_token=None):
+    """
+    Yields the describe_volumes pages of several regions in order, starting in the first
+    region at first_token.
+
+    The first page of the next MAX_REGION_WORKERS regions is requested ahead on the pool, so
+    that regions with few volumes are scanned at the same time; further pages of a region are
+    requested once its previous page has been taken.
+
+    Yields:
+        tuple: (region, NextToken the page was requested with, future of describe_page)
+    """
+    futures, submitted = {}, 0
+    for index, region in enumerate(regions):
+        while submitted < min(len(regions), index + MAX_REGION_WORKERS):
+            token = first_token if submitted == 0 else None
+            futures[regions[submitted]] = pool.submit(describe_page, regions[submitted], token)
+            submitted += 1
+        token, future = first_token if index == 0 else None, futures.pop(region)
+        while True:
+            yield region, token, future
+            token = future.result()[1]
+            if not token:
+                break
+            future = pool.submit(describe_page, region, token)
+
+def lambda_handler(event, context):
+    """
+    Scans for gp2 volumes with the 'AutoConvert=true' tag in every configured region,
+    logs their details to DynamoDB, and returns the eligible volumes in batches. The logged
+    records carry the 'run_id' of the event, so the tracker can read back only this execution's.
+
+    A fleet too large for one Step Functions payload is returned over several invocations:
+    pass the returned 'next_start_after' back as 'start_after' until 'has_more' is false.
+    The cursor holds a region and the describe_volumes NextToken to continue it with, so each
+    invocation only requests the pages it returns, plus at most one page that did not fit and
+    the first pages it requested ahead. The cursor never moves past a page that could not be
+    listed; if that leaves nothing to return, RegionScanError is raised so that Step Functions
+    retries the invocation.
+    """
+    event = event or {}
+    regions = get_regions(event)
+    cursor = event.get('start_after') or {}
+    first_token = None
+    if cursor:
+        # Regions before the cursor's were returned in full by earlier invocations
+        regions = [region for region in regions if region >= cursor['region']]
+        if regions and regions[0] == cursor['region']:
+            first_token = cursor.get('next_token')
+    print(f"Scanning {', '.join(regions)} for gp2 volumes tagged with AutoConvert=true...")
+
+    timestamp = datetime.utcnow().isoformat()
+    page, size, failed_regions, next_start_after = [], 0, [], None
+    with ThreadPoolExecutor(max_workers=max(1, min(len(regions), MAX_REGION_WORKERS))) as pool:
+        for region, token, future in scan_pages(pool, regions, first_token):
+            try:
+                volumes = future.result()[0]
+            except Exception as e:
+                # Returning volumes of later regions would move the cursor past this page, and its
+                # volumes would never be returned. Stop before it; the next invocation requests it again.
+                print(f"Error scanning {region}: {str(e)}")
+                failed_regions.append(region)
+                next_start_after = {'region': region, 'next_token': token}
+                break
+            for volume in volumes:
+                volume['Timestamp'] = timestamp
+            page_size = sum(len(json.dumps(volume, default=str)) + 2 for volume in volumes)
+            if page and size + page_size > MAX_PAYLOAD_BYTES:
+                # Pages cannot be split, so the next invocation requests this one again
+                next_start_after = {'region': region, 'next_token': token}
+                break
+            page.extend(volumes)
+            size += page_size
+    if failed_regions and not page:
+        raise RegionScanError(f"Could not scan {failed_regions[0]}, and no volumes before it are left to return.")
+
+    # Log the volume details to the DynamoDB table, with the execution that found them
+    run_id = event.get('run_id')
+    failed = batch_write_items(dynamodb, TABLE_NAME, [dict(volume, RunId=run_id) if run_id else volume for volume in page])
+    failed_ids = {item['VolumeId'] for item in failed}
+    for item in failed:
+        print(f"Error logging {item['VolumeId']} to DynamoDB.")
+    eligible_volumes = [volume for volume in page if volume['VolumeId'] not in failed_ids]
+    print(f"Logged {len(eligible_volumes)} of {len(page)} volumes to DynamoDB, returning them in this invocation.")
+
     # Return a structured response for Step Functions
     return {
         'statusCode': 200,
-        'volumes_to_convert': eligible_volumes
+        'volume_batches': [eligible_volumes[i:i + BATCH_SIZE] for i in range(0, len(eligible_volumes), BATCH_SIZE)],
+        'volume_count': len(eligible_volumes),
+        'failed_regions': failed_regions,
+        'has_more': next_start_after is not None,
+        'next_start_after': next_start_after
     }
@@ -0,0 +1,204 @@
+# ----------------------------------------------------
+# Lambda Function 3: EBS_TrackModifications
+# File: ebs_track_modifications.py
+# ----------------------------------------------------
+import boto3
+import os
+import re
+from datetime import datetime
+from boto3.dynamodb.conditions import Attr, Key
+from dynamodb_batch import batch_write_items
+
+# Initialize clients
+dynamodb = boto3.resource('dynamodb')
+
+# Get table name from environment variable
+TABLE_NAME = os.environ.get('DYNAMODB_TABLE', 'EBSOptimizationLog')
+table = dynamodb.Table(TABLE_NAME)
+# Global secondary index of the table on 'RunId', the execution that logged a volume
+RUN_INDEX = os.environ.get('RUN_INDEX', 'RunId-index')
+
+# Volume IDs per describe_volumes_modifications call, as values of the 'volume-id' filter
+VOLUME_ID_BATCH_SIZE = int(os.environ.get('VOLUME_ID_BATCH_SIZE', '200'))
+# Modifications per page of describe_volumes_modifications (at most 500)
+MODIFICATIONS_PAGE_SIZE = 500
+
+# Seconds to wait between polls. The wait is an estimate of how long the slowest volume
+# still needs, within these bounds, and grows when nothing has changed since the last poll.
+MIN_POLL_SECONDS = int(os.environ.get('MIN_POLL_SECONDS', '30'))
+MAX_POLL_SECONDS = int(os.environ.get('MAX_POLL_SECONDS', '900'))
+
+IN_FLIGHT_STATES = ('modifying', 'optimizing')
+FINAL_STATES = ('completed', 'failed')
+
+# Clients are kept between invocations of a warm Lambda
+_ec2_clients = {}
+
+def get_ec2_client(region):
+    """Returns the EC2 client for a region, creating it on first use."""
+    if region not in _ec2_clients:
+        _ec2_clients[region] = boto3.client('ec2', region_name=region)
+    return _ec2_clients[region]
+
+def item_region(item):
+    """Returns the region of a logged volume. Older records hold its Availability Zone instead."""
+    region = item.get('Region') or os.environ.get('AWS_REGION', 'us-east-1')
+    return re.sub(r'(\d)[a-z]+$', r'\1', region)
+
+def load_tracked_volumes(run_id=None):
+    """
+    Reads the logged volumes whose conversion has not finished yet: those without a
+    ModificationState and those still modifying or optimizing.
+
+    With a run id, only the volumes logged by that execution are read, through RUN_INDEX;
+    without one, the whole table is scanned.
+
+    Returns:
+        dict: Logged items by region.
+    """
+    condition = Attr('ModificationState').not_exists() | Attr('ModificationState').is_in(list(IN_FLIGHT_STATES))
+    by_region = {}
+    kwargs = {'FilterExpression': condition}
+    if run_id:
+        kwargs.update(IndexName=RUN_INDEX, KeyConditionExpression=Key('RunId').eq(run_id))
+    while True:
+        response = table.query(**kwargs) if run_id else table.scan(**kwargs)
+        for item in response['Items']:
+            by_region.setdefault(item_region(item), []).append(item)
+        if 'LastEvaluatedKey' not in response:
+            return by_region
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def describe_modifications(region, volume_ids):
+    """
+    Returns the latest gp3 modification of each volume, VOLUME_ID_BATCH_SIZE volumes per
+    request, following all pages. Volumes without one are left out.
+    """
+    latest = {}
+    paginator = get_ec2_client(region).get_paginator('describe_volumes_modifications')
+    for start in range(0, len(volume_ids), VOLUME_ID_BATCH_SIZE):
+        filters = [
+            {'Name': 'volume-id', 'Values': volume_ids[start:start + VOLUME_ID_BATCH_SIZE]},
+            {'Name': 'target-volume-type', 'Values': ['gp3']}
+        ]
+        for page in paginator.paginate(Filters=filters, PaginationConfig={'PageSize': MODIFICATIONS_PAGE_SIZE}):
+            for modification in page['VolumesModifications']:
+                previous = latest.get(modification['VolumeId'])
+                if previous is None or modification['StartTime'] >= previous['StartTime']:
+                    latest[modification['VolumeId']] = modification
+    return latest
+
+def next_poll_seconds(previous, progress, changed):
+    """
+    Picks the wait before the next poll.
+
+    While volumes make progress, the wait is half the estimated time until the least advanced
+    one completes, judged by its progress since the last poll. When nothing changed, the
+    previous wait is doubled.
+
+    Args:
+        previous (dict): The 'tracking' result of the last poll, or an empty dict.
+        progress (int): Progress in percent of the least advanced in-flight volume.
+        changed (bool): Whether any volume changed state or progress since the last poll.
+    """
+    last_wait = previous.get('poll_seconds') or 0
+    if not last_wait:
+        wait = MIN_POLL_SECONDS
+    elif not changed:
+        wait = last_wait * 2
+    else:
+        gained = progress - previous.get('min_progress', 0)
+        wait = (100 - progress) / gained * last_wait / 2 if gained > 0 else last_wait
+    return int(min(MAX_POLL_SECONDS, max(MIN_POLL_SECONDS, wait)))
+
+def lambda_handler(event, context):
+    """
+    Polls the progress of the gp3 conversions started for the logged volumes and records it
+    in DynamoDB: ModificationState, ModificationProgress and the start and end times.
+
+    Progress is read for many volumes per describe_volumes_modifications call, and only the
+    records that changed are written back, in batches, so a poll costs a handful of API calls
+    however large the fleet. Pass the execution's 'run_id' to track only the volumes it logged.
+
+    A volume with no modification is given one more poll, as a modification can take a moment
+    to be listed; if it still has none then, its ModifyVolume call failed, and it is marked
+    'not_started' so that later polls no longer read it.
+
+    Pass the returned result back as 'previous' and wait 'poll_seconds' before the next poll,
+    until 'done' is true.
+    """
+    event = event or {}
+    previous = event.get('previous') or {}
+    by_region = load_tracked_volumes(event.get('run_id'))
+    print(f"Tracking {sum(len(items) for items in by_region.values())} volumes in {len(by_region)} regions...")
+
+    checked_at = datetime.utcnow().isoformat()
+    updates, failed_regions = [], []
+    counts = {'modifying': 0, 'optimizing': 0, 'completed': 0, 'failed': 0, 'not_started': 0}
+    in_flight_progress = []
+    # Volumes seen without a modification for the first time
+    unconfirmed = 0
+    for region, items in sorted(by_region.items()):
+        try:
+            modifications = describe_modifications(region, [item['VolumeId'] for item in items])
+        except Exception as e:
+            print(f"Error describing modifications in {region}: {str(e)}")
+            failed_regions.append(region)
+            continue
+
+        for item in items:
+            modification = modifications.get(item['VolumeId'])
+            if modification is None:
+                counts['not_started'] += 1
+                if 'LastChecked' in item:
+                    item['ModificationState'] = 'not_started'
+                else:
+                    unconfirmed += 1
+                item['LastChecked'] = checked_at
+                updates.append(item)
+                continue
+            state = modification['ModificationState']
+            progress = int(modification.get('Progress', 0))
+            counts[state] = counts.get(state, 0) + 1
+            if state in IN_FLIGHT_STATES:
+                in_flight_progress.append(progress)
+            if item.get('ModificationState') == state and item.get('ModificationProgress') == progress:
+                continue
+            item.update({
+                'ModificationState': state,
+                'ModificationProgress': progress,
+                'ModificationStartTime': modification['StartTime'].isoformat(),
+                'LastChecked': checked_at,
+            })
+            if modification.get('EndTime') and state in FINAL_STATES:
+                item['ModificationEndTime'] = modification['EndTime'].isoformat()
+            if modification.get('StatusMessage'):
+                item['StatusMessage'] = modification['StatusMessage']
+            updates.append(item)
+
+    # Update the changed volume records in the DynamoDB table
+    failed = batch_write_items(dynamodb, TABLE_NAME, updates)
+    for item in failed:
+        print(f"Error updating {item['VolumeId']} in DynamoDB.")
+    print(f"Updated {len(updates) - len(failed)} of {len(updates)} changed volumes in DynamoDB.")
+
+    in_flight = len(in_flight_progress)
+    min_progress = min(in_flight_progress, default=100)
+    # Volumes in a region that could not be described may still be in flight
+    done = in_flight == 0 and unconfirmed == 0 and not failed_regions
+    print(f"{counts['completed']} completed and {counts['failed']} failed since the last poll, {in_flight} in flight, "
+          f"{counts['not_started']} not started.")
+
+    # Return a structured response for Step Functions
+    return {
+        'statusCode': 200,
+        'done': done,
+        'in_flight': in_flight,
+        'completed': counts['completed'],
+        'failed': counts['failed'],
+        'not_started': counts['not_started'],
+        'updated': len(updates) - len(failed),
+        'failed_regions': failed_regions,
+        'min_progress': min_progress,
+        'poll_seconds': 0 if done else next_poll_seconds(previous, min_progress, bool(updates))
+    }
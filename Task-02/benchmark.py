@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import datetime
+import contextlib
+
+import local_runner
+
+# Environment variables of the Lambdas that the benchmark can set per run
+LAMBDA_SETTINGS = {
+    'batch_size': 'BATCH_SIZE',
+    'modify_rate': 'MODIFY_RATE',
+    'modify_burst': 'MODIFY_BURST',
+    'modify_workers': 'MODIFY_WORKERS',
+    'max_retries': 'MAX_RETRIES',
+}
+
+@contextlib.contextmanager
+def lambda_environment(settings):
+    """Sets the Lambdas' environment variables from settings, and restores them afterwards."""
+    saved = {variable: os.environ.get(variable) for variable in LAMBDA_SETTINGS.values()}
+    try:
+        for key, variable in LAMBDA_SETTINGS.items():
+            if settings.get(key) is not None:
+                os.environ[variable] = str(settings[key])
+        yield
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+def run_case(settings):
+    """
+    Runs the state machine once over a freshly seeded fleet and returns what local_runner
+    measured.
+
+    Every run gets an empty moto backend, and local_runner imports the Lambda files anew, so
+    they read the environment set for this case and start as cold as a new deployment.
+    """
+    throttle = {'ec2.ModifyVolume': settings['modify_rate_limit']} if settings.get('modify_rate_limit') else None
+    # The Lambdas print a line per volume; keep the benchmark output readable
+    with open(os.devnull, 'w') as devnull, lambda_environment(settings), \
+            contextlib.redirect_stdout(sys.stdout if settings['verbose'] else devnull):
+        try:
+            result = local_runner.run_local(settings['volumes'], settings['regions'], settings['map_concurrency'],
+                                            throttle, settings['latency_ms'] / 1000)
+        except Exception as e:
+            return {'error': str(e)}
+    result['volumes_per_s'] = result['converted'] / result['seconds'] if result['seconds'] else 0
+    result['calls_per_volume'] = result['total_calls'] / result['eligible'] if result['eligible'] else 0
+    return result
+
+def compare_results(results, baseline, threshold=None):
+    """
+    Prints the change in AWS API calls and end-to-end latency of every case that also appears
+    in a baseline result file.
+
+    Calls are what the workflow costs and what EC2 throttles, and unlike latency against moto
+    they do not depend on the machine, so regressions are judged by them.
+
+    Args:
+        results (list): Results of the current run.
+        baseline (dict): A result file written by an earlier run.
+        threshold (float or None): Growth of the API calls in percent above which a case counts as a regression.
+
+    Returns:
+        list: The cases whose API calls grew by more than threshold.
+    """
+    previous = {r['case']: r for r in baseline['results'] if 'total_calls' in r}
+    regressions = []
+    print(f"\nCompared with the run from {baseline['date']}:")
+    for result in results:
+        before = previous.get(result['case'])
+        if before and 'total_calls' in result:
+            change = (result['total_calls'] - before['total_calls']) / before['total_calls'] * 100
+            regressed = threshold is not None and change > threshold
+            print(f"  {result['case']:<24} API calls {before['total_calls']} -> {result['total_calls']} ({change:+.1f}%), "
+                  f"throttled {before['total_throttled']} -> {result['total_throttled']}, "
+                  f"{before['seconds']:.2f} s -> {result['seconds']:.2f} s{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(result['case'])
+    return regressions
+
+def format_result(result):
+    """Formats one result for the console: latency, then the workflow's invocations and API calls."""
+    if 'seconds' not in result:
+        return f"{result['case']:<24} FAILED: {result['error']}"
+    lines = [f"{result['case']:<24} {result['seconds']:8.2f} s  {result['volumes_per_s']:7.1f} volumes/s  "
+             f"converted {result['converted']}/{result['eligible']}  {result['calls_per_volume']:.2f} API calls/volume"]
+    invocations = sum(result['lambda_invocations'].values())
+    lines.append(f"    {invocations} Lambda invocations, {result['state_transitions']} state transitions, "
+                 f"{result['sns_reports']} SNS reports, {result['waited_seconds']} s of tracking waits, "
+                 f"{result['total_calls']} API calls, {result['total_throttled']} throttled")
+    lines.append("    " + ", ".join(f"{name} {count}" + (f" ({result['throttled'][name]} throttled)" if name in result['throttled'] else "")
+                                    for name, count in result['calls'].items()))
+    if result.get('error'):
+        lines.append(f"    workflow failed: {result['error']}")
+    return "\n".join(lines)
+
+def main():
+    """
+    Runs the gp2-to-gp3 workflow end to end on local fleets of increasing size, and reports
+    latency, AWS API calls and throttling for each.
+    """
+    parser = argparse.ArgumentParser(description="Load benchmark for the EBS gp2-to-gp3 state machine, run locally against moto.")
+    parser.add_argument("--volumes", type=int, nargs='+', default=[10, 100, 1000], help="Fleet sizes, e.g. 10 up to 10000.")
+    parser.add_argument("--regions", nargs='+', default=['us-east-1', 'us-west-2'], help="Regions to spread each fleet over.")
+    parser.add_argument("--map-concurrency", type=int, nargs='+', default=[None], help="MaxConcurrency values of the Map state to compare (default: the definition's).")
+    parser.add_argument("--modify-rate-limit", type=float, help="Simulated ModifyVolume requests per second before EC2 throttles.")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated latency added to every AWS API call.")
+    parser.add_argument("--batch-size", type=int, help="BATCH_SIZE of the FilterAndLog Lambda.")
+    parser.add_argument("--modify-rate", type=float, help="MODIFY_RATE of the ModifyVolume Lambda.")
+    parser.add_argument("--modify-burst", type=int, help="MODIFY_BURST of the ModifyVolume Lambda.")
+    parser.add_argument("--modify-workers", type=int, help="MODIFY_WORKERS of the ModifyVolume Lambda.")
+    parser.add_argument("--max-retries", type=int, help="MAX_RETRIES of the ModifyVolume Lambda.")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the Lambdas.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A results file from an earlier run to compare against.")
+    parser.add_argument("--fail-above", type=float, metavar="PERCENT", help="With --compare, exit with status 1 if a case made more than this many percent more API calls.")
+    args = parser.parse_args()
+
+    print(f"Running on Python {platform.python_version()}\n")
+    results = []
+    for volumes in args.volumes:
+        for concurrency in args.map_concurrency:
+            case = f"{volumes}/map-{'default' if concurrency is None else concurrency}"
+            result = run_case(dict(vars(args), volumes=volumes, map_concurrency=concurrency))
+            result['case'] = case
+            results.append(result)
+            print(format_result(result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'date': datetime.datetime.now().isoformat(), 'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to '{args.output}'.")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(results, json.load(f), args.fail_above)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) made more than {args.fail_above:g}% more API calls.")
+            sys.exit(1)
+    if any(r.get('error') or r.get('converted') != r.get('eligible') for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# ----------------------------------------------------
+# Shared helper: DynamoDB batch writes
+# File: dynamodb_batch.py
+# ----------------------------------------------------
+# Used by EBS_FilterAndLog and EBS_TrackModifications; include this file in the
+# deployment package of both functions.
+import os
+import time
+import random
+from botocore.exceptions import ClientError
+
+# BatchWriteItem takes at most 25 items; unprocessed ones are retried with jittered backoff
+DYNAMODB_BATCH_SIZE = 25
+BATCH_WRITE_RETRIES = int(os.environ.get('BATCH_WRITE_RETRIES', '5'))
+RETRY_BASE_DELAY = 0.1 # Seconds, doubled on every retry
+RETRY_MAX_DELAY = 5
+THROTTLING_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+def batch_write_items(dynamodb, table_name, items):
+    """
+    Writes items to a DynamoDB table with BatchWriteItem, 25 at a time.
+
+    Items DynamoDB leaves unprocessed, or rejects with a throttling error, are sent again
+    after an exponentially growing, jittered delay.
+
+    Args:
+        dynamodb: The boto3 DynamoDB service resource to write with.
+        table_name (str): Name of the table.
+        items (list): The items to put.
+
+    Returns:
+        list: The items that could not be written.
+    """
+    failed = []
+    for start in range(0, len(items), DYNAMODB_BATCH_SIZE):
+        requests = [{'PutRequest': {'Item': item}} for item in items[start:start + DYNAMODB_BATCH_SIZE]]
+        for attempt in range(BATCH_WRITE_RETRIES + 1):
+            try:
+                response = dynamodb.batch_write_item(RequestItems={table_name: requests})
+                requests = response.get('UnprocessedItems', {}).get(table_name, [])
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLING_ERRORS:
+                    print(f"Error writing {len(requests)} items to {table_name}: {str(e)}")
+                    break
+            if not requests or attempt == BATCH_WRITE_RETRIES:
+                break
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+        failed.extend(request['PutRequest']['Item'] for request in requests)
+    return failed
@@ -0,0 +1,479 @@
+# ----------------------------------------------------
+# Local runner for the EBS gp2-to-gp3 workflow
+# File: local_runner.py
+# ----------------------------------------------------
+# Interprets StateMachine_JSONPathCode.json in-process: Task states call the two
+# lambda_handler functions directly and SNS through boto3, so the whole workflow runs
+# against moto instead of AWS. Every AWS API call is counted, and service-side
+# throttling can be simulated, to see how the workflow behaves with fleet size.
+import boto3
+import os
+import re
+import sys
+import copy
+import json
+import time
+import uuid
+import argparse
+import threading
+import importlib.util
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from botocore.awsrequest import AWSResponse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFINITION_FILE = os.path.join(BASE_DIR, 'StateMachine_JSONPathCode.json')
+FILTER_FUNCTION = 'PASTE_YOUR_EBS_FilterAndLog_LAMBDA_ARN_HERE'
+MODIFY_FUNCTION = 'PASTE_YOUR_EBS_ModifyVolume_LAMBDA_ARN_HERE'
+TRACK_FUNCTION = 'PASTE_YOUR_EBS_TrackModifications_LAMBDA_ARN_HERE'
+TOPIC_PLACEHOLDER = 'PASTE_YOUR_SNS_TOPIC_ARN_HERE'
+TABLE_NAME = 'EBSOptimizationLog'
+# The tracker reads back an execution's volumes through this index on 'RunId'
+RUN_INDEX = 'RunId-index'
+
+# Step Functions rejects state input or output larger than this
+MAX_PAYLOAD_BYTES = 256 * 1024
+# Concurrency of a Map state whose MaxConcurrency is 0 (unlimited)
+DEFAULT_MAP_CONCURRENCY = 40
+THROTTLING_ERRORS = ('RequestLimitExceeded', 'Throttling', 'ThrottlingException')
+
+class StatesError(Exception):
+    """A Step Functions runtime error, such as 'States.TaskFailed', with its cause."""
+
+    def __init__(self, error, cause=''):
+        super().__init__(f"{error}: {cause}")
+        self.error = error
+        self.cause = cause
+
+# --- API Call Recording ---
+class ApiRecorder:
+    """
+    Counts the AWS API calls made through a boto3 session, and can make selected
+    operations slower or throttle them the way the real service would.
+
+    Args:
+        throttle (dict): Requests per second allowed for 'service.Operation' names, e.g.
+            {'ec2.ModifyVolume': 5}. Calls above the rate fail with RequestLimitExceeded.
+        latency (float): Seconds added to every call, to stand in for network round trips.
+    """
+
+    def __init__(self, throttle=None, latency=0.0):
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.latency = latency
+        self.lock = threading.Lock()
+        # One token bucket per throttled operation, with a burst of one second's worth
+        self.buckets = {name: [rate, rate, time.monotonic()] for name, rate in (throttle or {}).items()}
+
+    def install(self, session=None):
+        """Hooks into a boto3 session; clients created from it afterwards are recorded."""
+        session = session or boto3._get_default_session()
+        session.events.register('before-call', self._before_call)
+        session.events.register('after-call', self._after_call)
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.throttled.clear()
+
+    def _name(self, model):
+        return f"{model.service_model.endpoint_prefix}.{model.name}"
+
+    def _take_token(self, name):
+        with self.lock:
+            bucket = self.buckets.get(name)
+            if bucket is None:
+                return True
+            rate, tokens, updated = bucket
+            now = time.monotonic()
+            tokens = min(rate, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            bucket[1:] = [tokens - 1 if allowed else tokens, now]
+            return allowed
+
+    def _before_call(self, model, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self._take_token(self._name(model)):
+            error = {'Error': {'Code': 'RequestLimitExceeded', 'Message': 'Request limit exceeded (simulated).'},
+                     'ResponseMetadata': {'HTTPStatusCode': 503}}
+            return AWSResponse(None, 503, {}, None), error
+        return None
+
+    def _after_call(self, model, http_response, parsed, **kwargs):
+        name = self._name(model)
+        with self.lock:
+            self.calls[name] += 1
+            if parsed.get('Error', {}).get('Code') in THROTTLING_ERRORS:
+                self.throttled[name] += 1
+
+    def summary(self):
+        """Returns the call and throttling counts per operation."""
+        with self.lock:
+            return {'calls': dict(sorted(self.calls.items())), 'throttled': dict(sorted(self.throttled.items())),
+                    'total_calls': sum(self.calls.values()), 'total_throttled': sum(self.throttled.values())}
+
+# --- JSONPath ---
+_PATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(\d+)\]")
+
+def _path_tokens(path):
+    tokens, position = [], 0
+    while position < len(path):
+        match = _PATH_TOKEN.match(path, position)
+        if not match:
+            raise StatesError('States.Runtime', f"Unsupported path '{path}'")
+        tokens.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        position = match.end()
+    return tokens
+
+def get_path(data, path, context=None):
+    """Returns the value a reference path like '$.a.b[0]' or '$$.Map.Item.Value' points to."""
+    if path.startswith('$$'):
+        data, path = context or {}, path[1:]
+    if not path.startswith('$'):
+        raise StatesError('States.Runtime', f"Invalid path '{path}'")
+    value = data
+    for token in _path_tokens(path[1:]):
+        try:
+            value = value[token]
+        except (KeyError, IndexError, TypeError):
+            raise StatesError('States.Runtime', f"Path '{path}' does not match the input")
+    return value
+
+def set_path(data, path, value):
+    """Returns data with value placed at a ResultPath; '$' replaces it, None discards value."""
+    if path is None:
+        return data
+    if path == '$':
+        return value
+    data = copy.deepcopy(data)
+    target = data
+    tokens = _path_tokens(path[1:])
+    for token in tokens[:-1]:
+        if isinstance(target, dict):
+            target = target.setdefault(token, {})
+        else:
+            target = target[token]
+    if not isinstance(target, dict):
+        raise StatesError('States.Runtime', f"ResultPath '{path}' cannot be applied to the input")
+    target[tokens[-1]] = value
+    return data
+
+def resolve_template(template, data, context):
+    """Fills in a Parameters, ItemSelector or ResultSelector template: 'key.$' fields take a path's value."""
+    if isinstance(template, dict):
+        resolved = {}
+        for key, value in template.items():
+            if key.endswith('.$'):
+                if value.startswith('States.'):
+                    raise StatesError('States.Runtime', f"Intrinsic functions are not supported locally: {value}")
+                resolved[key[:-2]] = get_path(data, value, context)
+            else:
+                resolved[key] = resolve_template(value, data, context)
+        return resolved
+    if isinstance(template, list):
+        return [resolve_template(value, data, context) for value in template]
+    return template
+
+# --- Interpreter ---
+class LocalStateMachine:
+    """
+    Runs an Amazon States Language definition in-process.
+
+    Supports the Pass, Task, Map, Choice, Wait, Succeed and Fail states with the JSONPath
+    fields InputPath, Parameters, ItemSelector, ResultSelector, ResultPath and OutputPath.
+    Tasks can be 'lambda:invoke', which calls the function registered under its
+    FunctionName, and 'sns:publish'. Task Retry rules are honored.
+
+    Args:
+        definition (dict): The state machine definition.
+        functions (dict): Python callables (event, context) by FunctionName.
+        map_concurrency (int or None): Overrides the MaxConcurrency of every Map state.
+        retry_time_scale (float): Multiplier for Retry intervals; 0 retries without waiting.
+        wait_time_scale (float): Multiplier for the time of Wait states; 0 skips them.
+    """
+
+    def __init__(self, definition, functions, map_concurrency=None, retry_time_scale=0.0, wait_time_scale=0.0):
+        self.definition = definition
+        self.functions = functions
+        self.map_concurrency = map_concurrency
+        self.retry_time_scale = retry_time_scale
+        self.wait_time_scale = wait_time_scale
+        self.waited_seconds = 0
+        self.lambda_invocations = Counter()
+        self.transitions = 0
+        self.lock = threading.Lock()
+        self._sns = None
+
+    def run(self, execution_input, name=None):
+        """Runs the state machine to the end and returns its output."""
+        context = {'Execution': {'Input': execution_input, 'Name': name or f"local-{uuid.uuid4()}"}}
+        return self._run_states(self.definition, execution_input, context)
+
+    def _run_states(self, machine, data, context):
+        name = machine['StartAt']
+        while True:
+            state = machine['States'][name]
+            with self.lock:
+                self.transitions += 1
+            data, name = self._run_state(state, data, context)
+            size = len(json.dumps(data))
+            if size > MAX_PAYLOAD_BYTES:
+                raise StatesError('States.DataLimitExceeded', f"Output of a state is {size} bytes")
+            if name is None:
+                return data
+
+    def _run_state(self, state, data, context):
+        kind = state['Type']
+        if kind == 'Choice':
+            return data, self._choose(state, data)
+        if kind == 'Succeed':
+            return data, None
+        if kind == 'Wait':
+            seconds = state['Seconds'] if 'Seconds' in state else get_path(data, state['SecondsPath'], context)
+            with self.lock:
+                self.waited_seconds += seconds
+            time.sleep(seconds * self.wait_time_scale)
+            return data, state['Next']
+        if kind == 'Fail':
+            raise StatesError(state.get('Error', 'States.Fail'), state.get('Cause', ''))
+
+        effective = get_path(data, state.get('InputPath', '$'), context)
+        if 'Parameters' in state:
+            effective = resolve_template(state['Parameters'], effective, context)
+        if kind == 'Pass':
+            result = state.get('Result', effective)
+        elif kind == 'Task':
+            result = self._task(state, effective)
+        elif kind == 'Map':
+            result = self._map(state, effective, context)
+        else:
+            raise StatesError('States.Runtime', f"Unsupported state type '{kind}'")
+
+        if 'ResultSelector' in state:
+            result = resolve_template(state['ResultSelector'], result, context)
+        output = set_path(data, state.get('ResultPath', '$'), result)
+        output = get_path(output, state.get('OutputPath', '$'), context)
+        return output, None if state.get('End') else state['Next']
+
+    def _task(self, state, parameters):
+        attempts = Counter()
+        while True:
+            try:
+                return self._invoke(state['Resource'], parameters)
+            except StatesError as e:
+                retrier = next((r for r in state.get('Retry', []) if e.error in r['ErrorEquals']
+                                or 'States.ALL' in r['ErrorEquals']), None)
+                if retrier is None or attempts[id(retrier)] >= retrier.get('MaxAttempts', 3):
+                    raise
+                delay = retrier.get('IntervalSeconds', 1) * retrier.get('BackoffRate', 2.0) ** attempts[id(retrier)]
+                attempts[id(retrier)] += 1
+                time.sleep(delay * self.retry_time_scale)
+
+    def _invoke(self, resource, parameters):
+        if resource == 'arn:aws:states:::lambda:invoke':
+            function_name = parameters['FunctionName']
+            if function_name not in self.functions:
+                raise StatesError('Lambda.ResourceNotFoundException', f"No local function for '{function_name}'")
+            with self.lock:
+                self.lambda_invocations[function_name] += 1
+            # Payloads cross a JSON boundary, as they would between Step Functions and Lambda
+            payload = json.loads(json.dumps(parameters.get('Payload', {})))
+            try:
+                result = self.functions[function_name](payload, None)
+            except Exception as e:
+                raise StatesError(type(e).__name__, str(e))
+            return {'StatusCode': 200, 'Payload': json.loads(json.dumps(result))}
+        if resource == 'arn:aws:states:::sns:publish':
+            if self._sns is None:
+                self._sns = boto3.client('sns')
+            try:
+                return self._sns.publish(**parameters)
+            except Exception as e:
+                raise StatesError('SNS.' + type(e).__name__, str(e))
+        raise StatesError('States.Runtime', f"Unsupported resource '{resource}'")
+
+    def _map(self, state, data, context):
+        items = get_path(data, state.get('ItemsPath', '$'), context)
+        processor = state.get('ItemProcessor') or state['Iterator']
+        concurrency = self.map_concurrency if self.map_concurrency is not None else state.get('MaxConcurrency', 0)
+
+        def run_item(index):
+            item_context = dict(context, Map={'Item': {'Index': index, 'Value': items[index]}})
+            item = resolve_template(state['ItemSelector'], data, item_context) if 'ItemSelector' in state else items[index]
+            return self._run_states(processor, item, item_context)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(items), concurrency or DEFAULT_MAP_CONCURRENCY))) as pool:
+            return list(pool.map(run_item, range(len(items))))
+
+    def _choose(self, state, data):
+        for rule in state['Choices']:
+            if self._matches(rule, data):
+                return rule['Next']
+        if 'Default' not in state:
+            raise StatesError('States.NoChoiceMatched', 'No Choices rule matched')
+        return state['Default']
+
+    def _matches(self, rule, data):
+        if 'And' in rule:
+            return all(self._matches(r, data) for r in rule['And'])
+        if 'Or' in rule:
+            return any(self._matches(r, data) for r in rule['Or'])
+        if 'Not' in rule:
+            return not self._matches(rule['Not'], data)
+        try:
+            value = get_path(data, rule['Variable'])
+        except StatesError:
+            return rule.get('IsPresent') is False
+        comparisons = {
+            'IsPresent': lambda expected: expected,
+            'IsNull': lambda expected: (value is None) == expected,
+            'BooleanEquals': lambda expected: value is expected,
+            'StringEquals': lambda expected: value == expected,
+            'NumericEquals': lambda expected: value == expected,
+            'NumericGreaterThan': lambda expected: value > expected,
+            'NumericLessThan': lambda expected: value < expected,
+        }
+        for operator, compare in comparisons.items():
+            if operator in rule:
+                return compare(rule[operator])
+        raise StatesError('States.Runtime', f"Unsupported Choice rule {rule}")
+
+# --- Local Environment ---
+def load_handler(file_name):
+    """Imports one of the Lambda files and returns its lambda_handler."""
+    # The Lambda files import their shared helpers, which are packaged next to them
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    module_name = os.path.splitext(file_name)[0]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(BASE_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.lambda_handler
+
+def seed_fleet(volume_count, regions, untagged_share=0.1):
+    """
+    Creates gp2 volumes spread over regions, most of them tagged 'AutoConvert=true',
+    plus the DynamoDB log table with its RunId index and an SNS topic with an SQS subscriber.
+
+    Returns:
+        dict: 'topic_arn', 'queue_url' and 'eligible', the number of tagged volumes.
+    """
+    dynamodb = boto3.client('dynamodb')
+    dynamodb.create_table(TableName=os.environ.get('DYNAMODB_TABLE', TABLE_NAME),
+                          KeySchema=[{'AttributeName': 'VolumeId', 'KeyType': 'HASH'}],
+                          AttributeDefinitions=[{'AttributeName': 'VolumeId', 'AttributeType': 'S'},
+                                                {'AttributeName': 'RunId', 'AttributeType': 'S'}],
+                          GlobalSecondaryIndexes=[{'IndexName': RUN_INDEX,
+                                                   'KeySchema': [{'AttributeName': 'RunId', 'KeyType': 'HASH'}],
+                                                   'Projection': {'ProjectionType': 'ALL'}}],
+                          BillingMode='PAY_PER_REQUEST')
+    topic_arn = boto3.client('sns').create_topic(Name='ebs-optimization-report')['TopicArn']
+    sqs = boto3.client('sqs')
+    queue_url = sqs.create_queue(QueueName='ebs-optimization-report')['QueueUrl']
+    queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+    boto3.client('sns').subscribe(TopicArn=topic_arn, Protocol='sqs', Endpoint=queue_arn)
+
+    eligible = 0
+    untagged_every = round(1 / untagged_share) if untagged_share else 0
+    for i in range(volume_count):
+        region = regions[i % len(regions)]
+        tagged = not untagged_every or i % untagged_every != untagged_every - 1
+        eligible += tagged
+        boto3.client('ec2', region_name=region).create_volume(
+            AvailabilityZone=f"{region}a", Size=8 + i % 100, VolumeType='gp2',
+            TagSpecifications=[{'ResourceType': 'volume', 'Tags': [{'Key': 'AutoConvert', 'Value': 'true' if tagged else 'false'}]}])
+    return {'topic_arn': topic_arn, 'queue_url': queue_url, 'eligible': eligible}
+
+def build_state_machine(topic_arn, map_concurrency=None, definition_file=DEFINITION_FILE):
+    """Loads the definition with the placeholders filled in and the two Lambda handlers attached."""
+    with open(definition_file, 'r') as f:
+        definition = json.loads(f.read().replace(TOPIC_PLACEHOLDER, topic_arn))
+    functions = {
+        FILTER_FUNCTION: load_handler('Lambda_Function_FilterandLog.py'),
+        MODIFY_FUNCTION: load_handler('Lambda_Function_EBS_ModifyVolume.py'),
+        TRACK_FUNCTION: load_handler('Lambda_Function_TrackModifications.py'),
+    }
+    return LocalStateMachine(definition, functions, map_concurrency)
+
+def count_converted(regions):
+    """Returns the number of gp3 volumes in the given regions."""
+    count = 0
+    for region in regions:
+        paginator = boto3.client('ec2', region_name=region).get_paginator('describe_volumes')
+        for page in paginator.paginate(Filters=[{'Name': 'volume-type', 'Values': ['gp3']}]):
+            count += len(page['Volumes'])
+    return count
+
+def run_local(volume_count, regions, map_concurrency=None, throttle=None, latency=0.0):
+    """
+    Seeds a fleet in moto and runs the whole workflow against it.
+
+    Environment variables of the Lambdas (SCAN_REGIONS, BATCH_SIZE, MODIFY_RATE, ...) are read
+    when they are imported, which happens here, after the fleet has been seeded.
+
+    Returns:
+        dict: End-to-end seconds, volumes seeded and converted, Lambda invocations, state
+            transitions, seconds the tracker would have waited, SNS reports and the API call
+            and throttling counts.
+    """
+    from moto import mock_aws
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    os.environ.setdefault('AWS_DEFAULT_REGION', regions[0])
+    os.environ.setdefault('AWS_REGION', os.environ['AWS_DEFAULT_REGION'])
+    os.environ['SCAN_REGIONS'] = ','.join(regions)
+
+    with mock_aws():
+        boto3.setup_default_session()
+        fleet = seed_fleet(volume_count, regions)
+        recorder = ApiRecorder(throttle, latency)
+        recorder.install()
+        machine = build_state_machine(fleet['topic_arn'], map_concurrency)
+
+        start = time.perf_counter()
+        error, output = None, {}
+        try:
+            output = machine.run({})
+        except StatesError as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        api = recorder.summary()
+
+        converted = count_converted(regions)
+        sqs = boto3.client('sqs')
+        reports = int(sqs.get_queue_attributes(QueueUrl=fleet['queue_url'], AttributeNames=['ApproximateNumberOfMessages'])
+                      ['Attributes']['ApproximateNumberOfMessages'])
+
+    return {
+        'seconds': elapsed,
+        'volumes': volume_count,
+        'eligible': fleet['eligible'],
+        'converted': converted,
+        'error': error,
+        'lambda_invocations': dict(machine.lambda_invocations),
+        'state_transitions': machine.transitions,
+        'tracking': output.get('tracking'),
+        'waited_seconds': machine.waited_seconds,
+        'sns_reports': reports,
+        **api,
+    }
+
+def main():
+    """Runs the workflow once against a seeded local fleet and prints what happened."""
+    parser = argparse.ArgumentParser(description="Runs the EBS gp2-to-gp3 state machine locally against moto.")
+    parser.add_argument("--volumes", type=int, default=100, help="Number of gp2 volumes to seed.")
+    parser.add_argument("--regions", nargs='+', default=['us-east-1'], help="Regions to spread the volumes over.")
+    parser.add_argument("--map-concurrency", type=int, help="Overrides MaxConcurrency of the Map state (0 for unlimited).")
+    parser.add_argument("--modify-rate-limit", type=float, help="Simulated ModifyVolume requests per second before EC2 throttles.")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated latency added to every AWS API call.")
+    args = parser.parse_args()
+
+    throttle = {'ec2.ModifyVolume': args.modify_rate_limit} if args.modify_rate_limit else None
+    result = run_local(args.volumes, args.regions, args.map_concurrency, throttle, args.latency_ms / 1000)
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result['error'] or result['converted'] != result['eligible'] else 0)
+
+if __name__ == "__main__":
+    main()
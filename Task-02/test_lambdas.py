@@ -0,0 +1,241 @@
+import os
+import math
+import unittest
+from unittest import mock
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import boto3
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+import local_runner
+import dynamodb_batch
+import Lambda_Function_FilterandLog as filter_and_log
+import Lambda_Function_TrackModifications as track_modifications
+
+REGIONS = ['eu-west-1', 'us-east-1']
+
+class PagedEC2:
+    """
+    Wraps a moto EC2 client so that describe_volumes honors MaxResults and NextToken the way
+    EC2 does, and records the pages that were requested.
+    """
+
+    def __init__(self, region, requests, failing=()):
+        self.region = region
+        self.client = boto3.client('ec2', region_name=region)
+        self.requests = requests
+        self.failing = failing
+
+    def describe_volumes(self, MaxResults, NextToken=None, **kwargs):
+        self.requests.append((self.region, NextToken))
+        if self.region in self.failing:
+            raise ClientError({'Error': {'Code': 'RequestLimitExceeded', 'Message': 'Slow down'}}, 'DescribeVolumes')
+        volumes = sorted(self.client.describe_volumes(**kwargs)['Volumes'], key=lambda v: v['VolumeId'])
+        start = int(NextToken or 0)
+        response = {'Volumes': volumes[start:start + MaxResults]}
+        if start + MaxResults < len(volumes):
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+class WorkflowTestCase(unittest.TestCase):
+    """Runs the Lambda handlers against moto's EC2 and DynamoDB."""
+
+    def setUp(self):
+        self.aws = mock_aws()
+        self.aws.start()
+        self.addCleanup(self.aws.stop)
+        boto3.setup_default_session()
+        self.fleet = local_runner.seed_fleet(40, REGIONS)
+        self.table = boto3.resource('dynamodb').Table(local_runner.TABLE_NAME)
+
+    def eligible_volumes(self, regions=REGIONS):
+        """Returns the IDs of every gp2 volume tagged with 'AutoConvert=true' in the regions."""
+        filters = [{'Name': 'volume-type', 'Values': ['gp2']}, {'Name': 'tag:AutoConvert', 'Values': ['true']}]
+        return {volume['VolumeId'] for region in regions
+                for volume in boto3.client('ec2', region_name=region).describe_volumes(Filters=filters)['Volumes']}
+
+class FilterAndLogTest(WorkflowTestCase):
+    """Large fleets are returned over several invocations that continue from a NextToken cursor."""
+
+    def setUp(self):
+        super().setUp()
+        self.requests, self.failing = [], set()
+        patcher = mock.patch.multiple(
+            filter_and_log, dynamodb=boto3.resource('dynamodb'), SCAN_REGIONS=','.join(REGIONS),
+            DESCRIBE_PAGE_SIZE=5, MAX_PAYLOAD_BYTES=2500,
+            get_ec2_client=lambda region: PagedEC2(region, self.requests, self.failing))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scan(self, cursor=None):
+        return filter_and_log.lambda_handler({'start_after': cursor}, None)
+
+    def scan_all(self):
+        """Invokes the handler until has_more is false and returns every response."""
+        responses = [self.scan()]
+        while responses[-1]['has_more']:
+            responses.append(self.scan(responses[-1]['next_start_after']))
+        return responses
+
+    def test_every_volume_is_returned_once(self):
+        responses = self.scan_all()
+        returned = [volume['VolumeId'] for response in responses
+                    for batch in response['volume_batches'] for volume in batch]
+        self.assertEqual(len(returned), len(set(returned)))
+        self.assertEqual(set(returned), self.eligible_volumes())
+        self.assertEqual(len(returned), self.fleet['eligible'])
+        self.assertGreater(len(responses), 2)
+        logged = {item['VolumeId'] for item in self.table.scan()['Items']}
+        self.assertEqual(logged, set(returned))
+
+    def test_cursor_carries_the_next_token(self):
+        first = self.scan()
+        self.assertEqual(first['volume_count'], 10)
+        self.assertEqual(first['next_start_after'], {'region': 'eu-west-1', 'next_token': '10'})
+
+        self.requests.clear()
+        second = self.scan(first['next_start_after'])
+        self.assertEqual(self.requests[0], ('eu-west-1', '10'))
+        self.assertNotIn(('eu-west-1', None), self.requests)
+        returned = {volume['VolumeId'] for batch in first['volume_batches'] + second['volume_batches'] for volume in batch}
+        self.assertEqual(len(returned), first['volume_count'] + second['volume_count'])
+
+    def test_pages_are_requested_about_once(self):
+        responses = self.scan_all()
+        pages = sum(math.ceil(len(self.eligible_volumes([region])) / 5) for region in REGIONS)
+        # Each invocation may request again one page that did not fit, and first pages ahead
+        self.assertLessEqual(len(self.requests), pages + len(responses) * len(REGIONS))
+
+    def test_cursor_stops_before_a_failed_region(self):
+        self.failing.add('us-east-1')
+        responses = [self.scan()]
+        while responses[-1]['has_more'] and responses[-1]['next_start_after']['region'] == 'eu-west-1':
+            responses.append(self.scan(responses[-1]['next_start_after']))
+        self.assertEqual(responses[-1]['failed_regions'], ['us-east-1'])
+        self.assertEqual(responses[-1]['next_start_after'], {'region': 'us-east-1', 'next_token': None})
+
+        with self.assertRaises(filter_and_log.RegionScanError):
+            self.scan(responses[-1]['next_start_after'])
+
+        self.failing.clear()
+        returned = self.scan(responses[-1]['next_start_after'])
+        self.assertTrue(all(volume['Region'] == 'us-east-1' for batch in returned['volume_batches'] for volume in batch))
+        self.assertGreater(returned['volume_count'], 0)
+
+class TrackModificationsTest(WorkflowTestCase):
+    """The tracker records the progress of the volumes its execution logged, and retires those never started."""
+
+    def setUp(self):
+        super().setUp()
+        dynamodb = boto3.resource('dynamodb')
+        patchers = [
+            mock.patch.multiple(filter_and_log, dynamodb=dynamodb, SCAN_REGIONS=','.join(REGIONS)),
+            mock.patch.multiple(track_modifications, dynamodb=dynamodb, table=dynamodb.Table(local_runner.TABLE_NAME)),
+            mock.patch.dict(track_modifications._ec2_clients, clear=True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        response = filter_and_log.lambda_handler({'run_id': 'run-1'}, None)
+        self.volumes = [volume for batch in response['volume_batches'] for volume in batch]
+
+    def modify(self, volumes):
+        for volume in volumes:
+            boto3.client('ec2', region_name=volume['Region']).modify_volume(VolumeId=volume['VolumeId'], VolumeType='gp3')
+
+    def track(self, previous=None):
+        return track_modifications.lambda_handler({'previous': previous, 'run_id': 'run-1'}, None)
+
+    def item(self, volume_id):
+        return self.table.get_item(Key={'VolumeId': volume_id})['Item']
+
+    def test_only_this_runs_volumes_are_tracked(self):
+        self.table.put_item(Item={'VolumeId': 'vol-other', 'Region': 'us-east-1', 'RunId': 'run-0'})
+        self.modify(self.volumes)
+
+        result = self.track()
+        self.assertTrue(result['done'])
+        self.assertEqual(result['completed'], len(self.volumes))
+        self.assertEqual(result['not_started'], 0)
+        self.assertEqual(result['updated'], len(self.volumes))
+        for volume in self.volumes:
+            item = self.item(volume['VolumeId'])
+            self.assertEqual((item['ModificationState'], item['ModificationProgress']), ('completed', 100))
+            self.assertIn('ModificationEndTime', item)
+        self.assertNotIn('ModificationState', self.item('vol-other'))
+
+        # Finished volumes leave the tracked set
+        self.assertEqual(self.track(result)['updated'], 0)
+
+    def test_volumes_never_started_are_retired(self):
+        started, never_started = self.volumes[2:], self.volumes[:2]
+        self.modify(started)
+
+        first = self.track()
+        self.assertFalse(first['done'])
+        self.assertEqual(first['not_started'], 2)
+        self.assertEqual(first['poll_seconds'], track_modifications.MIN_POLL_SECONDS)
+        self.assertNotIn('ModificationState', self.item(never_started[0]['VolumeId']))
+
+        second = self.track(first)
+        self.assertTrue(second['done'])
+        for volume in never_started:
+            self.assertEqual(self.item(volume['VolumeId'])['ModificationState'], 'not_started')
+
+        third = self.track(second)
+        self.assertEqual((third['not_started'], third['updated']), (0, 0))
+
+    def test_in_flight_progress_is_recorded_once(self):
+        self.modify(self.volumes)
+        describe = track_modifications.describe_modifications
+
+        def optimizing(region, volume_ids):
+            modifications = describe(region, volume_ids)
+            for modification in modifications.values():
+                modification.update(ModificationState='optimizing', Progress=40)
+            return modifications
+
+        with mock.patch.object(track_modifications, 'describe_modifications', optimizing):
+            first = self.track()
+            self.assertFalse(first['done'])
+            self.assertEqual((first['in_flight'], first['min_progress']), (len(self.volumes), 40))
+            self.assertEqual(self.item(self.volumes[0]['VolumeId'])['ModificationState'], 'optimizing')
+            second = self.track(first)
+        self.assertEqual(second['updated'], 0)
+        self.assertEqual(second['poll_seconds'], 2 * first['poll_seconds'])
+
+class BatchWriteItemsTest(WorkflowTestCase):
+    """Items DynamoDB leaves unprocessed are sent again."""
+
+    def test_unprocessed_items_are_retried(self):
+        dynamodb = boto3.resource('dynamodb')
+        items = [{'VolumeId': f"vol-{i:04d}", 'Region': 'us-east-1'} for i in range(30)]
+        responses = [{'UnprocessedItems': {local_runner.TABLE_NAME: [{'PutRequest': {'Item': items[0]}}]}}]
+        real_write = dynamodb.meta.client.batch_write_item
+
+        def batch_write_item(RequestItems):
+            real_write(RequestItems=RequestItems)
+            return responses.pop() if responses else {}
+
+        with mock.patch.object(dynamodb, 'batch_write_item', batch_write_item), \
+                mock.patch.object(dynamodb_batch, 'RETRY_BASE_DELAY', 0):
+            failed = dynamodb_batch.batch_write_items(dynamodb, local_runner.TABLE_NAME, items)
+        self.assertEqual(failed, [])
+        self.assertEqual(len(self.table.scan()['Items']), 30)
+
+    def test_items_still_unprocessed_after_the_retries_are_returned(self):
+        dynamodb = mock.Mock()
+        dynamodb.batch_write_item.side_effect = lambda RequestItems: {'UnprocessedItems': RequestItems}
+        items = [{'VolumeId': 'vol-0001'}, {'VolumeId': 'vol-0002'}]
+        with mock.patch.multiple(dynamodb_batch, RETRY_BASE_DELAY=0, BATCH_WRITE_RETRIES=2):
+            failed = dynamodb_batch.batch_write_items(dynamodb, local_runner.TABLE_NAME, items)
+        self.assertEqual(failed, items)
+        self.assertEqual(dynamodb.batch_write_item.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
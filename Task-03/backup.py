@@ -1,13 +1,117 @@
 import os
 import zipfile
+import zlib
 import datetime
 import json
 import subprocess
+import sys
 import logging
+import logging.handlers
 import argparse
+import atexit
+import hashlib
+import time
+import fnmatch
+import functools
+import io
+import itertools
+import math
+import multiprocessing
+import queue
+import re
+import sqlite3
+import struct
+import tempfile
+import threading
 import requests
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 
+try:
+    import numpy as np
+except ImportError: # Optional; makes finding chunk boundaries of the chunk store much faster
+    np = None
+
+# Files are split into chunks of this size so that even a single huge file can be
+# deflated across several cores by the parallel compression engine.
+PARALLEL_CHUNK_SIZE = 4 * 1024 * 1024
+
+# The parallel writer builds ZIP members from separately compressed chunks with these zipfile
+# internals. Pythons whose zipfile lacks any of them compress serially instead.
+ZIPFILE_INTERNALS = ((zipfile, '_get_compressor'), (zipfile.ZipFile, '_seekable'), (zipfile.ZipFile, 'start_dir'),
+                     (zipfile.ZipFile, 'filelist'), (zipfile.ZipFile, 'NameToInfo'))
+# The attribute zipfile reads a member's compression level from; public from Python 3.13 on
+_ZIPINFO_LEVEL = next((name for name in ('compress_level', '_compresslevel') if hasattr(zipfile.ZipInfo, name)), None)
+
+# Every archive gets a sidecar index, '<archive>.index.json', with the location, CRC and content hash
+# of each member so that single files can be restored and verified without scanning the archive.
+# A member's content hash is the SHA-256 of the SHA-256 digests of its INDEX_BLOCK_SIZE blocks; one
+# block per parallel compression chunk lets each chunk be checked on its own.
+INDEX_SUFFIX = ".index.json"
+INDEX_BLOCK_SIZE = PARALLEL_CHUNK_SIZE
+# Ranged reads from the remote are merged when they are at most this many bytes apart,
+# trading a little extra download for fewer rclone calls.
+RANGE_MERGE_GAP = 1024 * 1024
+
+# Formats that are already compressed and are stored as-is instead of being deflated again.
+ALREADY_COMPRESSED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".mp3", ".aac", ".ogg", ".opus", ".flac", ".m4a",
+    ".mp4", ".m4v", ".mkv", ".mov", ".avi", ".webm",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".txz", ".zst", ".7z", ".rar", ".lz4", ".br",
+    ".jar", ".war", ".whl", ".apk", ".docx", ".xlsx", ".pptx", ".odt", ".pdf",
+    ".pack", # Git packfiles
+}
+# Files whose first ENTROPY_SAMPLE_SIZE bytes carry more than this many bits of information per
+# byte are treated as incompressible. Files smaller than ENTROPY_MIN_SIZE are not sampled.
+ENTROPY_THRESHOLD = 7.5
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+ENTROPY_MIN_SIZE = 4 * 1024
+# zipfile does not pass a compression level to these codecs
+CODECS_WITHOUT_LEVELS = ('stored', 'lzma')
+
+# Incremental backups keep the state of the last backup in this file below ~/backups/ProjectName/,
+# and every incremental archive carries its parent and deletion list in a member with this name.
+MANIFEST_FILENAME = "manifest.json"
+ARCHIVE_MANIFEST_NAME = ".backup_manifest.json"
+INCREMENTAL_SUFFIX = "_incr"
+
+# The deduplicating chunk store lives in ~/backups/ProjectName/repository/. Files are split into
+# content-defined chunks with a gear rolling hash: a chunk ends where the top CDC_MASK_BITS bits of
+# the hash are zero, so boundaries move with the content and unchanged data yields identical chunks.
+CHUNKSTORE_DIRNAME = "repository"
+CDC_MIN_SIZE = 256 * 1024
+CDC_MAX_SIZE = 4 * 1024 * 1024
+CDC_MASK_BITS = 20 # Roughly 1 MiB between boundaries on top of CDC_MIN_SIZE
+_CDC_MASK = ((1 << CDC_MASK_BITS) - 1) << (64 - CDC_MASK_BITS)
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'little') for i in range(256)]
+_GEAR_ARRAY = np.array(_GEAR, dtype=np.uint64) if np is not None else None
+# With numpy, boundaries are searched in blocks of this many bytes
+CDC_SCAN_BLOCK_SIZE = 1024 * 1024
+
+# Every archive and snapshot is recorded in an SQLite catalog in ~/backups/ProjectName/ so that the
+# retention policy does not have to rescan the whole backup tree.
+CATALOG_FILENAME = "catalog.db"
+# The timestamp at the end of a backup filename, before the incremental suffix and the extension
+_BACKUP_TIMESTAMP = re.compile(r"_(\d{8}_\d{6})(?:" + INCREMENTAL_SUFFIX + r")?\.[a-z.]+$")
+
+# Streaming uploads hand archive data to 'rclone rcat' in blocks of this size, and buffer at most
+# STREAM_BUFFER_BLOCKS of them in memory while the upload catches up with compression.
+STREAM_BLOCK_SIZE = 1024 * 1024
+STREAM_BUFFER_BLOCKS = 16
+
+# Archives can be split into volumes of a fixed size, '<archive>.001', '<archive>.002', ..., which
+# concatenate to the ZIP file. '<archive>.volumes.json' lists them and records which have been
+# uploaded, so that an interrupted upload resumes with the missing volumes only.
+VOLUMES_SUFFIX = ".volumes.json"
+UPLOAD_RETRY_DELAY = 5 # Seconds before the first retry of a failed volume upload, doubled for every further retry
+
+# Parallel directory walks keep at most this many directory scans queued per walker thread,
+# so that a huge tree does not pile up scan results faster than the archive consumes them.
+WALK_PENDING_PER_WORKER = 4
+
 # --- Configuration Loading ---
 def load_config(config_path):
     """
@@ -31,37 +135,1530 @@ def load_config(config_path):
         exit(1)
 
 # --- Logging Setup ---
-def setup_logging(log_file):
+def setup_logging(log_file, log_format='%(asctime)s - %(levelname)s - %(message)s', level="INFO"):
     """
     Configures the logging system to write messages to a file and the console.
 
+    Records are handed to a background thread through a queue, so the file and console writes
+    stay out of the backup's hot loops.
+
     Args:
         log_file (Path): The path to the log file.
+        log_format (str): The format of log records.
+        level (str): The minimum level to log, e.g. 'INFO' or 'DEBUG' for one line per archived file.
+    """
+    formatter = logging.Formatter(log_format)
+    handlers = [
+        logging.FileHandler(log_file),
+        logging.StreamHandler() # Also log to console
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop) # Flushes the queue when the script exits
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s')) # The listener's handlers apply log_format
+    logging.basicConfig(level=level.upper(), handlers=[queue_handler])
+
+# --- Metrics ---
+class BackupMetrics:
+    """
+    Collects the wall and CPU time of each stage of a backup run and byte and file counters,
+    for the log, the notification payload and an optional metrics file.
+
+    CPU time is that of the calling thread; time spent in compression worker processes is
+    counted separately as 'compression_cpu_seconds'.
+    """
+
+    def __init__(self, project_name):
+        self.project_name = project_name
+        self.stages = {}
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block as the named stage."""
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                stage = self.stages.setdefault(name, {'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+                stage['wall_seconds'] += time.perf_counter() - wall_start
+                stage['cpu_seconds'] += time.thread_time() - cpu_start
+
+    def add(self, **counts):
+        """Adds to the named counters, e.g. add(files=1, bytes_read=4096)."""
+        with self._lock:
+            self.counters.update(counts)
+
+    def to_dict(self):
+        """Returns the metrics, with derived rates, as a JSON-serializable dictionary."""
+        with self._lock:
+            counters = dict(self.counters)
+            stages = {name: dict(stage) for name, stage in self.stages.items()}
+        create_seconds = stages.get('create', {}).get('wall_seconds', 0.0)
+        upload_seconds = stages.get('upload', {}).get('wall_seconds', 0.0)
+        derived = {}
+        if create_seconds:
+            derived['files_per_second'] = counters.get('files', 0) / create_seconds
+            derived['read_mb_per_second'] = counters.get('bytes_read', 0) / create_seconds / 1e6
+        if upload_seconds and counters.get('bytes_uploaded'):
+            derived['upload_mb_per_second'] = counters['bytes_uploaded'] / upload_seconds / 1e6
+        if counters.get('bytes_read'):
+            derived['compression_ratio'] = counters.get('bytes_written', 0) / counters['bytes_read']
+        return {'project': self.project_name, 'stages': stages, 'counters': counters, 'derived': derived}
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        metrics = self.to_dict()
+        project = metrics['project'].replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+        for field in ('wall_seconds', 'cpu_seconds'):
+            lines.append(f"# TYPE backup_stage_{field} gauge")
+            for name, stage in sorted(metrics['stages'].items()):
+                lines.append(f'backup_stage_{field}{{project="{project}",stage="{name}"}} {stage[field]:.6f}')
+        for name, value in sorted({**metrics['counters'], **metrics['derived']}.items()):
+            lines.append(f"# TYPE backup_{name} gauge")
+            lines.append(f'backup_{name}{{project="{project}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Returns a one-line summary for the log."""
+        metrics = self.to_dict()
+        stages = ", ".join(f"{name} {stage['wall_seconds']:.2f} s" for name, stage in metrics['stages'].items())
+        counters = ", ".join(f"{name} {value}" for name, value in sorted(metrics['counters'].items()))
+        derived = ", ".join(f"{name} {value:.2f}" for name, value in sorted(metrics['derived'].items()))
+        return f"Backup metrics: {stages}; {counters}; {derived}"
+
+def write_metrics(metrics, metrics_file, metrics_format="json"):
+    """
+    Writes the metrics of a backup run to a file, replacing it atomically so that a collector
+    (such as the node_exporter textfile collector) never reads a partial file.
+
+    Args:
+        metrics (BackupMetrics): The collected metrics.
+        metrics_file (str): The file to write. '{project_name}' is replaced by the project name.
+        metrics_format (str): 'json' or 'prometheus'.
+
+    Returns:
+        bool: True if the file was written successfully, False otherwise.
+    """
+    path = Path(metrics_file.format(project_name=metrics.project_name)).expanduser()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, 'w') as f:
+            if metrics_format == "prometheus":
+                f.write(metrics.to_prometheus())
+            else:
+                json.dump(metrics.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+        logging.info(f"Metrics written to '{path}'.")
+        return True
+    except OSError as e:
+        logging.error(f"Error writing metrics to '{path}': {e}")
+        return False
+
+# --- Compression Policy ---
+def _codec_type(codec):
+    """
+    Maps a codec name from the config to a zipfile compression constant.
+
+    Returns:
+        int or None: The compression constant, or None if the codec is unknown or unavailable.
+    """
+    codecs = {
+        'stored': zipfile.ZIP_STORED,
+        'deflate': zipfile.ZIP_DEFLATED,
+        'bzip2': zipfile.ZIP_BZIP2,
+        'lzma': zipfile.ZIP_LZMA,
+        'zstd': getattr(zipfile, 'ZIP_ZSTANDARD', None), # Python 3.14+
+    }
+    return codecs.get(codec)
+
+def _codec_name(compress_type):
+    """Returns the config name of a zipfile compression constant."""
+    for codec in ('stored', 'deflate', 'bzip2', 'lzma', 'zstd'):
+        if _codec_type(codec) == compress_type:
+            return codec
+    return str(compress_type)
+
+def load_compression_policy(settings):
+    """
+    Builds the per-file compression policy from the 'compression' section of the config.
+
+    Example section:
+        {"level": 6, "entropy_threshold": 7.5, "store_extensions": [".parquet"],
+         "rules": [{"glob": "*.log", "codec": "lzma"}, {"glob": "dumps/*.sql", "codec": "bzip2", "level": 9}]}
+
+    A rule's 'level' is honored by deflate, bzip2 and zstd; lzma and stored have no levels in
+    ZIP archives, so a level given for them is ignored with a warning. zstd needs Python 3.14
+    or newer.
+
+    Args:
+        settings (dict): The 'compression' config section. May be empty.
+
+    Returns:
+        dict: The policy with 'level', 'entropy_threshold', 'store_extensions' and compiled 'rules'.
+
+    Raises:
+        ValueError: If a rule names a codec that is unknown or not available in this Python.
+    """
+    rules = []
+    for rule in settings.get('rules', []):
+        codec = rule.get('codec', 'deflate')
+        compress_type = _codec_type(codec)
+        if compress_type is None:
+            if codec == 'zstd':
+                raise ValueError(f"Compression codec 'zstd' for '{rule.get('glob')}' needs Python 3.14 or newer "
+                                 f"(running {sys.version.split()[0]}).")
+            raise ValueError(f"Unknown compression codec '{codec}' for '{rule.get('glob')}'.")
+        level = rule.get('level')
+        if level is not None and codec in CODECS_WITHOUT_LEVELS:
+            logging.warning(f"Compression codec '{codec}' for '{rule.get('glob')}' has no levels. Ignoring level {level}.")
+            level = None
+        rules.append((rule['glob'], compress_type, level))
+    return {
+        'level': settings.get('level'),
+        'entropy_threshold': settings.get('entropy_threshold', ENTROPY_THRESHOLD),
+        'store_extensions': ALREADY_COMPRESSED_EXTENSIONS | {e.lower() for e in settings.get('store_extensions', [])},
+        'rules': rules,
+    }
+
+def _sample_entropy(file_path, read_limiter=None):
+    """Returns the Shannon entropy, in bits per byte, of the start of a file."""
+    with open(file_path, 'rb') as f:
+        sample = f.read(ENTROPY_SAMPLE_SIZE)
+    if read_limiter:
+        read_limiter.acquire(len(sample))
+    if not sample:
+        return 0.0
+    total = len(sample)
+    return -sum(count / total * math.log2(count / total) for count in Counter(sample).values())
+
+def _choose_compression(file_path, arcname, size, policy, read_limiter=None):
     """
-    logging.basicConfig(
-        level=logging.DEBUG, # Changed to DEBUG for more verbose output during troubleshooting
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler() # Also log to console
-        ]
-    )
+    Decides how a file is compressed: by the first matching config rule, otherwise stored
+    as-is if it is an already-compressed format or looks random, otherwise deflated.
+    Reading the sample for the randomness check counts against read_limiter.
+
+    Returns:
+        tuple: (zipfile compression constant, compression level or None)
+    """
+    for glob, compress_type, level in policy['rules']:
+        if fnmatch.fnmatch(arcname, glob):
+            return compress_type, level
+    if os.path.splitext(arcname)[1].lower() in policy['store_extensions']:
+        return zipfile.ZIP_STORED, None
+    if size >= ENTROPY_MIN_SIZE and _sample_entropy(file_path, read_limiter) > policy['entropy_threshold']:
+        return zipfile.ZIP_STORED, None
+    return zipfile.ZIP_DEFLATED, policy['level']
+
+def _record_compression(stats, compress_type, bytes_in, bytes_out, cpu_seconds):
+    """Adds one file to the per-codec compression statistics of a run."""
+    entry = stats.setdefault(_codec_name(compress_type), {'files': 0, 'bytes_in': 0, 'bytes_out': 0, 'cpu_seconds': 0.0})
+    entry['files'] += 1
+    entry['bytes_in'] += bytes_in
+    entry['bytes_out'] += bytes_out
+    entry['cpu_seconds'] += cpu_seconds
+
+def _log_compression_stats(stats):
+    """Logs bytes saved against CPU time spent for each codec used in a run."""
+    for codec, entry in sorted(stats.items()):
+        saved = entry['bytes_in'] - entry['bytes_out']
+        ratio = entry['bytes_out'] / entry['bytes_in'] if entry['bytes_in'] else 1.0
+        logging.info(f"Compression statistics for {codec}: {entry['files']} files, {entry['bytes_in']} -> "
+                     f"{entry['bytes_out']} bytes (ratio {ratio:.2f}, saved {saved} bytes) "
+                     f"in {entry['cpu_seconds']:.2f} CPU seconds.")
+
+# --- Parallel Compression Engine ---
+def _gf2_matrix_times(mat, vec):
+    """Multiplies a 32x32 GF(2) matrix, given as a list of columns, by a 32-bit vector."""
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+    return result
+
+@functools.lru_cache(maxsize=64)
+def _crc32_zeros_operator(len2):
+    """
+    Returns the matrix that advances a CRC-32 over len2 zero bytes. Cached because almost every
+    combine in a backup or verification uses the same chunk length.
+    """
+    def matrix_square(mat):
+        return [_gf2_matrix_times(mat, mat[n]) for n in range(32)]
+
+    operator = [1 << n for n in range(32)] # Identity
+    # Operator for one zero bit, then for two and four zero bits
+    odd = [0xEDB88320] + [1 << n for n in range(31)]
+    even = matrix_square(odd)
+    odd = matrix_square(even)
+
+    # Compose the operators for len2 zero bytes, one bit of len2 at a time
+    while True:
+        even = matrix_square(odd)
+        if len2 & 1:
+            operator = [_gf2_matrix_times(even, column) for column in operator]
+        len2 >>= 1
+        if len2 == 0:
+            break
+        odd = matrix_square(even)
+        if len2 & 1:
+            operator = [_gf2_matrix_times(odd, column) for column in operator]
+        len2 >>= 1
+        if len2 == 0:
+            break
+    return tuple(operator)
+
+def _crc32_combine(crc1, crc2, len2):
+    """
+    Combines two CRC-32 values as if the second block had been appended to the first.
+
+    This is a port of zlib's crc32_combine(), which Python's zlib module does not expose.
+
+    Args:
+        crc1 (int): CRC-32 of the first block.
+        crc2 (int): CRC-32 of the second block.
+        len2 (int): Length in bytes of the second block.
+
+    Returns:
+        int: CRC-32 of the concatenated blocks.
+    """
+    if len2 == 0:
+        return crc1
+    return _gf2_matrix_times(_crc32_zeros_operator(len2), crc1) ^ crc2
+
+def _compress_chunk(file_path, offset, length, is_last, compress_type=zipfile.ZIP_DEFLATED, level=None):
+    """
+    Reads one chunk of a file and compresses it. Runs inside a worker process.
+
+    Deflated chunks are compressed independently and, unless it is the last chunk of the file,
+    end with a full flush so that the raw deflate streams of consecutive chunks can simply
+    be concatenated into a single valid ZIP member. Stored chunks are returned as-is. Other
+    codecs cannot be split this way, so their tasks always cover the whole file.
+
+    Args:
+        file_path (str): The file to read from.
+        offset (int): Byte offset of the chunk within the file.
+        length (int): Number of bytes to read.
+        is_last (bool): Whether this is the final chunk of the file.
+        compress_type (int): The zipfile compression constant.
+        level (int or None): The compression level, or None for the codec's default.
+
+    Returns:
+        tuple: (compressed_bytes, crc32, uncompressed_length, cpu_seconds, block_digests), where
+            block_digests are the SHA-256 digests of the chunk's INDEX_BLOCK_SIZE blocks.
+    """
+    cpu_start = time.process_time()
+    if compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+    elif compress_type != zipfile.ZIP_STORED:
+        compressor = zipfile._get_compressor(compress_type, level)
+    output = []
+    block_digests = []
+    crc = 0
+    read = 0
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        while read < length:
+            data = f.read(min(INDEX_BLOCK_SIZE, length - read))
+            if not data:
+                break # The file shrank while it was being archived
+            crc = zlib.crc32(data, crc)
+            read += len(data)
+            block_digests.append(hashlib.sha256(data).digest())
+            output.append(data if compress_type == zipfile.ZIP_STORED else compressor.compress(data))
+    if compress_type == zipfile.ZIP_DEFLATED:
+        output.append(compressor.flush(zlib.Z_FINISH if is_last else zlib.Z_FULL_FLUSH))
+    elif compress_type != zipfile.ZIP_STORED:
+        output.append(compressor.flush())
+    return b''.join(output), crc, read, time.process_time() - cpu_start, block_digests
+
+def _iter_chunk_tasks(members, policy, chunk_size=PARALLEL_CHUNK_SIZE, read_limiter=None):
+    """
+    Splits archive members into chunk-sized compression tasks, in archive order.
+
+    Args:
+        members (iterable): (file_path, arcname) pairs.
+        policy (dict): The compression policy from load_compression_policy.
+        chunk_size (int): Maximum number of uncompressed bytes per deflate or stored task.
+        read_limiter (_RateLimiter or None): Paces the entropy samples read to choose a codec.
+
+    Yields:
+        tuple: (zinfo, file_path, offset, length, is_first, is_last, compress_type, level)
+    """
+    for file_path, arcname in members:
+        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+        size = zinfo.file_size
+        compress_type, level = _choose_compression(file_path, arcname, size, policy, read_limiter)
+        zinfo.compress_type = compress_type
+        if compress_type == zipfile.ZIP_LZMA:
+            zinfo.flag_bits |= 0x02 # LZMA streams carry an end-of-stream marker, as written by zipfile
+        task_size = chunk_size if compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) else max(size, 1)
+        offset = 0
+        while True:
+            length = min(task_size, size - offset)
+            is_last = offset + length >= size
+            yield zinfo, str(file_path), offset, length, offset == 0, is_last, compress_type, level
+            if is_last:
+                break
+            offset += length
+
+def _missing_zipfile_internals(zipf):
+    """Returns the names of the ZIPFILE_INTERNALS an open archive, or the zipfile module, lacks."""
+    return [name for owner, name in ZIPFILE_INTERNALS
+            if not hasattr(zipf if owner is zipfile.ZipFile else owner, name)]
+
+def _begin_raw_member(zipf, zinfo):
+    """
+    Writes a provisional local file header for a member whose data is added by the caller.
+
+    Returns:
+        bool: Whether the member uses ZIP64 extensions.
+    """
+    zinfo.header_offset = zipf.fp.tell()
+    if not zipf._seekable:
+        # The header cannot be rewritten later, so sizes and CRC follow the data in a data descriptor
+        zinfo.flag_bits |= 0x08
+    zinfo.CRC = 0
+    zinfo.compress_size = 0
+    expected_size = zinfo.file_size
+    zinfo.file_size = 0
+    # Same heuristic as zipfile: leave room for ZIP64 sizes if the member might need them
+    zip64 = expected_size * 1.05 > zipfile.ZIP64_LIMIT
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    return zip64
+
+def _finish_raw_member(zipf, zinfo, zip64):
+    """
+    Records the final sizes and CRC of a member, by rewriting its local file header or, on an
+    unseekable stream, by appending a data descriptor, and registers the member so that it is
+    included in the central directory when the archive is closed.
+    """
+    if not zip64 and (zinfo.file_size > zipfile.ZIP64_LIMIT or zinfo.compress_size > zipfile.ZIP64_LIMIT):
+        raise RuntimeError(f"File '{zinfo.filename}' grew beyond the ZIP64 limit while it was being archived.")
+    if zipf._seekable:
+        end_offset = zipf.fp.tell()
+        zipf.fp.seek(zinfo.header_offset)
+        zipf.fp.write(zinfo.FileHeader(zip64))
+        zipf.fp.seek(end_offset)
+    else:
+        descriptor_format = '<LLQQ' if zip64 else '<LLLL'
+        zipf.fp.write(struct.pack(descriptor_format, 0x08074b50, zinfo.CRC, zinfo.compress_size, zinfo.file_size))
+        end_offset = zipf.fp.tell()
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = end_offset
+
+def _write_members_parallel(zipf, members, workers, policy, stats, index, executor=None, read_limiter=None):
+    """
+    Compresses archive members in a process pool and writes them, in order, into an open ZipFile.
+
+    At most a few chunks per worker are in flight at any time, so memory use stays bounded
+    regardless of the size of the project tree.
+
+    Args:
+        zipf (zipfile.ZipFile): An archive opened for writing.
+        members (iterable): (file_path, arcname) pairs in the order they should be archived.
+        workers (int): Number of worker processes.
+        policy (dict): The compression policy from load_compression_policy.
+        stats (dict): Per-codec compression statistics, updated in place.
+        index (dict): Index entries by member name, see _write_member. Updated in place.
+        executor (ProcessPoolExecutor or None): A pool shared with other backups. A private pool
+            of 'workers' processes is created if omitted.
+        read_limiter (_RateLimiter or None): Paces the entropy samples read to choose a codec.
+
+    Returns:
+        int: The number of files written to the archive.
+    """
+    file_count = 0
+    log_files = logging.getLogger().isEnabledFor(logging.DEBUG)
+    max_in_flight = workers * 4
+    tasks = _iter_chunk_tasks(members, policy, read_limiter=read_limiter)
+    pending = deque()
+    current = None # (zinfo, zip64) of the member currently being written
+
+    with nullcontext(executor) if executor else ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep the pool busy while results are written out in submission order
+            for task in tasks:
+                zinfo, file_path, offset, length, is_first, is_last, compress_type, level = task
+                future = pool.submit(_compress_chunk, file_path, offset, length, is_last, compress_type, level)
+                pending.append((zinfo, is_first, is_last, future))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+
+            zinfo, is_first, is_last, future = pending.popleft()
+            compressed, crc, length, cpu_seconds, block_digests = future.result()
+            if is_first:
+                if log_files:
+                    logging.debug(f"Adding file to zip: {zinfo.filename}")
+                current = (zinfo, _begin_raw_member(zipf, zinfo))
+                member_cpu_seconds = 0.0
+                entry = index[zinfo.filename] = {'offset': zipf.fp.tell(), 'blocks': []}
+                if zinfo.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    # Every chunk holds one block and can be decompressed on its own
+                    entry['block_offsets'] = []
+            if 'block_offsets' in entry:
+                entry['block_offsets'].append(zinfo.compress_size)
+            entry['blocks'].extend(block_digests)
+            zipf.fp.write(compressed)
+            zinfo.CRC = _crc32_combine(zinfo.CRC, crc, length)
+            zinfo.compress_size += len(compressed)
+            zinfo.file_size += length
+            member_cpu_seconds += cpu_seconds
+            if is_last:
+                _finish_raw_member(zipf, *current)
+                _record_compression(stats, zinfo.compress_type, zinfo.file_size, zinfo.compress_size, member_cpu_seconds)
+                file_count += 1
+    return file_count
+
+# --- Incremental Backups ---
+def _hash_file(file_path, read_limiter=None):
+    """Returns the SHA-256 hex digest of a file's contents, optionally reading at most as fast as read_limiter allows."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            if read_limiter:
+                read_limiter.acquire(len(block))
+            digest.update(block)
+    return digest.hexdigest()
+
+def _content_hash_file(file_path, read_limiter=None):
+    """Returns a file's content hash, as recorded in the archive index, optionally reading at most as fast as read_limiter allows."""
+    block_digests = []
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(INDEX_BLOCK_SIZE), b''):
+            if read_limiter:
+                read_limiter.acquire(len(block))
+            block_digests.append(hashlib.sha256(block).digest())
+    return _content_hash(block_digests)
+
+def load_manifest(backup_root_dir):
+    """
+    Loads the manifest describing the project state at the time of the last backup.
+
+    Args:
+        backup_root_dir (Path): The project's backup directory (e.g., '~/backups/ProjectName').
+
+    Returns:
+        dict or None: The manifest, or None if there is no usable manifest.
+    """
+    manifest_path = backup_root_dir / MANIFEST_FILENAME
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except json.JSONDecodeError:
+        logging.warning(f"Manifest '{manifest_path}' is corrupt and will be rebuilt by a full backup.")
+        return None
+
+def save_manifest(backup_root_dir, manifest):
+    """
+    Atomically replaces the manifest of the last backup.
+
+    Args:
+        backup_root_dir (Path): The project's backup directory.
+        manifest (dict): The manifest to write.
+    """
+    manifest_path = backup_root_dir / MANIFEST_FILENAME
+    temp_path = manifest_path.with_suffix(".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, manifest_path)
+
+def _scan_changes(project_path, previous_files, file_filter=None, walk_workers=1, read_limiter=None):
+    """
+    Compares the project tree with the files recorded in the previous manifest.
+
+    Files whose size and modification time are unchanged are not read again; all other files
+    are hashed and only reported as changed if their content differs.
+
+    Args:
+        project_path (str): The path to the project directory.
+        previous_files (dict): The 'files' section of the previous manifest.
+        file_filter (dict or None): Include and exclude rules from load_file_filter.
+        walk_workers (int): Number of threads scanning directories.
+        read_limiter (_RateLimiter or None): Caps the rate at which files are read for hashing.
+
+    Returns:
+        tuple: (current_files, changed_members, deleted_paths)
+    """
+    current_files = {}
+    changed_members = []
+    for file_path, key in _iter_project_files(project_path, file_filter, walk_workers):
+        stat = os.stat(file_path)
+        previous = previous_files.get(key)
+        if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            # Manifests from older versions have no content hash; such files count as changed once modified
+            digest = previous.get('content_hash')
+        else:
+            digest = _content_hash_file(file_path, read_limiter)
+            if not previous or previous.get('content_hash') != digest:
+                changed_members.append((file_path, key))
+        current_files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'content_hash': digest}
+    deleted_paths = sorted(set(previous_files) - set(current_files))
+    return current_files, changed_members, deleted_paths
+
+def _record_file_stats(members, current_files):
+    """
+    Passes archive members through while recording the size and modification time of each
+    file in current_files. Their content hashes are added from the archive index afterwards.
+    """
+    for file_path, key in members:
+        stat = os.stat(file_path)
+        current_files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        yield file_path, key
+
+# --- Archive Index ---
+def _index_path(archive_path):
+    """Returns the location of an archive's sidecar index."""
+    archive_path = Path(archive_path)
+    return archive_path.with_name(archive_path.name + INDEX_SUFFIX)
+
+def _content_hash(block_digests):
+    """Returns a member's content hash from the SHA-256 digests of its blocks."""
+    return hashlib.sha256(b''.join(block_digests)).hexdigest()
+
+def _write_member(zipf, zinfo, src, index, compress_type=zipfile.ZIP_DEFLATED, level=None):
+    """
+    Copies a file object into a new archive member, hashing it block by block for the index.
+
+    Args:
+        zipf (zipfile.ZipFile): An archive opened for writing.
+        zinfo (zipfile.ZipInfo): The member to create; its file_size must be set.
+        src (file object): The data to archive.
+        index (dict): Index entries by member name, updated in place with the member's data
+            offset and block digests.
+        compress_type (int): The zipfile compression constant.
+        level (int or None): The compression level, or None for the codec's default.
+    """
+    zinfo.compress_type = compress_type
+    if _ZIPINFO_LEVEL:
+        setattr(zinfo, _ZIPINFO_LEVEL, level)
+    with zipf.open(zinfo, 'w') as dest:
+        entry = index[zinfo.filename] = {'offset': zipf.fp.tell(), 'blocks': []}
+        for block in iter(lambda: src.read(INDEX_BLOCK_SIZE), b''):
+            entry['blocks'].append(hashlib.sha256(block).digest())
+            dest.write(block)
+
+def _build_archive_index(zipf, index):
+    """
+    Combines the members of a closed archive with the entries collected while writing it.
+
+    Returns:
+        dict: The archive index, as stored in the sidecar file.
+    """
+    members = []
+    for zinfo in zipf.filelist:
+        entry = index[zinfo.filename]
+        member = {
+            'name': zinfo.filename,
+            'offset': entry['offset'],
+            'compress_size': zinfo.compress_size,
+            'file_size': zinfo.file_size,
+            'compress_type': zinfo.compress_type,
+            'crc': zinfo.CRC,
+            'sha256': _content_hash(entry['blocks']),
+            'blocks': [digest.hex() for digest in entry['blocks']],
+        }
+        if 'block_offsets' in entry:
+            member['block_offsets'] = entry['block_offsets']
+        members.append(member)
+    return {'members': members}
+
+def save_archive_index(archive_path, index):
+    """Writes the sidecar index of an archive."""
+    with open(_index_path(archive_path), 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+
+def _index_from_central_directory(archive_path):
+    """
+    Derives an index from an archive's central directory, for archives without a sidecar index.
+    The result has no content hashes, so only CRCs can be checked.
+    """
+    members = []
+    with _open_archive(archive_path) as f:
+        with zipfile.ZipFile(f) as zipf:
+            infos = zipf.infolist()
+        for zinfo in infos:
+            f.seek(zinfo.header_offset)
+            header = f.read(zipfile.sizeFileHeader)
+            if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+                raise zipfile.BadZipFile(f"Bad local file header for '{zinfo.filename}' in '{archive_path}'.")
+            name_length, extra_length = struct.unpack('<HH', header[26:30])
+            members.append({
+                'name': zinfo.filename,
+                'offset': zinfo.header_offset + zipfile.sizeFileHeader + name_length + extra_length,
+                'compress_size': zinfo.compress_size,
+                'file_size': zinfo.file_size,
+                'compress_type': zinfo.compress_type,
+                'crc': zinfo.CRC,
+            })
+    return {'members': members}
+
+def _rclone_cat(source):
+    """Returns the contents of a remote file, read with 'rclone cat'."""
+    try:
+        return subprocess.run(["rclone", "cat", source], capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Could not read '{source}': {e.stderr.decode(errors='replace')}")
+    except FileNotFoundError:
+        raise RuntimeError("rclone command not found. Please ensure rclone is installed and in your system's PATH.")
+
+def load_archive_index(archive_path, remote=None):
+    """
+    Loads the index of an archive from its sidecar file, from the local archive itself, or from
+    the copy of the sidecar file on the remote, in that order.
+
+    Args:
+        archive_path (Path): The local path of the archive, which need not exist.
+        remote (str or None): The rclone folder the archive was uploaded to, e.g. 'automatedBackup:ProjectBackups'.
+
+    Returns:
+        dict: The archive index. Members of archives without a sidecar index have no content hashes.
+    """
+    index_path = _index_path(archive_path)
+    if index_path.exists():
+        with open(index_path, 'r') as f:
+            return json.load(f)
+    if _archive_exists(archive_path):
+        return _index_from_central_directory(archive_path)
+    if remote:
+        return json.loads(_rclone_cat(f"{remote}/{index_path.name}"))
+    raise FileNotFoundError(f"Backup '{archive_path}' is not available locally.")
+
+def _iter_member_streams(archive_path, members, remote=None):
+    """
+    Yields (member, stream) pairs, where stream is positioned at the start of the member's data.
+    The caller must read exactly the member's compress_size bytes before advancing.
+
+    Local archives are read with seeks. Archives that only exist on the remote are read with
+    ranged 'rclone cat' calls, merging members that lie close together into one call.
+
+    Args:
+        archive_path (Path): The local path of the archive.
+        members (list): Index entries of the members to read.
+        remote (str or None): The rclone folder to read the archive from if it is not local.
+    """
+    members = sorted(members, key=lambda m: m['offset'])
+    if remote is None or _archive_exists(archive_path):
+        with _open_archive(archive_path) as f:
+            for member in members:
+                f.seek(member['offset'])
+                yield member, f
+        return
+
+    try:
+        volume_manifest = json.loads(_rclone_cat(f"{remote}/{_volumes_path(archive_path).name}"))
+    except RuntimeError:
+        volume_manifest = None # Not a split archive
+    groups = []
+    for member in members:
+        if groups and member['offset'] - groups[-1][-1] <= RANGE_MERGE_GAP:
+            groups[-1][1].append(member)
+            groups[-1][-1] = max(groups[-1][-1], member['offset'] + member['compress_size'])
+        else:
+            groups.append([member['offset'], [member], member['offset'] + member['compress_size']])
+    for start, group, end in groups:
+        reader = _RemoteRangeReader(_remote_range_pieces(remote, archive_path, start, end, volume_manifest) if end > start else [])
+        try:
+            position = start
+            for member in group:
+                while position < member['offset']: # Skip the gap to the next member
+                    skipped = reader.read(min(STREAM_BLOCK_SIZE, member['offset'] - position))
+                    if not skipped:
+                        break
+                    position += len(skipped)
+                yield member, reader
+                position = member['offset'] + member['compress_size']
+            reader.close()
+        finally:
+            reader.abort()
+
+def _decode_member_data(src, length, compress_type, out=None):
+    """
+    Reads and decompresses member data, computing its CRC and block digests.
+
+    Args:
+        src (file object): Stream positioned at the start of the data.
+        length (int): Number of compressed bytes to read.
+        compress_type (int): The zipfile compression constant.
+        out (file object or None): Receives the decompressed data.
+
+    Returns:
+        tuple: (crc32, uncompressed_length, block_digests)
+    """
+    decompressor = zipfile._get_decompressor(compress_type)
+    crc = 0
+    size = 0
+    block_digests = []
+    block = bytearray()
+
+    def consume(data):
+        nonlocal crc, size
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+        if out:
+            out.write(data)
+        block.extend(data)
+        while len(block) >= INDEX_BLOCK_SIZE:
+            block_digests.append(hashlib.sha256(block[:INDEX_BLOCK_SIZE]).digest())
+            del block[:INDEX_BLOCK_SIZE]
+
+    remaining = length
+    while remaining:
+        # Small reads bound the memory used by highly compressible data
+        data = src.read(min(64 * 1024, remaining))
+        if not data:
+            raise zipfile.BadZipFile("Member data ends unexpectedly.")
+        remaining -= len(data)
+        consume(decompressor.decompress(data) if decompressor else data)
+    if hasattr(decompressor, 'flush'):
+        consume(decompressor.flush())
+    if block:
+        block_digests.append(hashlib.sha256(block).digest())
+    return crc, size, block_digests
+
+# --- Throttling ---
+class _RateLimiter:
+    """
+    Token bucket shared by all threads of a batch run. acquire(n) takes n bytes worth of tokens
+    and sleeps for as long as the bucket is in debt, so the combined rate of all callers stays
+    at or below 'rate' bytes per second.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = rate # Allow a burst of one second worth of data
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+def _throttle_reads(members, read_limiter):
+    """Yields archive members, pacing them so that reading their contents respects read_limiter."""
+    for file_path, arcname in members:
+        read_limiter.acquire(os.path.getsize(file_path))
+        yield file_path, arcname
+
+# --- Streaming Upload ---
+class _UploadStream:
+    """
+    Write-only, unseekable file object that streams archive bytes into 'rclone rcat'.
+
+    Writes are collected into blocks that a background thread feeds to rclone, and to an optional
+    local copy, so compression and upload overlap. At most STREAM_BUFFER_BLOCKS blocks are queued;
+    beyond that, writers block until the upload catches up, which keeps memory use bounded.
+    """
+
+    def __init__(self, destination, local_path=None, bwlimit=None):
+        self.destination = destination
+        self.local_path = local_path
+        self._position = 0
+        self._digest = hashlib.sha256()
+        self._pending = bytearray()
+        self._blocks = queue.Queue(maxsize=STREAM_BUFFER_BLOCKS)
+        self._error = None
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(["rclone", "rcat", destination] + _bwlimit_args(bwlimit), stdin=subprocess.PIPE,
+                                             stdout=subprocess.DEVNULL, stderr=self._stderr)
+        except FileNotFoundError:
+            self._stderr.close()
+            raise RuntimeError("rclone command not found. Please ensure rclone is installed and in your system's PATH.")
+        self._local_file = open(local_path, 'wb') if local_path else None
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        """Moves queued blocks to rclone and the local copy until the end-of-stream marker."""
+        while True:
+            block = self._blocks.get()
+            if block is None:
+                break
+            if self._error:
+                continue # Keep draining so that writers never block on a dead upload
+            try:
+                self._digest.update(block)
+                self._process.stdin.write(block)
+                if self._local_file:
+                    self._local_file.write(block)
+            except OSError as e:
+                self._error = e
+
+    def write(self, data):
+        if self._error:
+            raise OSError(f"Streaming upload to '{self.destination}' failed: {self._error}")
+        self._pending += data
+        self._position += len(data)
+        if len(self._pending) >= STREAM_BLOCK_SIZE:
+            self._blocks.put(bytes(self._pending))
+            self._pending.clear()
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def hexdigest(self):
+        """Returns the SHA-256 of the uploaded data. Only valid after close()."""
+        return self._digest.hexdigest()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """
+        Finishes the upload and waits for rclone to exit.
+
+        Raises:
+            RuntimeError: If rclone or the local copy failed.
+        """
+        if self._pending:
+            self._blocks.put(bytes(self._pending))
+            self._pending.clear()
+        self._blocks.put(None)
+        self._thread.join()
+        if self._local_file:
+            self._local_file.close()
+        try:
+            self._process.stdin.close()
+        except OSError as e:
+            self._error = self._error or e
+        returncode = self._process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors='replace')
+        self._stderr.close()
+        if self._error or returncode != 0:
+            raise RuntimeError(f"Streaming upload to '{self.destination}' failed: {self._error or stderr}")
+
+    def abort(self):
+        """Stops the upload and removes the partial local copy."""
+        self._error = self._error or OSError("aborted")
+        # Kill rclone first so that a pending pipe write fails instead of blocking the pump thread
+        self._process.kill()
+        self._process.wait()
+        self._blocks.put(None)
+        self._thread.join()
+        self._stderr.close()
+        if self._local_file:
+            self._local_file.close()
+            Path(self.local_path).unlink(missing_ok=True)
+
+class _HashingWriter:
+    """
+    Write-only, unseekable file object that writes an archive to a local file and hashes it on the way.
+
+    Like a streamed archive, the ZIP file written through it uses data descriptors instead of
+    rewriting local headers, so every byte is hashed once, as it is written.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(path, 'wb')
+        self._digest = hashlib.sha256()
+        self._position = 0
+
+    def write(self, data):
+        self._file.write(data)
+        self._digest.update(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def hexdigest(self):
+        """Returns the SHA-256 of the whole archive. Only valid after close()."""
+        return self._digest.hexdigest()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def abort(self):
+        """Removes the partially written archive."""
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+def _retention_keeps_new_backup(retention_settings, backup_datetime):
+    """
+    Tells whether the retention policy would keep a backup created now, i.e. whether a
+    streamed backup needs a local copy at all.
+    """
+    return (retention_settings['daily'] > 0
+            or retention_settings['monthly'] > 0
+            or (retention_settings['weekly'] > 0 and backup_datetime.weekday() == 6))
+
+# --- Split Volumes ---
+def _volumes_path(archive_path):
+    """Returns the location of the volume manifest of a split archive."""
+    archive_path = Path(archive_path)
+    return archive_path.with_name(archive_path.name + VOLUMES_SUFFIX)
+
+def _load_volume_manifest(archive_path):
+    """Returns the volume manifest of a split archive, or None if the archive is not split."""
+    try:
+        with open(_volumes_path(archive_path), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_volume_manifest(archive_path, manifest):
+    """Writes the volume manifest of a split archive atomically."""
+    volumes_path = _volumes_path(archive_path)
+    temp_path = volumes_path.with_name(volumes_path.name + ".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, volumes_path)
+
+def _archive_exists(archive_path):
+    """Tells whether an archive, split or not, exists locally with all of its volumes."""
+    if Path(archive_path).exists():
+        return True
+    manifest = _load_volume_manifest(archive_path)
+    return bool(manifest) and all(Path(archive_path).with_name(v['name']).exists() for v in manifest['volumes'])
+
+def _archive_files(archive_path):
+    """Returns the local files an archive consists of, including its volume manifest and index."""
+    archive_path = Path(archive_path)
+    manifest = _load_volume_manifest(archive_path)
+    if manifest:
+        files = [archive_path.with_name(v['name']) for v in manifest['volumes']] + [_volumes_path(archive_path)]
+    else:
+        files = [archive_path]
+    return files + [_index_path(archive_path)]
+
+def _open_archive(archive_path):
+    """Opens an archive, split or not, for reading."""
+    if not Path(archive_path).exists() and _volumes_path(archive_path).exists():
+        return _VolumeReader(archive_path)
+    return open(archive_path, 'rb')
+
+class _VolumeWriter:
+    """
+    Write-only, unseekable file object that splits an archive into numbered volumes of a fixed size.
+
+    Like a streamed archive, the ZIP file written through it uses data descriptors instead of
+    rewriting local headers, so a volume is final as soon as it is full.
+    """
+
+    def __init__(self, archive_path, volume_size):
+        self.archive_path = Path(archive_path)
+        self.volume_size = volume_size
+        self.volumes = []
+        self._position = 0
+        self._digest = hashlib.sha256()
+        self._file = None
+        self._volume_digest = None
+
+    def _finish_volume(self):
+        if self._file:
+            self._file.close()
+            self.volumes[-1]['sha256'] = self._volume_digest.hexdigest()
+            self._file = None
+
+    def write(self, data):
+        data = memoryview(data)
+        written = 0
+        while written < len(data):
+            if self._file is None or self.volumes[-1]['size'] >= self.volume_size:
+                self._finish_volume()
+                name = f"{self.archive_path.name}.{len(self.volumes) + 1:03d}"
+                self._file = open(self.archive_path.with_name(name), 'wb')
+                self._volume_digest = hashlib.sha256()
+                self.volumes.append({'name': name, 'size': 0, 'uploaded': False})
+            piece = data[written:written + self.volume_size - self.volumes[-1]['size']]
+            self._file.write(piece)
+            self._volume_digest.update(piece)
+            self._digest.update(piece)
+            self.volumes[-1]['size'] += len(piece)
+            written += len(piece)
+        self._position += written
+        return written
+
+    def tell(self):
+        return self._position
+
+    def hexdigest(self):
+        """Returns the SHA-256 of the whole archive. Only valid after close()."""
+        return self._digest.hexdigest()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Closes the last volume and writes the volume manifest."""
+        self._finish_volume()
+        _save_volume_manifest(self.archive_path, {
+            'archive': self.archive_path.name,
+            'volume_size': self.volume_size,
+            'size': self._position,
+            'sha256': self._digest.hexdigest(),
+            'volumes': self.volumes,
+        })
+
+    def abort(self):
+        """Removes the volumes written so far."""
+        if self._file:
+            self._file.close()
+            self._file = None
+        for volume in self.volumes:
+            self.archive_path.with_name(volume['name']).unlink(missing_ok=True)
+
+class _VolumeReader:
+    """Read-only, seekable file object presenting the volumes of a split archive as one file."""
+
+    def __init__(self, archive_path):
+        self.archive_path = Path(archive_path)
+        manifest = _load_volume_manifest(archive_path)
+        self._volumes = [self.archive_path.with_name(v['name']) for v in manifest['volumes']]
+        self._volume_size = manifest['volume_size']
+        self._size = manifest['size']
+        self._position = 0
+        self._file = None
+        self._file_index = None
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._position
+        output = []
+        while size > 0 and self._position < self._size:
+            index, offset = divmod(self._position, self._volume_size)
+            if self._file_index != index:
+                if self._file:
+                    self._file.close()
+                self._file = open(self._volumes[index], 'rb')
+                self._file_index = index
+            self._file.seek(offset)
+            data = self._file.read(min(size, self._volume_size - offset))
+            if not data:
+                raise zipfile.BadZipFile(f"Volume '{self._volumes[index].name}' is shorter than expected.")
+            output.append(data)
+            self._position += len(data)
+            size -= len(data)
+        return b''.join(output)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class _RemoteRangeReader:
+    """
+    Sequential reader for a byte range of a file on the remote, or of a split archive whose range
+    spans several volumes, using one ranged 'rclone cat' call per file.
+    """
+
+    def __init__(self, pieces):
+        """
+        Args:
+            pieces (list): (remote_path, offset, count) tuples, read one after another.
+        """
+        self._pieces = list(pieces)
+        self._process = None
+        self._stderr = None
+        self._source = None
+
+    def _start_next(self):
+        self._source, offset, count = self._pieces.pop(0)
+        self._stderr = tempfile.TemporaryFile()
+        try:
+            self._process = subprocess.Popen(["rclone", "cat", "--offset", str(offset), "--count", str(count), self._source],
+                                             stdout=subprocess.PIPE, stderr=self._stderr)
+        except FileNotFoundError:
+            self._stderr.close()
+            raise RuntimeError("rclone command not found. Please ensure rclone is installed and in your system's PATH.")
+
+    def _finish_current(self):
+        self._process.stdout.close()
+        returncode = self._process.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read().decode(errors='replace')
+        self._stderr.close()
+        self._process = None
+        if returncode != 0:
+            raise RuntimeError(f"Could not read '{self._source}': {stderr}")
+
+    def read(self, size):
+        while True:
+            if self._process is None:
+                if not self._pieces:
+                    return b''
+                self._start_next()
+            data = self._process.stdout.read(size)
+            if data:
+                return data
+            self._finish_current()
+
+    def close(self):
+        """
+        Waits for the current rclone call after the range was read to the end.
+
+        Raises:
+            RuntimeError: If rclone failed.
+        """
+        if self._process:
+            self._finish_current()
+
+    def abort(self):
+        """Stops the current rclone call, for a range that is abandoned before its end."""
+        if self._process:
+            self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+            self._stderr.close()
+            self._process = None
+
+def _remote_range_pieces(remote, archive_path, start, end, volume_manifest=None):
+    """Maps a byte range of an archive on the remote to (remote_path, offset, count) pieces."""
+    if not volume_manifest:
+        return [(f"{remote}/{Path(archive_path).name}", start, end - start)]
+    pieces = []
+    volume_size = volume_manifest['volume_size']
+    while start < end:
+        index, offset = divmod(start, volume_size)
+        count = min(end - start, volume_size - offset)
+        pieces.append((f"{remote}/{volume_manifest['volumes'][index]['name']}", offset, count))
+        start += count
+    return pieces
+
+def _upload_volume(volume_path, destination, retries, bwlimit=None):
+    """
+    Uploads one volume with 'rclone copyto', retrying with exponential backoff.
+
+    Returns:
+        str or None: None if the volume was uploaded, otherwise the last error message.
+    """
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = UPLOAD_RETRY_DELAY * 2 ** (attempt - 1)
+            logging.warning(f"Upload of volume '{volume_path.name}' failed, retrying in {delay} seconds ({attempt}/{retries}): {error}")
+            time.sleep(delay)
+        try:
+            subprocess.run(["rclone", "copyto", str(volume_path), f"{destination}/{volume_path.name}"] + _bwlimit_args(bwlimit),
+                           capture_output=True, text=True, check=True)
+            return None
+        except subprocess.CalledProcessError as e:
+            error = e.stderr.strip() or f"rclone exited with code {e.returncode}"
+        except FileNotFoundError:
+            return "rclone command not found. Please ensure rclone is installed and in your system's PATH."
+    return error
+
+def _split_bwlimit(bwlimit, parts):
+    """
+    Divides an rclone --bwlimit rate between concurrent transfers, keeping its unit.
+
+    Returns:
+        str or None: The rate for each transfer, or None if bwlimit is not a single rate (such as
+        a timetable or separate upload and download limits) and cannot be divided.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([bkmgtp]?)", bwlimit.strip(), re.IGNORECASE)
+    if not match:
+        return None
+    # A rate without a unit is in KiB/s
+    return f"{float(match.group(1)) / parts:.6g}{match.group(2) or 'K'}"
+
+def upload_volumes(archive_path, destination, transfers=4, retries=3, bwlimit=None, metrics=None):
+    """
+    Uploads the volumes of a split archive with several concurrent transfers. Volumes already
+    recorded as uploaded are skipped, so a failed upload resumes where it stopped when retried.
+    The volume manifest and the index are uploaded last, once every volume has landed.
+
+    Args:
+        archive_path (Path): The split archive.
+        destination (str): The rclone destination folder, e.g. 'automatedBackup:ProjectBackups'.
+        transfers (int): Number of volumes uploaded at the same time.
+        retries (int): How often the upload of a volume is retried before giving up.
+        bwlimit (str or None): rclone --bwlimit value for all transfers together, e.g. '10M'. It is divided
+            between the concurrent transfers; a limit that cannot be divided uploads one volume at a time.
+        metrics (BackupMetrics or None): Receives the number of bytes uploaded.
+
+    Returns:
+        bool: True if every volume was uploaded, False otherwise.
+    """
+    archive_path = Path(archive_path)
+    manifest = _load_volume_manifest(archive_path)
+    pending = [v for v in manifest['volumes'] if not v['uploaded']]
+    transfers = max(1, min(transfers, len(pending)))
+    volume_bwlimit = bwlimit
+    if bwlimit and transfers > 1:
+        volume_bwlimit = _split_bwlimit(bwlimit, transfers)
+        if volume_bwlimit is None:
+            logging.info(f"Uploading one volume at a time, since --bwlimit '{bwlimit}' cannot be divided between transfers.")
+            transfers, volume_bwlimit = 1, bwlimit
+    logging.info(f"Uploading {len(pending)} of {len(manifest['volumes'])} volumes of '{archive_path.name}' "
+                 f"to '{destination}' with {transfers} transfer(s)...")
+    lock = threading.Lock()
+    failed = []
+
+    def upload(volume):
+        error = _upload_volume(archive_path.with_name(volume['name']), destination, retries, volume_bwlimit)
+        with lock:
+            if error:
+                logging.error(f"Upload of volume '{volume['name']}' failed: {error}")
+                failed.append(volume['name'])
+                return
+            # Record every landed volume right away, so that an interrupted upload can resume
+            volume['uploaded'] = True
+            _save_volume_manifest(archive_path, manifest)
+            if metrics:
+                metrics.add(bytes_uploaded=volume['size'])
+
+    with ThreadPoolExecutor(max_workers=transfers) as pool:
+        list(pool.map(upload, pending))
+    if failed:
+        logging.error(f"{len(failed)} volume(s) of '{archive_path.name}' could not be uploaded. They are retried on the next run.")
+        return False
+
+    for path in (_volumes_path(archive_path), _index_path(archive_path)):
+        if path.exists() and _upload_volume(path, destination, retries, bwlimit) is not None:
+            logging.error(f"Upload of '{path.name}' failed.")
+            return False
+    logging.info(f"All {len(manifest['volumes'])} volumes of '{archive_path.name}' uploaded.")
+    return True
+
+# --- File Selection ---
+def _translate_pattern(pattern):
+    """
+    Translates one gitignore-style pattern into a regular expression for relative paths.
+
+    Directories are matched with a trailing '/', so a pattern ending in '/' only matches directories.
+    A pattern without a '/' in the middle or at the start matches a name at any depth.
+    """
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            members = pattern[i + 1:end]
+            if members.startswith('!'):
+                members = '^' + members[1:]
+            parts.append('[' + members.replace('\\', '\\\\') + ']')
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return ('' if anchored else '(?:.*/)?') + ''.join(parts) + ('/' if dir_only else '/?')
+
+def _compile_patterns(patterns):
+    """Compiles gitignore-style patterns into one regular expression matching any of them."""
+    return re.compile('(?:' + '|'.join(_translate_pattern(p) for p in patterns) + r')\Z') if patterns else None
+
+def load_file_filter(settings):
+    """
+    Compiles the 'exclude' and 'include' rules of a config into a file filter.
+
+    'exclude' uses .gitignore syntax: later patterns take precedence and a leading '!' re-includes
+    what an earlier pattern excluded. Excluded directories are not descended into at all.
+    If 'include' is set, only files matching one of its patterns, or lying below a directory
+    matching one, are archived.
+
+    Args:
+        settings (dict): The configuration settings.
+
+    Returns:
+        dict or None: The compiled filter, or None if no rules are configured.
+    """
+    exclude = [p.strip() for p in settings.get('exclude', []) if p.strip() and not p.startswith('#')]
+    include = [p.strip() for p in settings.get('include', []) if p.strip() and not p.startswith('#')]
+    if not exclude and not include:
+        return None
+    # Consecutive patterns with the same sign are combined, so a path is matched against one
+    # regular expression per run of patterns, newest first, instead of once per pattern
+    groups = []
+    for negate, run in itertools.groupby(exclude, key=lambda p: p.startswith('!')):
+        groups.append((negate, _compile_patterns([p[1:] if negate else p for p in run])))
+    groups.reverse()
+    # Include patterns also match everything below a matching directory
+    below = []
+    for pattern in include:
+        pattern = pattern.rstrip('/')
+        below.append((pattern if '/' in pattern else '**/' + pattern) + '/**')
+    included = _compile_patterns(include + below)
+    return {'exclude': groups, 'include': included}
+
+def _is_excluded(file_filter, relpath):
+    """Tells whether a relative path, with a trailing '/' for directories, is excluded."""
+    for negate, pattern in file_filter['exclude']:
+        if pattern.match(relpath):
+            return not negate
+    return False
+
+def _scan_directory(path, prefix, file_filter):
+    """
+    Lists one directory of the project tree, applying the file filter.
+
+    Returns:
+        tuple: (files, subdirectories) as lists of (path, relative path) pairs.
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                relpath = prefix + entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    # Like os.walk, symlinks to directories are not followed
+                    if not entry.is_symlink() and not (file_filter and _is_excluded(file_filter, relpath + '/')):
+                        subdirs.append((entry.path, relpath + '/'))
+                elif not file_filter or not (_is_excluded(file_filter, relpath) or
+                                             (file_filter['include'] and not file_filter['include'].match(relpath))):
+                    files.append((entry.path, relpath))
+    except OSError as e:
+        logging.warning(f"Could not read directory '{path}': {e}")
+    return files, subdirs
+
+def _iter_project_files(project_path, file_filter=None, walk_workers=1):
+    """
+    Walks the project directory and yields every file to be archived.
+
+    Files are yielded while the walk is still in progress, so archiving starts right away.
+    With several walk workers, directories are scanned concurrently and files come out in
+    the order their directories finish scanning.
+
+    Args:
+        project_path (str): The path to the project directory.
+        file_filter (dict or None): Include and exclude rules from load_file_filter.
+        walk_workers (int): Number of threads scanning directories.
+
+    Yields:
+        tuple: (file_path, arcname) where arcname is the path relative to project_path, with '/' separators.
+    """
+    pending = deque([(os.fspath(project_path), '')])
+    if walk_workers <= 1:
+        while pending:
+            files, subdirs = _scan_directory(*pending.pop(), file_filter)
+            yield from files
+            pending.extend(reversed(subdirs))
+        return
+
+    with ThreadPoolExecutor(max_workers=walk_workers, thread_name_prefix="walk") as pool:
+        running = set()
+        while pending or running:
+            while pending and len(running) < walk_workers * WALK_PENDING_PER_WORKER:
+                running.add(pool.submit(_scan_directory, *pending.pop(), file_filter))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                yield from files
+                pending.extend(subdirs)
 
 # --- Backup Creation ---
-def create_backup(project_path, local_backup_base_dir, project_name):
+def create_backup(project_path, local_backup_base_dir, project_name, workers=1, mode="full",
+                  upload_destination=None, keep_local=True, compression_policy=None,
+                  executor=None, read_limiter=None, bwlimit=None, metrics=None, volume_size=None,
+                  file_filter=None, walk_workers=1):
     """
     Creates a ZIP archive of the specified project directory.
 
+    In 'incremental' mode only files that are new or changed since the last backup are archived,
+    together with the list of deleted files. The first incremental run, or a run whose previous
+    archive no longer exists, produces a full backup. Every backup replaces the manifest, so
+    the incremental backups after a full one are based on it.
+
     Args:
         project_path (str): The absolute path to the project directory to back up.
         local_backup_base_dir (str): The base directory for local backups (e.g., '~/backups').
         project_name (str): The name of the project, used for naming and structuring backups.
+        workers (int): Number of processes used to compress files. 1 compresses serially,
+            0 uses every available core.
+        mode (str): 'full' or 'incremental'.
+        upload_destination (str or None): An rclone destination such as 'automatedBackup:ProjectBackups'.
+            When set, the archive is streamed there with 'rclone rcat' while it is being created.
+        keep_local (bool): When streaming, whether to also write the archive to the local backup directory.
+        compression_policy (dict or None): Per-file compression policy from load_compression_policy.
+            Defaults to storing already-compressed files and deflating everything else.
+        executor (ProcessPoolExecutor or None): A compression pool shared with other backups.
+        read_limiter (_RateLimiter or None): Caps the rate at which project files are read.
+        bwlimit (str or None): rclone --bwlimit value for streaming uploads, e.g. '10M'.
+        metrics (BackupMetrics or None): Receives file and byte counters.
+        volume_size (int or None): Split the archive into volumes of this many bytes. Not used when streaming.
+        file_filter (dict or None): Include and exclude rules from load_file_filter.
+        walk_workers (int): Number of threads scanning the project tree.
 
     Returns:
-        Path or None: The path to the created backup file if successful, None otherwise.
+        Path or None: The path to the created backup file if successful, None otherwise. When
+        streaming without a local copy, or when split into volumes, the path is where the
+        single archive file would have been.
     """
+    backup_root_dir = Path(local_backup_base_dir).expanduser() / project_name
+    previous = None
+    if mode == "incremental":
+        previous = load_manifest(backup_root_dir)
+        if previous and not _archive_exists(backup_root_dir / previous['archive']):
+            logging.warning(f"Previous backup '{previous['archive']}' no longer exists. Creating a full backup instead.")
+            previous = None
+        elif previous is None:
+            logging.info("No manifest from a previous backup found. Creating a full backup.")
+    suffix = INCREMENTAL_SUFFIX if previous else ""
+    parent = previous['archive'] if previous else None
+
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_filename = f"{project_name}_{timestamp}.zip"
+    backup_filename = f"{project_name}_{timestamp}{suffix}.zip"
 
     # Construct the target backup directory: ~/backups/ProjectName/YYYY/MM/DD/
     today = datetime.datetime.now()
@@ -70,65 +1667,550 @@ def create_backup(project_path, local_backup_base_dir, project_name):
     day_dir = today.strftime("%d")
 
     # Resolve the base directory (e.g., expand '~') and append project/date structure
-    target_dir = Path(local_backup_base_dir).expanduser() / project_name / year_dir / month_dir / day_dir
+    target_dir = backup_root_dir / year_dir / month_dir / day_dir
     target_dir.mkdir(parents=True, exist_ok=True) # Create directories if they don't exist
 
     backup_filepath = target_dir / backup_filename
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if compression_policy is None:
+        compression_policy = load_compression_policy({})
+    compression_stats = {}
+    if upload_destination and mode == "incremental" and not keep_local:
+        logging.info("Keeping a local copy of the streamed backup because incremental backups build on it.")
+        keep_local = True
 
+    stream = None
+    volumes = None
+    archive_file = None
     try:
-        logging.info(f"Creating backup of '{project_path}' to '{backup_filepath}'...")
+        if upload_destination:
+            stream = _UploadStream(f"{upload_destination}/{backup_filename}", backup_filepath if keep_local else None, bwlimit)
+            output = stream
+            logging.info(f"Streaming backup of '{project_path}' to '{stream.destination}' using {workers} worker(s)...")
+        elif volume_size:
+            volumes = output = _VolumeWriter(backup_filepath, volume_size)
+            logging.info(f"Creating backup of '{project_path}' to '{backup_filepath}' in volumes of {volume_size} bytes "
+                         f"using {workers} worker(s)...")
+        else:
+            archive_file = output = _HashingWriter(backup_filepath)
+            logging.info(f"Creating backup of '{project_path}' to '{backup_filepath}' using {workers} worker(s)...")
         file_count = 0
+        if previous:
+            current_files, members, deleted_paths = _scan_changes(project_path, previous['files'], file_filter,
+                                                                  walk_workers, read_limiter)
+            logging.info(f"Found {len(members)} new or changed and {len(deleted_paths)} deleted files since the last backup.")
+        else:
+            current_files = {}
+            members = _record_file_stats(_iter_project_files(project_path, file_filter, walk_workers), current_files)
+        if read_limiter:
+            members = _throttle_reads(members, read_limiter)
+
         # Create a zip file and add all contents of the project_path
-        with zipfile.ZipFile(backup_filepath, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, _, files in os.walk(project_path):
-                for file in files:
-                    file_path = Path(root) / file
-                    # arcname is the path inside the zip file, relative to the project_path
-                    arcname = file_path.relative_to(project_path)
-                    logging.debug(f"Adding file to zip: {file_path} as {arcname}") # Added debug log
-                    zipf.write(file_path, arcname)
+        index = {}
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            missing = _missing_zipfile_internals(zipf) if workers > 1 else []
+            if missing:
+                logging.warning(f"The zipfile module of Python {sys.version.split()[0]} lacks {', '.join(missing)}. "
+                                f"Compressing serially.")
+            if workers > 1 and not missing:
+                file_count = _write_members_parallel(zipf, members, workers, compression_policy, compression_stats, index, executor,
+                                                     read_limiter)
+            else:
+                log_files = logging.getLogger().isEnabledFor(logging.DEBUG)
+                for file_path, arcname in members:
+                    if log_files:
+                        logging.debug(f"Adding file to zip: {file_path} as {arcname}") # Added debug log
+                    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                    compress_type, level = _choose_compression(file_path, arcname, zinfo.file_size, compression_policy,
+                                                               read_limiter)
+                    cpu_start = time.process_time()
+                    with open(file_path, 'rb') as src:
+                        _write_member(zipf, zinfo, src, index, compress_type, level)
+                    _record_compression(compression_stats, compress_type, zinfo.file_size, zinfo.compress_size,
+                                        time.process_time() - cpu_start)
                     file_count += 1
-        
-        if file_count == 0:
+            if previous:
+                manifest_data = json.dumps({'parent': parent, 'deleted': deleted_paths}).encode()
+                zinfo = zipfile.ZipInfo(ARCHIVE_MANIFEST_NAME, time.localtime()[:6])
+                zinfo.external_attr = 0o600 << 16
+                zinfo.file_size = len(manifest_data)
+                _write_member(zipf, zinfo, io.BytesIO(manifest_data), index)
+        # The index is kept even without a local copy of a streamed archive until it has been uploaded
+        archive_index = _build_archive_index(zipf, index)
+        save_archive_index(backup_filepath, archive_index)
+        if not previous:
+            # A full backup hashed every file while archiving it
+            for member in archive_index['members']:
+                if member['name'] in current_files:
+                    current_files[member['name']]['content_hash'] = member['sha256']
+        if stream:
+            stream.close()
+            logging.info(f"Streaming upload to Google Drive completed (local copy {'kept' if keep_local else 'not kept'}).")
+            archive_size = stream.tell()
+            record_backup(backup_root_dir, backup_filepath, archive_size, stream.hexdigest(), uploaded=True, local=keep_local,
+                          parent=parent)
+            if metrics:
+                metrics.add(bytes_streamed=archive_size)
+            stream = None
+        elif volumes:
+            volumes.close()
+            archive_size = volumes.tell()
+            record_backup(backup_root_dir, backup_filepath, archive_size, volumes.hexdigest(), parent=parent)
+            logging.info(f"Archive split into {len(volumes.volumes)} volume(s).")
+            volumes = None
+        else:
+            archive_file.close()
+            archive_size = archive_file.tell()
+            record_backup(backup_root_dir, backup_filepath, archive_size, archive_file.hexdigest(), parent=parent)
+            archive_file = None
+        if metrics:
+            metrics.add(files=file_count, bytes_written=archive_size,
+                        bytes_read=sum(entry['bytes_in'] for entry in compression_stats.values()),
+                        compression_cpu_seconds=sum(entry['cpu_seconds'] for entry in compression_stats.values()))
+
+        save_manifest(backup_root_dir, {
+            'archive': backup_filepath.relative_to(backup_root_dir).as_posix(),
+            'created': datetime.datetime.now().isoformat(),
+            'files': current_files,
+        })
+
+        if previous and file_count == 0:
+            logging.info("No files changed since the last backup.")
+        elif file_count == 0:
             logging.warning(f"No files were found in '{project_path}' to add to the backup. The created zip might be empty.")
+        _log_compression_stats(compression_stats)
         logging.info(f"Backup created successfully: {backup_filepath} (Contains {file_count} files).") # Updated log
         return backup_filepath
     except FileNotFoundError:
+        if stream:
+            stream.abort()
+            _index_path(backup_filepath).unlink(missing_ok=True)
+        if volumes:
+            volumes.abort()
+        if archive_file:
+            archive_file.abort()
         logging.error(f"Project path '{project_path}' not found. Cannot create backup.")
         return None
     except Exception as e:
-        logging.error(f"Error creating backup: {e}")
-        return None
+        if stream:
+            stream.abort()
+            _index_path(backup_filepath).unlink(missing_ok=True)
+        if volumes:
+            volumes.abort()
+        if archive_file:
+            archive_file.abort()
+        logging.error(f"Error creating backup: {e}")
+        return None
+
+# --- Deduplicated Chunk Store ---
+def _find_chunk_boundary(data):
+    """
+    Returns the length of the first content-defined chunk at the start of data.
+
+    Uses numpy when it is installed; the pure Python loop processes only a few MB per second.
+
+    Args:
+        data (bytes): Buffered file data, at most CDC_MAX_SIZE bytes unless the file ends sooner.
+
+    Returns:
+        int: The chunk length.
+    """
+    limit = min(len(data), CDC_MAX_SIZE)
+    if limit <= CDC_MIN_SIZE:
+        return limit
+    if np is not None:
+        return _find_chunk_boundary_numpy(data, limit)
+    gear = _GEAR
+    mask = _CDC_MASK
+    h = 0
+    position = CDC_MIN_SIZE
+    for byte in data[CDC_MIN_SIZE:limit]:
+        position += 1
+        h = ((h << 1) + gear[byte]) & 0xFFFFFFFFFFFFFFFF
+        if not h & mask:
+            return position
+    return limit
+
+def _find_chunk_boundary_numpy(data, limit):
+    """
+    Finds the same boundary as the loop in _find_chunk_boundary, a block at a time.
+
+    After 64 shifts a byte has left the 64-bit gear hash, so the hash at position i is the sum of
+    gear[data[i - k]] << k for k < 64. These window sums are built for a whole block in six
+    vectorized doubling steps, each adding the sum half a window earlier, shifted.
+    """
+    mask = np.uint64(_CDC_MASK)
+    block_start = CDC_MIN_SIZE
+    while block_start < limit:
+        block_end = min(block_start + CDC_SCAN_BLOCK_SIZE, limit)
+        # The 63 bytes before the block are needed for its first hashes, but the hash starts empty at CDC_MIN_SIZE
+        context_start = max(CDC_MIN_SIZE, block_start - 63)
+        h = np.take(_GEAR_ARRAY, np.frombuffer(data, dtype=np.uint8, count=block_end - context_start, offset=context_start))
+        shifted = np.empty_like(h)
+        span = 1
+        while span < 64:
+            np.left_shift(h[:-span], np.uint64(span), out=shifted[:-span])
+            np.add(h[span:], shifted[:-span], out=h[span:])
+            span *= 2
+        hits = np.flatnonzero((h[block_start - context_start:] & mask) == 0)
+        if hits.size:
+            return block_start + int(hits[0]) + 1
+        block_start = block_end
+    return limit
+
+def _iter_file_chunks(file_path):
+    """Yields the content-defined chunks of a file."""
+    with open(file_path, 'rb') as f:
+        buffer = b''
+        while True:
+            buffer += f.read(CDC_MAX_SIZE - len(buffer))
+            if not buffer:
+                break
+            cut = _find_chunk_boundary(buffer)
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+
+def _chunk_path(repository_dir, chunk_id):
+    """Returns the location of a chunk inside the repository."""
+    return Path(repository_dir) / "chunks" / chunk_id[:2] / chunk_id
+
+def _store_file_chunks(file_path, repository_dir):
+    """
+    Splits a file into chunks and stores every chunk the repository does not have yet.
+    Runs inside a worker process when more than one worker is used.
+
+    Args:
+        file_path (str): The file to store.
+        repository_dir (str): The chunk store repository.
+
+    Returns:
+        tuple: (list of chunk IDs in file order, number of bytes of newly stored chunk data)
+    """
+    chunk_ids = []
+    new_bytes = 0
+    for chunk in _iter_file_chunks(file_path):
+        chunk_id = hashlib.sha256(chunk).hexdigest()
+        chunk_path = _chunk_path(repository_dir, chunk_id)
+        if not chunk_path.exists():
+            chunk_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write under a unique name first so concurrent workers never expose a partial chunk
+            temp_path = chunk_path.with_name(f"{chunk_id}.{os.getpid()}.tmp")
+            temp_path.write_bytes(zlib.compress(chunk))
+            os.replace(temp_path, chunk_path)
+            new_bytes += len(chunk)
+        chunk_ids.append(chunk_id)
+    return chunk_ids, new_bytes
+
+def _load_chunkstore_state(repository_dir):
+    """
+    Loads the chunk reference counts and upload bookkeeping of a repository.
+
+    Returns:
+        dict: 'refcounts' (chunk ID to number of snapshots using it), 'uploaded' (set of chunk IDs
+        present on the remote) and 'remote_garbage' (set of remote paths waiting to be deleted).
+    """
+    try:
+        with open(Path(repository_dir) / "state.json", 'r') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = {}
+    return {
+        'refcounts': state.get('refcounts', {}),
+        'uploaded': set(state.get('uploaded', [])),
+        'remote_garbage': set(state.get('remote_garbage', [])),
+    }
+
+def _save_chunkstore_state(repository_dir, state):
+    """Atomically writes the repository state returned by _load_chunkstore_state."""
+    state_path = Path(repository_dir) / "state.json"
+    temp_path = state_path.with_suffix(".tmp")
+    with open(temp_path, 'w') as f:
+        json.dump({
+            'refcounts': state['refcounts'],
+            'uploaded': sorted(state['uploaded']),
+            'remote_garbage': sorted(state['remote_garbage']),
+        }, f)
+    os.replace(temp_path, state_path)
+
+def _snapshot_chunk_ids(snapshot):
+    """Returns the set of distinct chunk IDs referenced by a snapshot."""
+    return {chunk_id for entry in snapshot['files'] for chunk_id in entry['chunks']}
+
+def create_snapshot(project_path, local_backup_base_dir, project_name, workers=1, executor=None, read_limiter=None, metrics=None,
+                    file_filter=None, walk_workers=1):
+    """
+    Backs up the project into the deduplicated chunk store.
+
+    Only files whose size or modification time changed since the newest snapshot are read. Their
+    chunks are stored once per unique content, and the backup itself is recorded as a small
+    snapshot index listing the chunks of every file.
+
+    Args:
+        project_path (str): The absolute path to the project directory to back up.
+        local_backup_base_dir (str): The base directory for local backups (e.g., '~/backups').
+        project_name (str): The name of the project.
+        workers (int): Number of processes used to chunk files. 0 uses every available core.
+        executor (ProcessPoolExecutor or None): A worker pool shared with other backups.
+        read_limiter (_RateLimiter or None): Caps the rate at which changed files are read.
+        metrics (BackupMetrics or None): Receives file and byte counters.
+        file_filter (dict or None): Include and exclude rules from load_file_filter.
+        walk_workers (int): Number of threads scanning the project tree.
+
+    Returns:
+        Path or None: The path to the snapshot index if successful, None otherwise.
+    """
+    repository_dir = Path(local_backup_base_dir).expanduser() / project_name / CHUNKSTORE_DIRNAME
+    snapshots_dir = repository_dir / "snapshots"
+    snapshots_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    snapshot_path = snapshots_dir / f"{project_name}_{timestamp}.json"
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    try:
+        logging.info(f"Creating snapshot of '{project_path}' in chunk store '{repository_dir}'...")
+        previous_files = {}
+        latest = max(_find_backups(snapshots_dir, project_name, ".json"), key=lambda x: x['datetime'], default=None)
+        if latest:
+            with open(latest['path'], 'r') as f:
+                previous_files = {entry['path']: entry for entry in json.load(f)['files']}
+
+        entries = []
+        to_store = []
+        for file_path, arcname in _iter_project_files(project_path, file_filter, walk_workers):
+            stat = os.stat(file_path)
+            entry = {'path': arcname, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            previous = previous_files.get(entry['path'])
+            if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+                entry['chunks'] = previous['chunks']
+            else:
+                to_store.append((file_path, entry))
+            entries.append(entry)
+
+        paths = (file_path for file_path, _ in to_store)
+        if read_limiter:
+            # Lazily paced, so files are handed to the workers no faster than the limit allows
+            paths = (file_path for file_path, _ in _throttle_reads(to_store, read_limiter))
+        if (executor or workers > 1) and len(to_store) > 1:
+            with nullcontext(executor) if executor else ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_store_file_chunks, paths, itertools.repeat(str(repository_dir)), chunksize=8))
+        else:
+            results = [_store_file_chunks(file_path, repository_dir) for file_path in paths]
+        new_bytes = 0
+        log_files = logging.getLogger().isEnabledFor(logging.DEBUG)
+        for (file_path, entry), (chunk_ids, stored_bytes) in zip(to_store, results):
+            if log_files:
+                logging.debug(f"Stored file in chunk store: {file_path} ({len(chunk_ids)} chunks)")
+            entry['chunks'] = chunk_ids
+            new_bytes += stored_bytes
+
+        snapshot = {'project': project_name, 'created': datetime.datetime.now().isoformat(), 'files': entries}
+        temp_path = snapshot_path.with_suffix(".tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f)
+
+        # The references are saved before the snapshot becomes visible: an interruption in between
+        # only leaks chunks, whereas a snapshot with uncounted chunks could lose them to garbage collection
+        state = _load_chunkstore_state(repository_dir)
+        for chunk_id in _snapshot_chunk_ids(snapshot):
+            state['refcounts'][chunk_id] = state['refcounts'].get(chunk_id, 0) + 1
+        _save_chunkstore_state(repository_dir, state)
+        os.replace(temp_path, snapshot_path)
+        record_backup(repository_dir.parent, snapshot_path, snapshot_path.stat().st_size, _hash_file(snapshot_path))
+        if metrics:
+            metrics.add(files=len(entries), files_read=len(to_store), bytes_read=sum(entry['size'] for _, entry in to_store),
+                        bytes_written=new_bytes + snapshot_path.stat().st_size)
+
+        logging.info(f"Snapshot created successfully: {snapshot_path} (Contains {len(entries)} files, "
+                     f"{len(to_store)} read, {new_bytes} bytes of new chunk data).")
+        return snapshot_path
+    except Exception as e:
+        logging.error(f"Error creating snapshot: {e}")
+        return None
+
+def delete_snapshots(repository_dir, snapshot_paths):
+    """
+    Deletes snapshots and garbage-collects the chunks no remaining snapshot refers to.
+
+    Args:
+        repository_dir (Path): The chunk store repository.
+        snapshot_paths (list): The snapshot index files to delete.
+
+    Returns:
+        list: The snapshot paths that were deleted.
+    """
+    state = _load_chunkstore_state(repository_dir)
+    unreferenced = []
+    deleted_paths = []
+    for snapshot_path in snapshot_paths:
+        try:
+            with open(snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+            os.remove(snapshot_path)
+            logging.info(f"Deleted old snapshot: {snapshot_path}")
+            deleted_paths.append(snapshot_path)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Error deleting snapshot {snapshot_path}: {e}")
+            continue
+        state['remote_garbage'].add(f"snapshots/{Path(snapshot_path).name}")
+        for chunk_id in _snapshot_chunk_ids(snapshot):
+            count = state['refcounts'].get(chunk_id, 0) - 1
+            if count > 0:
+                state['refcounts'][chunk_id] = count
+            else:
+                state['refcounts'].pop(chunk_id, None)
+                unreferenced.append(chunk_id)
+
+    for chunk_id in unreferenced:
+        try:
+            _chunk_path(repository_dir, chunk_id).unlink()
+        except FileNotFoundError:
+            pass
+        if chunk_id in state['uploaded']:
+            state['uploaded'].discard(chunk_id)
+            state['remote_garbage'].add(f"chunks/{chunk_id[:2]}/{chunk_id}")
+    _save_chunkstore_state(repository_dir, state)
+    logging.info(f"Garbage collection removed {len(unreferenced)} unreferenced chunks.")
+    return deleted_paths
+
+def restore_snapshot(snapshot_path, destination, restore_paths=None):
+    """
+    Rebuilds the files recorded in a snapshot from the chunk store.
+
+    Args:
+        snapshot_path (Path): The snapshot index to restore.
+        destination (Path): The directory to restore the project into.
+        restore_paths (list or None): Files, directories or glob patterns to restore. Defaults to all files.
+    """
+    repository_dir = Path(snapshot_path).parent.parent
+    with open(snapshot_path, 'r') as f:
+        snapshot = json.load(f)
+    for entry in snapshot['files']:
+        if not _matches_restore_paths(entry['path'], restore_paths):
+            continue
+        target = (destination / entry['path']).resolve()
+        if not target.is_relative_to(destination):
+            raise ValueError(f"Refusing to restore '{entry['path']}' outside of '{destination}'.")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, 'wb') as out:
+            for chunk_id in entry['chunks']:
+                out.write(zlib.decompress(_chunk_path(repository_dir, chunk_id).read_bytes()))
+        os.utime(target, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+# --- Google Drive Integration ---
+def _bwlimit_args(bwlimit):
+    """Returns the rclone arguments for an optional bandwidth limit."""
+    return ["--bwlimit", bwlimit] if bwlimit else []
+
+def upload_to_gdrive(local_path, rclone_remote, google_drive_folder_name, bwlimit=None, metrics=None,
+                     transfers=4, retries=3):
+    """
+    Uploads a local file to Google Drive using rclone, together with its sidecar index if it has one.
+    Archives split into volumes are uploaded volume by volume with several concurrent transfers.
+
+    Args:
+        local_path (Path): The path to the local file to upload.
+        rclone_remote (str): The name of the rclone remote configured for Google Drive.
+        google_drive_folder_name (str): The name of the folder in Google Drive to upload to.
+        bwlimit (str or None): rclone --bwlimit value, e.g. '10M'.
+        metrics (BackupMetrics or None): Receives the number of bytes uploaded.
+        transfers (int): Number of volumes of a split archive uploaded at the same time.
+        retries (int): How often the upload of a volume is retried before giving up.
+
+    Returns:
+        bool: True if upload is successful, False otherwise.
+    """
+    if not local_path:
+        logging.warning("No local backup file to upload to Google Drive.")
+        return False
+
+    # Construct the rclone destination path
+    destination = f"{rclone_remote}:{google_drive_folder_name}"
+    if _volumes_path(local_path).exists():
+        return upload_volumes(local_path, destination, transfers, retries, bwlimit, metrics)
+    
+    paths = [local_path]
+    if _index_path(local_path).exists():
+        paths.append(_index_path(local_path))
+    logging.info(f"Uploading '{local_path}' to Google Drive folder '{destination}'...")
+    try:
+        for path in paths:
+            # Execute rclone copy command
+            result = subprocess.run(
+                ["rclone", "copy", str(path), destination] + _bwlimit_args(bwlimit),
+                capture_output=True, # Capture stdout and stderr
+                text=True,           # Decode stdout/stderr as text
+                check=True           # Raise CalledProcessError if command returns non-zero exit code
+            )
+            if metrics:
+                metrics.add(bytes_uploaded=path.stat().st_size)
+        logging.info(f"Google Drive upload successful. Output:\n{result.stdout}")
+        return True
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Google Drive upload failed. Error:\n{e.stderr}")
+        return False
+    except FileNotFoundError:
+        logging.error("rclone command not found. Please ensure rclone is installed and in your system's PATH.")
+        return False
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during rclone upload: {e}")
+        return False
 
-# --- Google Drive Integration ---
-def upload_to_gdrive(local_path, rclone_remote, google_drive_folder_name):
+def upload_snapshot_to_gdrive(snapshot_path, rclone_remote, google_drive_folder_name, bwlimit=None, metrics=None):
     """
-    Uploads a local file to Google Drive using rclone.
+    Uploads a chunk store snapshot to Google Drive using rclone, sending only the chunks the
+    remote does not already have. Chunks and snapshots removed by garbage collection since the
+    last upload are deleted from the remote first.
 
     Args:
-        local_path (Path): The path to the local file to upload.
+        snapshot_path (Path): The snapshot index created by create_snapshot.
         rclone_remote (str): The name of the rclone remote configured for Google Drive.
         google_drive_folder_name (str): The name of the folder in Google Drive to upload to.
+        bwlimit (str or None): rclone --bwlimit value, e.g. '10M'.
+        metrics (BackupMetrics or None): Receives the number of bytes uploaded.
 
     Returns:
         bool: True if upload is successful, False otherwise.
     """
-    if not local_path:
-        logging.warning("No local backup file to upload to Google Drive.")
+    if not snapshot_path:
+        logging.warning("No snapshot to upload to Google Drive.")
         return False
 
-    # Construct the rclone destination path
-    destination = f"{rclone_remote}:{google_drive_folder_name}"
-    
-    logging.info(f"Uploading '{local_path}' to Google Drive folder '{destination}'...")
+    repository_dir = snapshot_path.parent.parent
+    # Mirror the repository layout below a per-project folder: <folder>/<ProjectName>/chunks/..., snapshots/...
+    destination = f"{rclone_remote}:{google_drive_folder_name}/{repository_dir.parent.name}"
+    list_path = None
     try:
-        # Execute rclone copy command
+        state = _load_chunkstore_state(repository_dir)
+        with open(snapshot_path, 'r') as f:
+            new_chunks = sorted(_snapshot_chunk_ids(json.load(f)) - state['uploaded'])
+        upload_paths = [f"chunks/{c[:2]}/{c}" for c in new_chunks] + [f"snapshots/{snapshot_path.name}"]
+
+        with tempfile.NamedTemporaryFile('w', suffix=".txt", delete=False) as list_file:
+            list_path = list_file.name
+        # Remove garbage-collected objects first, but never one that is about to be uploaded again
+        garbage = sorted(state['remote_garbage'] - set(upload_paths))
+        if garbage:
+            Path(list_path).write_text("\n".join(garbage) + "\n")
+            logging.info(f"Deleting {len(garbage)} garbage-collected objects from '{destination}'...")
+            subprocess.run(["rclone", "delete", destination, "--files-from", list_path],
+                           capture_output=True, text=True, check=True)
+        state['remote_garbage'].clear()
+        _save_chunkstore_state(repository_dir, state)
+
+        logging.info(f"Uploading snapshot '{snapshot_path.name}' with {len(new_chunks)} new chunks to '{destination}'...")
+        Path(list_path).write_text("\n".join(upload_paths) + "\n")
         result = subprocess.run(
-            ["rclone", "copy", str(local_path), destination],
-            capture_output=True, # Capture stdout and stderr
-            text=True,           # Decode stdout/stderr as text
-            check=True           # Raise CalledProcessError if command returns non-zero exit code
+            ["rclone", "copy", str(repository_dir), destination, "--files-from", list_path, "--no-traverse"] + _bwlimit_args(bwlimit),
+            capture_output=True,
+            text=True,
+            check=True
         )
+        state['uploaded'].update(new_chunks)
+        _save_chunkstore_state(repository_dir, state)
+        if metrics:
+            metrics.add(bytes_uploaded=sum((repository_dir / path).stat().st_size for path in upload_paths))
         logging.info(f"Google Drive upload successful. Output:\n{result.stdout}")
         return True
     except subprocess.CalledProcessError as e:
@@ -140,47 +2222,225 @@ def upload_to_gdrive(local_path, rclone_remote, google_drive_folder_name):
     except Exception as e:
         logging.error(f"An unexpected error occurred during rclone upload: {e}")
         return False
+    finally:
+        if list_path:
+            os.remove(list_path)
 
-# --- Rotational Backup Strategy ---
-def apply_retention_policy(local_backup_base_dir, project_name, retention_settings):
+# --- Backup Catalog ---
+def _parse_backup_datetime(filename):
     """
-    Applies the rotational backup policy to delete old backups based on retention settings.
+    Extracts the timestamp from a backup filename: ProjectName_YYYYMMDD_HHMMSS[_incr].zip
+
+    The timestamp is taken from the end of the name, since project names may contain underscores.
+
+    Returns:
+        datetime.datetime or None: The timestamp, or None if the name does not end in one.
+
+    Raises:
+        ValueError: If the date or time part cannot be parsed.
+    """
+    match = _BACKUP_TIMESTAMP.search(filename)
+    if not match:
+        return None
+    return datetime.datetime.strptime(match.group(1), "%Y%m%d_%H%M%S")
+
+def _backup_kind(path):
+    """Returns the catalog kind of a backup file: 'full', 'incremental' or 'snapshot'."""
+    if path.suffix == ".json":
+        return "snapshot"
+    return "incremental" if path.name.endswith(f"{INCREMENTAL_SUFFIX}.zip") else "full"
+
+def _open_catalog(backup_root_dir):
+    """
+    Opens the project's backup catalog, creating it from the files on disk if it does not exist yet.
+
+    Args:
+        backup_root_dir (Path): The project's backup directory; its name is the project name.
+
+    Returns:
+        sqlite3.Connection: An open connection to the catalog.
+    """
+    catalog_path = backup_root_dir / CATALOG_FILENAME
+    is_new = not catalog_path.exists()
+    backup_root_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(catalog_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS backups (
+            path TEXT PRIMARY KEY,            -- Relative to the project's backup directory
+            created TEXT NOT NULL,            -- ISO timestamp parsed from the filename
+            kind TEXT NOT NULL,               -- full, incremental or snapshot
+            size INTEGER NOT NULL,
+            sha256 TEXT,                      -- NULL for archives found by a reconcile
+            uploaded INTEGER NOT NULL DEFAULT 0,
+            local INTEGER NOT NULL DEFAULT 1, -- 0 if the archive was only streamed to the remote
+            parent TEXT                       -- Path of the backup an incremental one is based on
+        );
+        CREATE INDEX IF NOT EXISTS backups_kind_created ON backups (kind, created);
+    """)
+    if 'parent' not in {row[1] for row in conn.execute("PRAGMA table_info(backups)")}:
+        # Catalogs from older versions; the parents are filled in by the next retention run
+        conn.execute("ALTER TABLE backups ADD COLUMN parent TEXT")
+    if is_new:
+        logging.info(f"Building backup catalog '{catalog_path}' from the files on disk...")
+        _reconcile(conn, backup_root_dir)
+    return conn
+
+def _archive_size(backup_path):
+    """Returns the size of a backup on disk, adding up the volumes of a split archive."""
+    manifest = _load_volume_manifest(backup_path) if backup_path.suffix == ".zip" else None
+    return manifest['size'] if manifest else backup_path.stat().st_size
+
+def _reconcile(conn, backup_root_dir):
+    """
+    Makes the catalog match the backups on disk.
+
+    Returns:
+        tuple: (number of rows added, number of rows removed)
+    """
+    project_name = backup_root_dir.name
+    on_disk = _find_backups(backup_root_dir, project_name) + \
+        _find_backups(backup_root_dir / CHUNKSTORE_DIRNAME / "snapshots", project_name, ".json")
+    on_disk = {b['path'].relative_to(backup_root_dir).as_posix(): b for b in on_disk}
+    cataloged = {row[0] for row in conn.execute("SELECT path FROM backups WHERE local = 1")}
+
+    added = [(path, b['datetime'].isoformat(), _backup_kind(b['path']), _archive_size(b['path']))
+             for path, b in on_disk.items() if path not in cataloged]
+    removed = [(path,) for path in cataloged if path not in on_disk]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO backups (path, created, kind, size) VALUES (?, ?, ?, ?)", added)
+        conn.executemany("DELETE FROM backups WHERE path = ?", removed)
+    return len(added), len(removed)
+
+def reconcile_catalog(local_backup_base_dir, project_name):
+    """
+    Rebuilds the backup catalog from the backups on disk, for example after files were
+    added or deleted by hand.
 
     Args:
         local_backup_base_dir (str): The base directory for local backups.
         project_name (str): The name of the project.
-        retention_settings (dict): A dictionary with 'daily', 'weekly', and 'monthly' retention counts.
+
+    Returns:
+        bool: True if the catalog was reconciled successfully, False otherwise.
     """
-    logging.info("Applying retention policy...")
     backup_root_dir = Path(local_backup_base_dir).expanduser() / project_name
-    
-    if not backup_root_dir.exists():
-        logging.info(f"Backup root directory '{backup_root_dir}' does not exist. No retention to apply.")
-        return
+    try:
+        conn = _open_catalog(backup_root_dir)
+        try:
+            added, removed = _reconcile(conn, backup_root_dir)
+        finally:
+            conn.close()
+        logging.info(f"Backup catalog reconciled: {added} archives added, {removed} stale entries removed.")
+        return True
+    except (sqlite3.Error, OSError) as e:
+        logging.error(f"Error reconciling backup catalog: {e}")
+        return False
+
+def record_backup(backup_root_dir, backup_path, size, sha256, uploaded=False, local=True, parent=None):
+    """
+    Records a newly created archive or snapshot in the catalog.
+
+    Args:
+        backup_root_dir (Path): The project's backup directory.
+        backup_path (Path): The archive or snapshot index.
+        size (int): Its size in bytes.
+        sha256 (str): Its SHA-256 hex digest.
+        uploaded (bool): Whether it has already been uploaded.
+        local (bool): Whether a local copy exists.
+        parent (str or None): For an incremental backup, the path of the backup it is based on,
+            relative to backup_root_dir.
+    """
+    # The archive is complete at this point; a catalog problem must not fail the backup, and the
+    # next reconcile_catalog picks up any archive that could not be recorded.
+    try:
+        created = _parse_backup_datetime(backup_path.name) or datetime.datetime.now()
+        conn = _open_catalog(backup_root_dir)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO backups (path, created, kind, size, sha256, uploaded, local, parent) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (backup_path.relative_to(backup_root_dir).as_posix(), created.isoformat(),
+                     _backup_kind(backup_path), size, sha256, int(uploaded), int(local), parent)
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"Error recording backup {backup_path} in the catalog: {e}")
+
+def mark_backup_uploaded(backup_root_dir, backup_path):
+    """Marks an archive or snapshot as uploaded in the catalog."""
+    try:
+        conn = _open_catalog(backup_root_dir)
+        try:
+            with conn:
+                conn.execute("UPDATE backups SET uploaded = 1 WHERE path = ?",
+                             (backup_path.relative_to(backup_root_dir).as_posix(),))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.error(f"Error updating upload state of {backup_path} in the catalog: {e}")
+
+def _remove_empty_dirs(backup_root_dir, directories):
+    """
+    Removes the given directories and their parents up to backup_root_dir, deepest first,
+    stopping at the first directory that is not empty.
+    """
+    for current_dir in sorted(directories, key=lambda d: len(d.parts), reverse=True):
+        while current_dir != backup_root_dir:
+            try:
+                os.rmdir(current_dir)
+            except OSError:
+                break # Not empty, or already removed
+            logging.info(f"Removed empty directory: {current_dir}")
+            current_dir = current_dir.parent
 
+# --- Rotational Backup Strategy ---
+def _find_backups(backup_root_dir, project_name, extension=".zip"):
+    """
+    Finds all backup archives of a project and parses their timestamps from the filenames.
+
+    Args:
+        backup_root_dir (Path): The project's backup directory.
+        project_name (str): The name of the project.
+        extension (str): The file extension of the backups ('.json' for chunk store snapshots).
+
+    Returns:
+        list: Dictionaries with 'path', 'datetime' and 'incremental' keys, in no particular order.
+    """
     all_backups = []
     # Walk through the directory structure to find all backup files
     for root, _, files in os.walk(backup_root_dir):
         for file in files:
+            if extension == ".zip" and file.endswith(f".zip{VOLUMES_SUFFIX}"):
+                file = file[:-len(VOLUMES_SUFFIX)] # A split archive is represented by its volume manifest
             # Check if it's a zip file and matches the project naming convention
-            if file.endswith(".zip") and file.startswith(project_name):
+            if file.endswith(extension) and file.startswith(project_name):
                 try:
-                    # Extract timestamp from filename: ProjectName_YYYYMMDD_HHMMSS.zip
-                    parts = file.split('_')
-                    if len(parts) >= 3:
-                        date_str = parts[1] # YYYYMMDD
-                        time_str = parts[2].split('.')[0] # HHMMSS
-                        backup_datetime = datetime.datetime.strptime(f"{date_str}_{time_str}", "%Y%m%d_%H%M%S")
-                        all_backups.append({'path': Path(root) / file, 'datetime': backup_datetime})
+                    backup_datetime = _parse_backup_datetime(file)
+                    if backup_datetime:
+                        all_backups.append({
+                            'path': Path(root) / file,
+                            'datetime': backup_datetime,
+                            'incremental': file.endswith(f"{INCREMENTAL_SUFFIX}.zip"),
+                        })
                 except ValueError:
                     logging.warning(f"Could not parse timestamp from filename: {file}")
                     continue
+    return all_backups
 
-    # Sort all backups by datetime, from newest to oldest
-    all_backups.sort(key=lambda x: x['datetime'], reverse=True)
+def _select_retained_backups(all_backups, retention_settings):
+    """
+    Selects the backups to keep according to the daily, weekly and monthly retention settings.
+
+    Args:
+        all_backups (list): Backups as returned by _find_backups, sorted from newest to oldest.
+        retention_settings (dict): A dictionary with 'daily', 'weekly', and 'monthly' retention counts.
 
+    Returns:
+        set: The paths of the backups to retain.
+    """
     retained_files = set() # Use a set to store paths of files to be retained, avoiding duplicates
-    deleted_count = 0
 
     # 1. Daily Retention: Keep the 'daily' most recent backups overall
     logging.info(f"Applying daily retention (keeping last {retention_settings['daily']} backups overall)...")
@@ -217,26 +2477,112 @@ def apply_retention_policy(local_backup_base_dir, project_name, retention_settin
         else:
             break
 
-    # Delete files that are not in the retained_files set
-    logging.info("Identifying and deleting old backups...")
-    for backup in all_backups:
-        if backup['path'] not in retained_files:
-            try:
-                os.remove(backup['path'])
-                logging.info(f"Deleted old backup: {backup['path']}")
-                deleted_count += 1
-                # Attempt to remove empty parent directories (YYYY/MM/DD)
-                current_dir = backup['path'].parent
-                # Walk up the directory tree until backup_root_dir or a non-empty directory is found
-                while current_dir != backup_root_dir and not list(current_dir.iterdir()):
-                    os.rmdir(current_dir)
-                    logging.info(f"Removed empty directory: {current_dir}")
-                    current_dir = current_dir.parent
-            except OSError as e:
-                logging.error(f"Error deleting backup {backup['path']}: {e}")
-            except Exception as e:
-                logging.error(f"An unexpected error occurred during deletion of {backup['path']}: {e}")
+    # 4. Incremental Chains: a retained incremental backup is useless without the full backup
+    # it is based on and every increment in between, so keep the whole chain. Each increment's
+    # recorded parent is followed, since a full backup taken in between does not start a new
+    # chain for later increments. Without a recorded parent, every backup back to the
+    # preceding full backup is kept.
+    by_path = {b['path']: b for b in all_backups}
+    oldest_first = list(reversed(all_backups))
+    pending = [b for b in all_backups if b['incremental'] and b['path'] in retained_files]
+    chained = {b['path'] for b in pending}
+    while pending:
+        backup = pending.pop()
+        if backup.get('parent') is not None:
+            parents = [by_path[backup['parent']]] if backup['parent'] in by_path else []
+        else:
+            parents = []
+            for older in reversed(oldest_first[:oldest_first.index(backup)]):
+                parents.append(older)
+                if not older['incremental']:
+                    break
+        for parent in parents:
+            if parent['path'] not in chained:
+                chained.add(parent['path'])
+                retained_files.add(parent['path'])
+                if parent['incremental']:
+                    pending.append(parent)
+
+    return retained_files
+
+def apply_retention_policy(local_backup_base_dir, project_name, retention_settings, backend="zip", metrics=None):
+    """
+    Applies the rotational backup policy to delete old backups based on retention settings.
+
+    Args:
+        local_backup_base_dir (str): The base directory for local backups.
+        project_name (str): The name of the project.
+        retention_settings (dict): A dictionary with 'daily', 'weekly', and 'monthly' retention counts.
+        backend (str): 'zip' to rotate ZIP archives, 'chunkstore' to rotate chunk store snapshots.
+        metrics (BackupMetrics or None): Receives the number of backups deleted.
+    """
+    logging.info("Applying retention policy...")
+    backup_root_dir = Path(local_backup_base_dir).expanduser() / project_name
     
+    if not backup_root_dir.exists():
+        logging.info(f"Backup root directory '{backup_root_dir}' does not exist. No retention to apply.")
+        return
+
+    kinds = ("snapshot",) if backend == "chunkstore" else ("full", "incremental")
+    conn = _open_catalog(backup_root_dir)
+    try:
+        # All backups from the catalog, from newest to oldest
+        rows = conn.execute(
+            f"SELECT path, created, kind, parent FROM backups WHERE local = 1 AND kind IN ({', '.join('?' * len(kinds))}) "
+            "ORDER BY created DESC",
+            kinds
+        ).fetchall()
+        all_backups = [{
+            'path': backup_root_dir / path,
+            'datetime': datetime.datetime.fromisoformat(created),
+            'incremental': kind == "incremental",
+            'parent': backup_root_dir / parent if parent else None,
+        } for path, created, kind, parent in rows]
+        # Incremental backups found by a reconcile, or cataloged by an older version, have no parent
+        # recorded yet; it is read from the archive once and kept in the catalog
+        unknown = [backup for backup in all_backups if backup['incremental'] and backup['parent'] is None]
+        for backup in unknown:
+            backup['parent'] = _read_backup_parent(backup_root_dir, backup['path'])
+        with conn:
+            conn.executemany("UPDATE backups SET parent = ? WHERE path = ?",
+                             [(b['parent'].relative_to(backup_root_dir).as_posix(), b['path'].relative_to(backup_root_dir).as_posix())
+                              for b in unknown if b['parent'] is not None])
+
+        retained_files = _select_retained_backups(all_backups, retention_settings)
+
+        # Delete files that are not in the retained_files set
+        logging.info("Identifying and deleting old backups...")
+        expired = [b['path'] for b in all_backups if b['path'] not in retained_files]
+        if backend == "chunkstore":
+            deleted_paths = delete_snapshots(backup_root_dir / CHUNKSTORE_DIRNAME, expired)
+        else:
+            deleted_paths = []
+            for backup_path in expired:
+                try:
+                    archive_files = _archive_files(backup_path)
+                    os.remove(archive_files[0]) # Raises if the backup is already gone
+                    for path in archive_files[1:]:
+                        path.unlink(missing_ok=True)
+                    logging.info(f"Deleted old backup: {backup_path}")
+                    deleted_paths.append(backup_path)
+                except FileNotFoundError:
+                    logging.warning(f"Old backup {backup_path} was already deleted. Removing it from the catalog.")
+                    _index_path(backup_path).unlink(missing_ok=True)
+                    deleted_paths.append(backup_path)
+                except OSError as e:
+                    logging.error(f"Error deleting backup {backup_path}: {e}")
+            # Attempt to remove empty parent directories (YYYY/MM/DD)
+            _remove_empty_dirs(backup_root_dir, {p.parent for p in deleted_paths})
+
+        with conn:
+            conn.executemany("DELETE FROM backups WHERE path = ?",
+                             [(p.relative_to(backup_root_dir).as_posix(),) for p in deleted_paths])
+    finally:
+        conn.close()
+    deleted_count = len(deleted_paths)
+    if metrics:
+        metrics.add(backups_deleted=deleted_count)
+
     logging.info(f"Retention policy applied. Total deleted: {deleted_count} files.")
     if deleted_count > 0:
         logging.info("Deletion summary: See log for details on deleted files.")
@@ -244,8 +2590,287 @@ def apply_retention_policy(local_backup_base_dir, project_name, retention_settin
         logging.info("No old backups found to delete based on current policy.")
 
 
+# --- Restore ---
+def _read_archive_manifest(archive_path, index, remote=None):
+    """
+    Reads the manifest an incremental backup stores inside its archive.
+
+    Returns:
+        dict or None: The manifest with the 'parent' archive and the 'deleted' paths, or None for a full backup.
+    """
+    manifest_members = [m for m in index['members'] if m['name'] == ARCHIVE_MANIFEST_NAME]
+    for member, stream in _iter_member_streams(archive_path, manifest_members, remote):
+        data = io.BytesIO()
+        _decode_member_data(stream, member['compress_size'], member['compress_type'], data)
+        return json.loads(data.getvalue())
+    return None
+
+def _read_backup_parent(backup_root_dir, archive_path):
+    """
+    Returns the path of the backup an incremental archive is based on, or None if it cannot be read.
+    """
+    try:
+        archive_manifest = _read_archive_manifest(archive_path, load_archive_index(archive_path))
+    except (OSError, ValueError, KeyError, zlib.error) as e:
+        logging.warning(f"Could not read the parent of incremental backup {archive_path}: {e}")
+        return None
+    return backup_root_dir / archive_manifest['parent'] if archive_manifest else None
+
+def _matches_restore_paths(name, restore_paths):
+    """Tells whether an archive path is selected by the files, directories or glob patterns to restore."""
+    if not restore_paths:
+        return True
+    for pattern in restore_paths:
+        pattern = pattern.strip('/')
+        if name == pattern or name.startswith(pattern + '/') or fnmatch.fnmatch(name, pattern):
+            return True
+    return False
+
+def _restore_archive_members(archive_path, index, members, destination, remote=None):
+    """
+    Extracts members of an archive using its index, verifying each against its CRC and content hash.
+
+    Args:
+        archive_path (Path): The local path of the archive.
+        index (dict): The archive index from load_archive_index.
+        members (list): Index entries of the members to extract.
+        destination (Path): The resolved directory to extract into.
+        remote (str or None): The rclone folder to read the archive from if it is not local.
+
+    Returns:
+        int: The number of files extracted.
+
+    Raises:
+        ValueError: If a member is corrupt or would be extracted outside of the destination.
+    """
+    extracted = 0
+    for member, stream in _iter_member_streams(archive_path, members, remote):
+        target = (destination / member['name']).resolve()
+        if not target.is_relative_to(destination):
+            raise ValueError(f"Refusing to restore '{member['name']}' outside of '{destination}'.")
+        if member['name'].endswith('/'):
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, 'wb') as out:
+            crc, size, block_digests = _decode_member_data(stream, member['compress_size'], member['compress_type'], out)
+        if crc != member['crc'] or size != member['file_size'] or \
+                ('sha256' in member and _content_hash(block_digests) != member['sha256']):
+            raise ValueError(f"Member '{member['name']}' of '{Path(archive_path).name}' is corrupt.")
+        extracted += 1
+    return extracted
+
+def restore_backup(local_backup_base_dir, project_name, destination, point_in_time=None, backend="zip",
+                   restore_paths=None, remote=None):
+    """
+    Rebuilds the project, or selected files of it, as it was at a point in time.
+
+    The latest backup at or before the requested time is located, and the full backup it is based
+    on is extracted first, followed by every incremental backup up to the requested one, following
+    the parent each increment records. Files
+    recorded as deleted by an increment are removed again. Only the selected members are read,
+    using each archive's index; archives that were only streamed to the remote are read from
+    there with ranged downloads.
+
+    Args:
+        local_backup_base_dir (str): The base directory for local backups.
+        project_name (str): The name of the project.
+        destination (str): The directory to restore the project into.
+        point_in_time (datetime.datetime or None): Restore the state as of this time. Defaults to the newest backup.
+        backend (str): 'zip' to restore from ZIP archives, 'chunkstore' to restore a chunk store snapshot.
+        restore_paths (list or None): Files, directories or glob patterns to restore, relative to the
+            project root. Defaults to the whole project.
+        remote (str or None): The rclone folder backups were uploaded to, e.g. 'automatedBackup:ProjectBackups'.
+
+    Returns:
+        bool: True if the restore was successful, False otherwise.
+    """
+    backup_root_dir = Path(local_backup_base_dir).expanduser() / project_name
+    if backend == "chunkstore":
+        candidates = _find_backups(backup_root_dir / CHUNKSTORE_DIRNAME / "snapshots", project_name, ".json")
+    else:
+        conn = _open_catalog(backup_root_dir)
+        try:
+            rows = conn.execute(
+                "SELECT path, created, kind FROM backups WHERE kind IN ('full', 'incremental') AND (local = 1 OR uploaded = 1)"
+            ).fetchall()
+        finally:
+            conn.close()
+        candidates = [{
+            'path': backup_root_dir / path,
+            'datetime': datetime.datetime.fromisoformat(created),
+            'incremental': kind == "incremental",
+        } for path, created, kind in rows]
+    by_path = {b['path']: b for b in candidates}
+    candidates = [b for b in candidates if point_in_time is None or b['datetime'] <= point_in_time]
+    if not candidates:
+        logging.error(f"No backups of '{project_name}' found to restore from.")
+        return False
+
+    destination = Path(destination).expanduser().resolve()
+    destination.mkdir(parents=True, exist_ok=True)
+    if backend == "chunkstore":
+        snapshot_path = max(candidates, key=lambda x: x['datetime'])['path']
+        logging.info(f"Restoring snapshot '{snapshot_path.name}' into '{destination}'...")
+        try:
+            restore_snapshot(snapshot_path, destination, restore_paths)
+            logging.info(f"Restore completed successfully into '{destination}'.")
+            return True
+        except (OSError, ValueError, KeyError, zlib.error) as e:
+            logging.error(f"Error restoring snapshot: {e}")
+            return False
+
+    backup = max(candidates, key=lambda x: x['datetime'])
+    logging.info(f"Restoring '{backup['path'].name}' into '{destination}'...")
+    try:
+        # Follow the recorded parents from the requested backup back to the full backup that starts
+        # its chain. Timestamps alone are not enough: a full backup taken between two increments
+        # does not become the parent of the later one.
+        chain = []
+        while True:
+            index = load_archive_index(backup['path'], remote)
+            archive_manifest = _read_archive_manifest(backup['path'], index, remote)
+            chain.append((backup, index, archive_manifest))
+            if archive_manifest is None:
+                if backup['incremental']:
+                    raise ValueError(f"Incremental backup '{backup['path'].name}' does not record the backup it is based on.")
+                break
+            parent = by_path.get(backup_root_dir / archive_manifest['parent'])
+            if parent is None:
+                raise ValueError(f"'{backup['path'].name}' is based on '{archive_manifest['parent']}', which no longer exists.")
+            backup = parent
+        chain.reverse()
+
+        logging.info(f"Applying {len(chain)} archive(s)...")
+        restored_count = 0
+        for backup, index, archive_manifest in chain:
+            logging.info(f"Applying backup: {backup['path']}")
+            members = [m for m in index['members'] if m['name'] != ARCHIVE_MANIFEST_NAME]
+            selected = [m for m in members if _matches_restore_paths(m['name'], restore_paths)]
+            restored_count += _restore_archive_members(backup['path'], index, selected, destination, remote)
+            if archive_manifest:
+                for deleted_path in archive_manifest['deleted']:
+                    if not _matches_restore_paths(deleted_path, restore_paths):
+                        continue
+                    target = (destination / deleted_path).resolve()
+                    if target.is_relative_to(destination) and target.is_file():
+                        target.unlink()
+        if restore_paths and restored_count == 0:
+            logging.warning(f"No files in the backup matched {', '.join(restore_paths)}.")
+        logging.info(f"Restore completed successfully into '{destination}'.")
+        return True
+    except (OSError, ValueError, KeyError, RuntimeError, zlib.error, zipfile.BadZipFile) as e:
+        logging.error(f"Error restoring backup: {e}")
+        return False
+
+# --- Verification ---
+def _verify_range(archive_path, offset, length, compress_type):
+    """
+    Decompresses a member, or one independently compressed block of it, and returns what it
+    actually contains. Runs inside a worker process when more than one worker is used.
+
+    Returns:
+        tuple: (crc32, uncompressed_length, block_digests, error message or None)
+    """
+    try:
+        with _open_archive(archive_path) as f:
+            f.seek(offset)
+            crc, size, block_digests = _decode_member_data(f, length, compress_type)
+        return crc, size, block_digests, None
+    except Exception as e:
+        return 0, 0, [], str(e) or type(e).__name__
+
+def verify_backup(archive_path, workers=1):
+    """
+    Checks the CRC and content hash of every member of a local archive against its index.
+
+    Members are checked in parallel; large members written by the parallel compression engine
+    are split into their blocks, so even a single huge file is spread across all workers.
+
+    Args:
+        archive_path (Path): The archive to verify.
+        workers (int): Number of processes to use. 0 uses every available core.
+
+    Returns:
+        bool: True if every member is intact, False otherwise.
+    """
+    archive_path = Path(archive_path)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    try:
+        index = load_archive_index(archive_path)
+    except (OSError, ValueError, RuntimeError, zipfile.BadZipFile) as e:
+        logging.error(f"Could not read the index of '{archive_path}': {e}")
+        return False
+    if not _index_path(archive_path).exists():
+        logging.warning(f"'{archive_path.name}' has no index file. Only CRCs are checked.")
+
+    # One task per member, or per block for members whose blocks can be decompressed on their own
+    tasks = []
+    for member in index['members']:
+        bounds = member.get('block_offsets', [0]) + [member['compress_size']]
+        for start, end in zip(bounds, bounds[1:]):
+            tasks.append((str(archive_path), member['offset'] + start, end - start, member['compress_type']))
+
+    logging.info(f"Verifying '{archive_path}' ({len(index['members'])} members) using {workers} worker(s)...")
+    start_time = time.perf_counter()
+    bad_members = 0
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as pool:
+        results = pool.map(_verify_range, *zip(*tasks), chunksize=16) if pool and tasks else itertools.starmap(_verify_range, tasks)
+        for member in index['members']:
+            crc = size = 0
+            block_digests = []
+            errors = []
+            for _ in range(len(member.get('block_offsets', [0]))):
+                part_crc, part_size, part_digests, error = next(results)
+                crc = _crc32_combine(crc, part_crc, part_size)
+                size += part_size
+                block_digests.extend(part_digests)
+                if error:
+                    errors.append(error)
+            if not errors:
+                if size != member['file_size']:
+                    errors.append(f"size {size} does not match {member['file_size']}")
+                if crc != member['crc']:
+                    errors.append("CRC mismatch")
+                if 'blocks' in member:
+                    bad_blocks = [i for i, (digest, expected) in enumerate(itertools.zip_longest(block_digests, member['blocks']))
+                                  if digest is None or expected is None or digest.hex() != expected]
+                    if bad_blocks:
+                        errors.append(f"content hash mismatch in block(s) {', '.join(map(str, bad_blocks[:10]))}")
+            if errors:
+                bad_members += 1
+                logging.error(f"Member '{member['name']}' of '{archive_path.name}' is corrupt: {'; '.join(errors)}")
+    elapsed = time.perf_counter() - start_time
+    if bad_members:
+        logging.error(f"Verification of '{archive_path}' failed: {bad_members} of {len(index['members'])} members are corrupt.")
+        return False
+    logging.info(f"Verified '{archive_path}': all {len(index['members'])} members are intact ({elapsed:.2f} s).")
+    return True
+
+def verify_backups(local_backup_base_dir, project_name, workers=0):
+    """
+    Verifies every local ZIP backup of a project recorded in the catalog.
+
+    Returns:
+        bool: True if every backup is intact, False otherwise.
+    """
+    backup_root_dir = Path(local_backup_base_dir).expanduser() / project_name
+    conn = _open_catalog(backup_root_dir)
+    try:
+        rows = conn.execute(
+            "SELECT path FROM backups WHERE kind IN ('full', 'incremental') AND local = 1 ORDER BY created DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        logging.error(f"No local backups of '{project_name}' found to verify.")
+        return False
+    results = [verify_backup(backup_root_dir / path, workers) for path, in rows]
+    return all(results)
+
 # --- Notification ---
-def send_notification(webhook_url, project_name, backup_date, success_status):
+def send_notification(webhook_url, project_name, backup_date, success_status, metrics=None):
     """
     Sends a POST cURL request to a specified webhook URL.
 
@@ -254,6 +2879,7 @@ def send_notification(webhook_url, project_name, backup_date, success_status):
         project_name (str): The name of the project.
         backup_date (str): The timestamp of the backup (ISO format).
         success_status (bool): True if the backup was successful, False otherwise.
+        metrics (dict or None): Metrics of the backup run, included in the payload.
     
     Returns:
         bool: True if notification was sent successfully, False otherwise.
@@ -267,6 +2893,8 @@ def send_notification(webhook_url, project_name, backup_date, success_status):
         "date": backup_date,
         "status": "BackupSuccessful" if success_status else "BackupFailed"
     }
+    if metrics:
+        payload["metrics"] = metrics
     headers = {"Content-Type": "application/json"}
 
     logging.info(f"Sending notification to {webhook_url} with status: {payload['status']}...")
@@ -285,48 +2913,120 @@ def send_notification(webhook_url, project_name, backup_date, success_status):
         logging.error(f"An unexpected error occurred while sending notification: {e}")
         return False
 
-# --- Main Script Logic ---
-def main():
+# --- Backup Orchestration ---
+def _resume_pending_uploads(backup_root_dir, rclone_remote_name, google_drive_folder_name, bwlimit=None, metrics=None,
+                            transfers=4, retries=3):
     """
-    Main function to parse arguments, load config, and orchestrate the backup process.
+    Finishes uploading split archives whose upload was interrupted by an earlier run.
+
+    Only the volumes the volume manifest does not mark as uploaded are sent again.
     """
-    parser = argparse.ArgumentParser(description="Automated Backup and Rotation Script with Google Drive Integration.")
-    parser.add_argument("--config", required=True, help="Path to the configuration JSON file.")
-    parser.add_argument("--project-path", required=True, help="Path to the project directory to be backed up.")
-    parser.add_argument("--no-notify", action="store_true", help="Disable sending cURL notification.")
-    args = parser.parse_args()
+    try:
+        conn = _open_catalog(backup_root_dir)
+        try:
+            rows = conn.execute(
+                "SELECT path FROM backups WHERE kind IN ('full', 'incremental') AND uploaded = 0 AND local = 1 ORDER BY created"
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.error(f"Error reading pending uploads from the catalog: {e}")
+        return
+    for path, in rows:
+        archive_path = backup_root_dir / path
+        if not _volumes_path(archive_path).exists():
+            continue
+        logging.info(f"Resuming interrupted upload of '{archive_path.name}'...")
+        if upload_to_gdrive(archive_path, rclone_remote_name, google_drive_folder_name, bwlimit, metrics, transfers, retries):
+            mark_backup_uploaded(backup_root_dir, archive_path)
 
-    config = load_config(args.config)
+def run_backup(config, project_path, notify=True, executor=None, read_limiter=None, upload_slots=None, bwlimit=None):
+    """
+    Runs the complete backup process for one project: creation, upload, retention and notification.
 
+    Args:
+        config (dict): The project's configuration settings.
+        project_path (str): Path to the project directory to be backed up.
+        notify (bool): Whether to send the webhook notification.
+        executor (ProcessPoolExecutor or None): A compression pool shared with other projects.
+        read_limiter (_RateLimiter or None): Caps the rate at which project files are read.
+        upload_slots (threading.Semaphore or None): Limits how many projects upload at the same time.
+        bwlimit (str or None): rclone --bwlimit value for each upload, e.g. '10M'.
+
+    Returns:
+        bool: True if the backup was created and uploaded successfully, False otherwise.
+    """
     project_name = config.get("project_name")
     local_backup_base_dir = config.get("local_backup_base_dir", str(Path.home() / "backups")) # Default to ~/backups
     rclone_remote_name = config.get("rclone_remote_name")
     google_drive_folder_name = config.get("google_drive_folder_name")
     retention_settings = config.get("retention", {"daily": 7, "weekly": 4, "monthly": 3})
     webhook_url = config.get("webhook_url")
+    workers = config.get("workers", 1)
+    backup_mode = config.get("backup_mode", "full")
+    backend = config.get("storage_backend", "zip")
+    stream_upload = config.get("stream_upload", False)
+    volume_size = int(config.get("volume_size_mib", 0) * 1024 * 1024) or None
+    upload_transfers = config.get("upload_transfers", 4)
+    upload_retries = config.get("upload_retries", 3)
+    file_filter = load_file_filter(config)
+    walk_workers = config.get("walk_workers", 1)
+    upload_slot = upload_slots or nullcontext()
+    metrics = BackupMetrics(project_name)
 
-    # Validate essential configuration parameters
-    if not all([project_name, rclone_remote_name, google_drive_folder_name]):
-        logging.error("Missing essential configuration parameters (project_name, rclone_remote_name, google_drive_folder_name). Please check your config.json.")
-        exit(1)
-
-    # Setup logging. The log file will be inside the project's backup base directory.
-    log_file_path = Path(local_backup_base_dir).expanduser() / project_name / "backup.log"
-    log_file_path.parent.mkdir(parents=True, exist_ok=True) # Ensure the directory for the log file exists
-    setup_logging(log_file_path)
-    
     logging.info(f"Starting backup process for project: {project_name}")
-    logging.info(f"Project path: {args.project_path}")
+    logging.info(f"Project path: {project_path}")
 
     backup_filepath = None
     backup_success = False
     
     try:
-        backup_filepath = create_backup(args.project_path, local_backup_base_dir, project_name)
+        compression_policy = load_compression_policy(config.get("compression", {}))
+        if backend != "chunkstore" and not stream_upload:
+            with upload_slot, metrics.stage("upload"):
+                _resume_pending_uploads(Path(local_backup_base_dir).expanduser() / project_name, rclone_remote_name,
+                                        google_drive_folder_name, bwlimit, metrics, upload_transfers, upload_retries)
+
+        if backend == "chunkstore":
+            with metrics.stage("create"):
+                backup_filepath = create_snapshot(project_path, local_backup_base_dir, project_name, workers, executor,
+                                                  read_limiter, metrics, file_filter, walk_workers)
+        elif stream_upload:
+            if volume_size:
+                logging.warning("Split volumes are not supported with streaming upload. The archive is streamed as one file.")
+            # Only keep a local copy if the retention policy would keep this backup anyway
+            keep_local = config.get("stream_keep_local", _retention_keeps_new_backup(retention_settings, datetime.datetime.now()))
+            with upload_slot, metrics.stage("create"):
+                backup_filepath = create_backup(project_path, local_backup_base_dir, project_name, workers, backup_mode,
+                                                f"{rclone_remote_name}:{google_drive_folder_name}", keep_local,
+                                                compression_policy, executor, read_limiter, bwlimit, metrics,
+                                                file_filter=file_filter, walk_workers=walk_workers)
+        else:
+            with metrics.stage("create"):
+                backup_filepath = create_backup(project_path, local_backup_base_dir, project_name, workers, backup_mode,
+                                                compression_policy=compression_policy, executor=executor,
+                                                read_limiter=read_limiter, metrics=metrics, volume_size=volume_size,
+                                                file_filter=file_filter, walk_workers=walk_workers)
         
         if backup_filepath:
-            upload_status = upload_to_gdrive(backup_filepath, rclone_remote_name, google_drive_folder_name)
+            if stream_upload and backend != "chunkstore":
+                # The archive was uploaded while it was being created, only its index is left
+                with upload_slot, metrics.stage("upload"):
+                    upload_status = upload_to_gdrive(_index_path(backup_filepath), rclone_remote_name, google_drive_folder_name,
+                                                     bwlimit, metrics)
+                if upload_status and not backup_filepath.exists():
+                    _index_path(backup_filepath).unlink()
+            else:
+                with upload_slot, metrics.stage("upload"):
+                    if backend == "chunkstore":
+                        upload_status = upload_snapshot_to_gdrive(backup_filepath, rclone_remote_name, google_drive_folder_name,
+                                                                  bwlimit, metrics)
+                    else:
+                        upload_status = upload_to_gdrive(backup_filepath, rclone_remote_name, google_drive_folder_name,
+                                                         bwlimit, metrics, upload_transfers, upload_retries)
             if upload_status:
+                if not stream_upload or backend == "chunkstore":
+                    mark_backup_uploaded(Path(local_backup_base_dir).expanduser() / project_name, backup_filepath)
                 logging.info("Backup successfully created and uploaded.")
                 backup_success = True
             else:
@@ -339,20 +3039,221 @@ def main():
 
     # Apply retention policy regardless of backup/upload success, as it cleans up old files.
     try:
-        apply_retention_policy(local_backup_base_dir, project_name, retention_settings)
+        with metrics.stage("retention"):
+            apply_retention_policy(local_backup_base_dir, project_name, retention_settings, backend, metrics)
     except Exception as e:
         logging.error(f"Error applying retention policy: {e}")
 
+    logging.info(metrics.summary())
+    if config.get("metrics_file"):
+        write_metrics(metrics, config["metrics_file"], config.get("metrics_format", "json"))
+
     # Send notification if not disabled by flag
-    if not args.no_notify:
+    if notify:
         current_date_str = datetime.datetime.now().isoformat()
-        send_notification(webhook_url, project_name, current_date_str, backup_success)
+        send_notification(webhook_url, project_name, current_date_str, backup_success, metrics.to_dict())
     else:
         logging.info("Notification disabled by --no-notify flag.")
 
     logging.info("Backup process completed.")
+    return backup_success
 
-if __name__ == "__main__":
-    main()
+def _estimate_project_size(config, project_path):
+    """
+    Estimates how much work backing up a project is, used to start the largest projects first.
+
+    The size of the project's latest full backup is taken from its catalog when available;
+    otherwise the file sizes of the project tree are added up.
+    """
+    backup_root_dir = Path(config.get("local_backup_base_dir", str(Path.home() / "backups"))).expanduser() / config["project_name"]
+    if (backup_root_dir / CATALOG_FILENAME).exists():
+        try:
+            conn = _open_catalog(backup_root_dir)
+            try:
+                row = conn.execute("SELECT size FROM backups WHERE kind = 'full' ORDER BY created DESC LIMIT 1").fetchone()
+            finally:
+                conn.close()
+            if row:
+                return row[0]
+        except sqlite3.Error:
+            pass
+    total = 0
+    for file_path, _ in _iter_project_files(project_path, load_file_filter(config), config.get("walk_workers", 1)):
+        try:
+            total += os.path.getsize(file_path)
+        except OSError:
+            pass
+    return total
+
+def run_batch(config, notify=True):
+    """
+    Backs up every project listed in the config's 'projects' section under one scheduler.
+
+    Projects share one compression process pool and run concurrently, so one project can upload
+    while another is still compressing. Disk reads and uploads are capped globally by the optional
+    'batch' settings, and the largest projects are started first so the batch finishes sooner.
+
+    Args:
+        config (dict): The configuration. Each entry of 'projects' must have 'project_name' and
+            'project_path' and may override any other top-level setting.
+        notify (bool): Whether to send a webhook notification per project.
+
+    Returns:
+        bool: True if every project was backed up successfully, False otherwise.
+    """
+    batch_settings = config.get("batch", {})
+    pool_size = batch_settings.get("workers") or os.cpu_count() or 1
+    max_parallel_projects = batch_settings.get("max_parallel_projects", 2)
+    max_parallel_uploads = batch_settings.get("max_parallel_uploads", 1)
+    read_limit = batch_settings.get("max_read_mib_per_s")
+    upload_limit = batch_settings.get("max_upload_mib_per_s")
+
+    read_limiter = _RateLimiter(read_limit * 1024 * 1024) if read_limit else None
+    upload_slots = threading.Semaphore(max_parallel_uploads)
+    # rclone limits each transfer separately, so split the global cap across the upload slots
+    bwlimit = f"{upload_limit / max_parallel_uploads:.2f}M" if upload_limit else None
+
+    base_settings = {key: value for key, value in config.items() if key not in ("projects", "batch")}
+    projects = []
+    for project in config.get("projects", []):
+        project_config = {**base_settings, **project, "workers": pool_size}
+        if not all([project_config.get("project_name"), project_config.get("project_path"),
+                    project_config.get("rclone_remote_name"), project_config.get("google_drive_folder_name")]):
+            logging.error(f"Skipping incomplete project entry in batch config: {project}")
+            continue
+        projects.append((_estimate_project_size(project_config, project_config["project_path"]), project_config))
+    projects.sort(key=lambda x: x[0], reverse=True)
+
+    logging.info(f"Starting batch backup of {len(projects)} projects ({max_parallel_projects} at a time, {pool_size} compression workers).")
+    results = {}
+
+    def backup_one(project_config):
+        threading.current_thread().name = project_config["project_name"]
+        return run_backup(project_config, project_config["project_path"], notify,
+                          executor, read_limiter, upload_slots, bwlimit)
+
+    # Forked workers would inherit the pipes of streaming uploads started by other projects and keep
+    # them open after the upload finishes, so the long-lived shared pool starts its workers fresh.
+    with ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn")) as executor:
+        with ThreadPoolExecutor(max_workers=max_parallel_projects) as scheduler:
+            futures = {scheduler.submit(backup_one, project_config): project_config["project_name"]
+                       for _, project_config in projects}
+            for future, project_name in futures.items():
+                try:
+                    results[project_name] = future.result()
+                except Exception as e:
+                    logging.critical(f"Backup of project '{project_name}' failed: {e}")
+                    results[project_name] = False
+
+    failed = [name for name, success in results.items() if not success]
+    logging.info(f"Batch backup completed: {len(results) - len(failed)} succeeded, {len(failed)} failed{': ' + ', '.join(failed) if failed else ''}.")
+    return not failed and len(results) == len(config.get("projects", []))
+
+# --- Main Script Logic ---
+def main():
+    """
+    Main function to parse arguments, load config, and orchestrate the backup process.
+    """
+    parser = argparse.ArgumentParser(description="Automated Backup and Rotation Script with Google Drive Integration.")
+    parser.add_argument("--config", required=True, help="Path to the configuration JSON file.")
+    parser.add_argument("--project-path", help="Path to the project directory to be backed up. Required unless --batch, --restore, --verify or --reconcile-catalog is used.")
+    parser.add_argument("--no-notify", action="store_true", help="Disable sending cURL notification.")
+    parser.add_argument("--workers", type=int, help="Number of processes used to compress files (0 = all cores). Overrides 'workers' in the config.")
+    parser.add_argument("--mode", choices=["full", "incremental"], help="Backup mode. Overrides 'backup_mode' in the config (default: full).")
+    parser.add_argument("--backend", choices=["zip", "chunkstore"], help="Storage backend. Overrides 'storage_backend' in the config (default: zip).")
+    parser.add_argument("--stream", action="store_true", help="Stream the archive to Google Drive while it is being created (zip backend only).")
+    parser.add_argument("--exclude", metavar="PATTERN", action="append", help="Do not back up files or directories matching this .gitignore-style pattern. Can be repeated; added to 'exclude' in the config.")
+    parser.add_argument("--walk-workers", type=int, help="Number of threads scanning the project tree. Overrides 'walk_workers' in the config (default: 1).")
+    parser.add_argument("--volume-size", type=float, metavar="MIB", help="Split the archive into volumes of this many MiB. Overrides 'volume_size_mib' in the config.")
+    parser.add_argument("--batch", action="store_true", help="Back up every project listed in the config's 'projects' section.")
+    parser.add_argument("--restore", metavar="DEST_DIR", help="Restore the project into DEST_DIR instead of creating a backup.")
+    parser.add_argument("--restore-at", metavar="YYYYMMDD_HHMMSS", help="With --restore, restore the state as of this time instead of the newest backup.")
+    parser.add_argument("--restore-path", metavar="PATH", action="append", help="With --restore, only restore this file, directory or glob pattern. Can be repeated.")
+    parser.add_argument("--verify", metavar="ARCHIVE", nargs="?", const="", help="Verify the given archive, or every local backup of the project, and exit.")
+    parser.add_argument("--reconcile-catalog", action="store_true", help="Rebuild the backup catalog from the backups on disk and exit.")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Minimum level to log. Overrides 'log_level' in the config (default: INFO).")
+    parser.add_argument("--metrics-file", help="Write the metrics of the backup run to this file. Overrides 'metrics_file' in the config.")
+    parser.add_argument("--metrics-format", choices=["json", "prometheus"], help="Format of the metrics file. Overrides 'metrics_format' in the config (default: json).")
+    args = parser.parse_args()
+    if not (args.batch or args.restore or args.verify is not None or args.reconcile_catalog or args.project_path):
+        parser.error("--project-path is required unless --batch, --restore, --verify or --reconcile-catalog is used.")
+
+    config = load_config(args.config)
+
+    # Command-line options take precedence over the config file
+    if args.workers is not None:
+        config["workers"] = args.workers
+    if args.mode:
+        config["backup_mode"] = args.mode
+    if args.backend:
+        config["storage_backend"] = args.backend
+    if args.stream:
+        config["stream_upload"] = True
+    if args.exclude:
+        config["exclude"] = config.get("exclude", []) + args.exclude
+    if args.walk_workers is not None:
+        config["walk_workers"] = args.walk_workers
+    if args.volume_size is not None:
+        config["volume_size_mib"] = args.volume_size
+    if args.log_level:
+        config["log_level"] = args.log_level
+    if args.metrics_file:
+        config["metrics_file"] = args.metrics_file
+    if args.metrics_format:
+        config["metrics_format"] = args.metrics_format
+    log_level = config.get("log_level", "INFO")
+
+    if args.batch:
+        local_backup_base_dir = config.get("local_backup_base_dir", str(Path.home() / "backups"))
+        log_file_path = Path(local_backup_base_dir).expanduser() / "batch.log"
+        log_file_path.parent.mkdir(parents=True, exist_ok=True)
+        setup_logging(log_file_path, '%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s', log_level)
+        if not config.get("projects"):
+            logging.error("No 'projects' configured for --batch. Please check your config.json.")
+            exit(1)
+        exit(0 if run_batch(config, not args.no_notify) else 1)
+
+    project_name = config.get("project_name")
+    local_backup_base_dir = config.get("local_backup_base_dir", str(Path.home() / "backups")) # Default to ~/backups
+    rclone_remote_name = config.get("rclone_remote_name")
+    google_drive_folder_name = config.get("google_drive_folder_name")
+    backend = config.get("storage_backend", "zip")
+
+    # Validate essential configuration parameters
+    if not all([project_name, rclone_remote_name, google_drive_folder_name]):
+        logging.error("Missing essential configuration parameters (project_name, rclone_remote_name, google_drive_folder_name). Please check your config.json.")
+        exit(1)
+
+    # Setup logging. The log file will be inside the project's backup base directory.
+    log_file_path = Path(local_backup_base_dir).expanduser() / project_name / "backup.log"
+    log_file_path.parent.mkdir(parents=True, exist_ok=True) # Ensure the directory for the log file exists
+    setup_logging(log_file_path, level=log_level)
+
+    if args.restore:
+        point_in_time = None
+        if args.restore_at:
+            try:
+                point_in_time = datetime.datetime.strptime(args.restore_at, "%Y%m%d_%H%M%S")
+            except ValueError:
+                logging.error(f"Invalid --restore-at value '{args.restore_at}'. Expected YYYYMMDD_HHMMSS.")
+                exit(1)
+        exit(0 if restore_backup(local_backup_base_dir, project_name, args.restore, point_in_time, backend,
+                                 args.restore_path, f"{rclone_remote_name}:{google_drive_folder_name}") else 1)
 
+    if args.verify is not None:
+        if backend != "zip":
+            logging.error("--verify is only supported by the zip backend.")
+            exit(1)
+        # Verification is meant to use every core unless told otherwise
+        workers = args.workers if args.workers is not None else 0
+        if args.verify:
+            exit(0 if verify_backup(args.verify, workers) else 1)
+        exit(0 if verify_backups(local_backup_base_dir, project_name, workers) else 1)
 
+    if args.reconcile_catalog:
+        exit(0 if reconcile_catalog(local_backup_base_dir, project_name) else 1)
+
+    run_backup(config, args.project_path, not args.no_notify)
+
+if __name__ == "__main__":
+    main()
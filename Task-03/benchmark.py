@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+import backup
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+# Vocabulary for compressible, source-code-like synthetic text
+WORDS = ["def", "return", "self", "import", "class", "for", "in", "if", "else", "None", "True", "value",
+         "result", "config", "path", "logging", "info", "data", "items", "append", "len", "range", "try",
+         "except", "with", "open", "as", "file", "(", ")", ":", "=", "==", "+", "[", "]", "{", "}", "'key'"]
+
+# --- Synthetic Data ---
+def _text_source(rng, size=1024 * 1024):
+    """Returns a block of source-code-like text from which compressible files are cut."""
+    lines = []
+    total = 0
+    while total < size:
+        line = "    " * rng.randint(0, 3) + " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12))) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines).encode()[:size]
+
+def _text_file(rng, source, size):
+    """Cuts a compressible file of the given size from the text source."""
+    data = bytearray()
+    while len(data) < size:
+        start = rng.randrange(len(source) // 2)
+        data += source[start:start + size - len(data)]
+    return bytes(data)
+
+def generate_mixed_tree(root, scale=1.0, seed=0):
+    """
+    Generates a synthetic project tree with a mix of compressible and incompressible files.
+
+    Args:
+        root (Path): The directory to create the tree in.
+        scale (float): Size multiplier; 1.0 generates 200 files of 256 KiB.
+        seed (int): Seed for the generated content, so that runs are comparable.
+    """
+    rng = random.Random(seed)
+    source = _text_source(rng)
+    file_size = 256 * 1024
+    for i in range(int(200 * scale)):
+        file_dir = root / f"dir{i % 10}"
+        file_dir.mkdir(parents=True, exist_ok=True)
+        if i % 4 == 0:
+            data = rng.randbytes(file_size) # Incompressible, like media or packfiles
+        else:
+            data = _text_file(rng, source, file_size)
+        (file_dir / f"file{i}.dat").write_bytes(data)
+
+def generate_small_files(root, scale=1.0, seed=0):
+    """Many small source files (1-8 KiB) spread over a few hundred directories."""
+    rng = random.Random(seed)
+    source = _text_source(rng)
+    for i in range(int(10000 * scale)):
+        file_dir = root / f"pkg{i % 25}" / f"module{i % 200}"
+        file_dir.mkdir(parents=True, exist_ok=True)
+        (file_dir / f"file{i}.py").write_bytes(_text_file(rng, source, rng.randint(1024, 8 * 1024)))
+
+def generate_huge_files(root, scale=1.0, seed=0):
+    """A few huge files: one compressible log, one incompressible blob."""
+    rng = random.Random(seed)
+    source = _text_source(rng)
+    size = int(64 * 1024 * 1024 * scale)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / "server.log", 'wb') as f:
+        for offset in range(0, size, len(source)):
+            f.write(source[:size - offset])
+    with open(root / "dataset.bin", 'wb') as f:
+        for offset in range(0, size, backup.PARALLEL_CHUNK_SIZE):
+            f.write(rng.randbytes(min(backup.PARALLEL_CHUNK_SIZE, size - offset)))
+
+def generate_incompressible(root, scale=1.0, seed=0):
+    """Medium-sized files of random data, like media files or Git packfiles."""
+    rng = random.Random(seed)
+    for i in range(int(200 * scale)):
+        file_dir = root / f"assets{i % 10}"
+        file_dir.mkdir(parents=True, exist_ok=True)
+        (file_dir / f"asset{i}.bin").write_bytes(rng.randbytes(256 * 1024))
+
+def generate_deep_tree(root, scale=1.0, seed=0):
+    """Small files at the bottom of deeply nested directories."""
+    rng = random.Random(seed)
+    source = _text_source(rng)
+    for i in range(int(2000 * scale)):
+        depth = rng.randint(10, 40)
+        file_dir = root.joinpath(*(f"level{d}_{(i >> (d % 8)) % 3}" for d in range(depth)))
+        file_dir.mkdir(parents=True, exist_ok=True)
+        (file_dir / f"file{i}.txt").write_bytes(_text_file(rng, source, rng.randint(512, 4096)))
+
+DATASETS = {
+    "mixed": generate_mixed_tree,
+    "small-files": generate_small_files,
+    "huge-files": generate_huge_files,
+    "incompressible": generate_incompressible,
+    "deep-nesting": generate_deep_tree,
+}
+
+def generate_backup_history(local_backup_base_dir, project_name, years=3, per_day=1):
+    """
+    Generates a multi-year history of (empty) daily backup archives, ending yesterday,
+    in the layout create_backup uses.
+
+    Returns:
+        int: The number of backups created.
+    """
+    backup_root_dir = Path(local_backup_base_dir) / project_name
+    end = datetime.datetime.now().replace(hour=3, minute=0, second=0, microsecond=0) - datetime.timedelta(days=1)
+    count = 0
+    for day in range(int(365 * years)):
+        day_start = end - datetime.timedelta(days=day)
+        target_dir = backup_root_dir / day_start.strftime("%Y") / day_start.strftime("%m") / day_start.strftime("%d")
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for n in range(per_day):
+            timestamp = (day_start + datetime.timedelta(minutes=n)).strftime("%Y%m%d_%H%M%S")
+            (target_dir / f"{project_name}_{timestamp}.zip").write_bytes(b"")
+            count += 1
+    return count
+
+def tree_size(root):
+    """Returns the total size in bytes of all files below root."""
+    return sum(f.stat().st_size for f in Path(root).rglob('*') if f.is_file())
+
+def tree_file_count(root):
+    """Returns the number of files below root."""
+    return sum(1 for f in Path(root).rglob('*') if f.is_file())
+
+# --- Measurement ---
+def _peak_rss_mb():
+    """Returns the peak resident set size of this process and its finished children, in MB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak * 1024 / 1e6
+
+def _isolated_entry(connection, function_name, args):
+    """Runs a benchmark function in a fresh process and sends back its result and peak RSS."""
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        result = globals()[function_name](*args)
+        result['peak_rss_mb'] = _peak_rss_mb()
+        connection.send(result)
+    except Exception as e:
+        connection.send({'error': str(e)})
+    finally:
+        connection.close()
+
+def run_isolated(function_name, *args):
+    """
+    Runs one benchmark case in a fresh process, so that its peak memory use is measured on
+    its own and earlier cases do not warm its caches or heap.
+    """
+    context = multiprocessing.get_context("spawn")
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_isolated_entry, args=(child_connection, function_name, args))
+    process.start()
+    child_connection.close()
+    try:
+        result = parent_connection.recv()
+    except EOFError:
+        result = {'error': f"benchmark process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+# --- Benchmarks ---
+def case_create(project_path, workers):
+    """Benchmark case: archive a project tree with create_backup."""
+    total_bytes = tree_size(project_path)
+    file_count = tree_file_count(project_path)
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_out_"))
+    try:
+        start = time.perf_counter()
+        archive = backup.create_backup(str(project_path), str(out_dir), "Bench", workers)
+        elapsed = time.perf_counter() - start
+        if not archive:
+            raise RuntimeError("create_backup failed")
+        return {
+            'seconds': elapsed,
+            'mb_per_s': total_bytes / elapsed / 1e6,
+            'files_per_s': file_count / elapsed,
+            'input_bytes': total_bytes,
+            'output_bytes': archive.stat().st_size,
+        }
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def case_retention(years):
+    """Benchmark case: build the catalog for, and apply the retention policy to, a backup history."""
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_hist_"))
+    try:
+        backup_count = generate_backup_history(out_dir, "Bench", years)
+        start = time.perf_counter()
+        backup.reconcile_catalog(str(out_dir), "Bench")
+        catalog_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        backup.apply_retention_policy(str(out_dir), "Bench", {"daily": 7, "weekly": 4, "monthly": 12})
+        elapsed = time.perf_counter() - start
+        return {
+            'seconds': elapsed,
+            'files_per_s': backup_count / elapsed,
+            'catalog_seconds': catalog_seconds,
+            'input_files': backup_count,
+        }
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def case_upload(project_path):
+    """Benchmark case: archive a project tree and upload it with rclone to a local directory."""
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_out_"))
+    remote_dir = Path(tempfile.mkdtemp(prefix="bench_remote_"))
+    try:
+        archive = backup.create_backup(str(project_path), str(out_dir), "Bench")
+        if not archive:
+            raise RuntimeError("create_backup failed")
+        size = archive.stat().st_size
+        start = time.perf_counter()
+        # ':local' is rclone's on-the-fly local filesystem backend, standing in for Google Drive
+        if not backup.upload_to_gdrive(archive, ":local", str(remote_dir)):
+            raise RuntimeError("upload failed")
+        elapsed = time.perf_counter() - start
+        return {'seconds': elapsed, 'mb_per_s': size / elapsed / 1e6, 'input_bytes': size}
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        shutil.rmtree(remote_dir, ignore_errors=True)
+
+# --- Results ---
+def _environment():
+    """Describes the machine and code version a result file was produced with."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': datetime.datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def compare_results(results, baseline, threshold=None):
+    """
+    Prints the change in duration of every case that also appears in a baseline result file.
+
+    Args:
+        results (list): Results of the current run.
+        baseline (dict): A result file written by an earlier run.
+        threshold (float or None): Slowdown in percent above which a case counts as a regression.
+
+    Returns:
+        list: The cases that got slower by more than threshold.
+    """
+    previous = {r['case']: r for r in baseline['results'] if 'seconds' in r}
+    regressions = []
+    print(f"\nCompared with {baseline['environment'].get('commit') or 'baseline'} from {baseline['environment']['date']}:")
+    for result in results:
+        before = previous.get(result['case'])
+        if before and 'seconds' in result:
+            change = (result['seconds'] - before['seconds']) / before['seconds'] * 100
+            regressed = threshold is not None and change > threshold
+            print(f"  {result['case']:<40} {before['seconds']:8.2f} s -> {result['seconds']:8.2f} s  ({change:+.1f}%)"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(result['case'])
+    return regressions
+
+def _format_result(result):
+    """Formats one result for the console."""
+    if 'error' in result:
+        return f"{result['case']:<40} FAILED: {result['error']}"
+    parts = [f"{result['case']:<40} {result['seconds']:8.2f} s"]
+    if 'mb_per_s' in result:
+        parts.append(f"{result['mb_per_s']:8.1f} MB/s")
+    if 'files_per_s' in result:
+        parts.append(f"{result['files_per_s']:9.0f} files/s")
+    if result.get('peak_rss_mb') is not None:
+        parts.append(f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    return "  ".join(parts)
+
+def main():
+    """
+    Runs the benchmark suite: archive creation on several synthetic trees and worker counts,
+    retention on a multi-year backup history, and upload to a local stand-in remote.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark suite for backup.py.")
+    parser.add_argument("--source", help="Existing project tree to archive instead of the synthetic datasets.")
+    parser.add_argument("--datasets", nargs='+', choices=sorted(DATASETS), default=sorted(DATASETS), help="Synthetic datasets to use.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Size multiplier for the synthetic datasets.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic datasets.")
+    parser.add_argument("--workers", type=int, nargs='+', default=[1, os.cpu_count() or 1], help="Worker counts to compare.")
+    parser.add_argument("--history-years", type=float, default=3, help="Length of the synthetic backup history for the retention benchmark (0 to skip).")
+    parser.add_argument("--no-upload", action="store_true", help="Skip the upload benchmark, which requires rclone.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A results file from an earlier run to compare against.")
+    parser.add_argument("--fail-above", type=float, metavar="PERCENT", help="With --compare, exit with status 1 if a case got slower by more than this.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    workers_list = list(dict.fromkeys(args.workers))
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_src_"))
+    results = []
+
+    def record(case, result):
+        result['case'] = case
+        results.append(result)
+        print(_format_result(result))
+
+    try:
+        if args.source:
+            trees = {"source": Path(args.source)}
+        else:
+            trees = {}
+            for name in args.datasets:
+                trees[name] = work_dir / name
+                print(f"Generating dataset '{name}'...")
+                DATASETS[name](trees[name], args.scale, args.seed)
+        print(f"Running on {os.cpu_count()} CPUs, Python {platform.python_version()}\n")
+
+        for name, tree in trees.items():
+            for workers in workers_list:
+                record(f"create/{name}/workers={workers}", run_isolated("case_create", str(tree), workers))
+
+        if args.history_years > 0:
+            record(f"retention/{args.history_years:g}y-daily", run_isolated("case_retention", args.history_years))
+
+        if not args.no_upload:
+            if shutil.which("rclone"):
+                name, tree = next(iter(trees.items()))
+                record(f"upload/{name}", run_isolated("case_upload", str(tree)))
+            else:
+                print("Skipping the upload benchmark: rclone is not installed.")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': _environment(), 'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to '{args.output}'.")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(results, json.load(f), args.fail_above)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) got slower by more than {args.fail_above:g}%.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
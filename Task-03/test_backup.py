@@ -0,0 +1,257 @@
+import os
+import time
+import hashlib
+import datetime
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import backup
+
+NO_RETENTION = {'daily': 1, 'weekly': 0, 'monthly': 0}
+
+class MixedBackupModesTest(unittest.TestCase):
+    """An incremental backup taken after a full one is based on the full one."""
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="test_backup_"))
+        self.project = self.work_dir / "project"
+        self.project.mkdir()
+        self.backups = self.work_dir / "backups"
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def _backup(self, mode):
+        # Archive names have a resolution of one second
+        time.sleep(1.1)
+        path = backup.create_backup(str(self.project), str(self.backups), "Project", mode=mode)
+        self.assertIsNotNone(path)
+        return path
+
+    def _create_mixed_history(self):
+        (self.project / "a.txt").write_text("first")
+        (self.project / "b.txt").write_text("unchanged")
+        base = self._backup("incremental") # No manifest yet, so this is a full backup
+        (self.project / "a.txt").write_text("second")
+        full = self._backup("full")
+        (self.project / "a.txt").write_text("third")
+        (self.project / "b.txt").unlink()
+        increment = self._backup("incremental")
+        return base, full, increment
+
+    def _assert_restores_latest(self):
+        destination = self.work_dir / "restored"
+        self.assertTrue(backup.restore_backup(str(self.backups), "Project", str(destination)))
+        self.assertEqual((destination / "a.txt").read_text(), "third")
+        self.assertFalse((destination / "b.txt").exists())
+
+    def test_restore_follows_recorded_parent(self):
+        self._create_mixed_history()
+        self._assert_restores_latest()
+
+    def test_full_backup_starts_a_new_chain(self):
+        base, full, increment = self._create_mixed_history()
+        self.assertEqual(backup._read_backup_parent(self.backups / "Project", increment), full)
+
+    def test_retention_reads_parents_from_the_catalog(self):
+        base, full, increment = self._create_mixed_history()
+        read_manifest = backup._read_archive_manifest
+        def unexpected(*args, **kwargs):
+            raise AssertionError("archive read during retention")
+        backup._read_archive_manifest = unexpected
+        try:
+            backup.apply_retention_policy(str(self.backups), "Project", NO_RETENTION)
+        finally:
+            backup._read_archive_manifest = read_manifest
+        self.assertTrue(full.exists())
+        self.assertTrue(increment.exists())
+
+    def test_retention_backfills_parents_of_reconciled_backups(self):
+        base, full, increment = self._create_mixed_history()
+        (self.backups / "Project" / backup.CATALOG_FILENAME).unlink()
+        self.assertTrue(backup.reconcile_catalog(str(self.backups), "Project"))
+        backup.apply_retention_policy(str(self.backups), "Project", NO_RETENTION)
+        self.assertFalse(base.exists())
+        self.assertTrue(full.exists())
+        conn = backup._open_catalog(self.backups / "Project")
+        try:
+            parents = conn.execute("SELECT parent FROM backups WHERE kind = 'incremental'").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(parents, [(full.relative_to(self.backups / "Project").as_posix(),)])
+
+    def test_retention_keeps_full_backup_as_parent(self):
+        base, full, increment = self._create_mixed_history()
+        backup.apply_retention_policy(str(self.backups), "Project", NO_RETENTION)
+        self.assertFalse(base.exists())
+        self.assertTrue(full.exists())
+        self.assertTrue(increment.exists())
+        self._assert_restores_latest()
+
+class BackupNameTest(unittest.TestCase):
+    """Project names may contain underscores."""
+
+    def test_parse_timestamp_after_underscored_project_name(self):
+        expected = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        self.assertEqual(backup._parse_backup_datetime("My_Project_20240102_030405.zip"), expected)
+        self.assertEqual(backup._parse_backup_datetime("My_Project_20240102_030405_incr.zip"), expected)
+        self.assertIsNone(backup._parse_backup_datetime("My_Project.zip"))
+
+    def test_backup_of_underscored_project_is_cataloged(self):
+        work_dir = Path(tempfile.mkdtemp(prefix="test_backup_"))
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        (work_dir / "project").mkdir()
+        (work_dir / "project" / "a.txt").write_text("data")
+        path = backup.create_backup(str(work_dir / "project"), str(work_dir / "backups"), "My_Project")
+        self.assertIsNotNone(path)
+        conn = backup._open_catalog(work_dir / "backups" / "My_Project")
+        try:
+            rows = conn.execute("SELECT path, kind, sha256 FROM backups").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(rows, [(path.relative_to(work_dir / "backups" / "My_Project").as_posix(), "full",
+                                 hashlib.sha256(path.read_bytes()).hexdigest())])
+
+class UploadBandwidthTest(unittest.TestCase):
+    """Concurrent volume transfers share one bandwidth limit."""
+
+    def test_split_bwlimit(self):
+        self.assertEqual(backup._split_bwlimit("10M", 4), "2.5M")
+        self.assertEqual(backup._split_bwlimit("512", 2), "256K")
+        self.assertIsNone(backup._split_bwlimit("10M:5M", 2))
+        self.assertIsNone(backup._split_bwlimit("08:00,512k 12:00,off", 2))
+
+class RoundTripTest(unittest.TestCase):
+    """Archives from the serial and the parallel writer extract to the original files."""
+
+    POLICY = {'rules': [{'glob': '*.sql', 'codec': 'bzip2', 'level': 9}, {'glob': '*.log', 'codec': 'lzma'}]}
+
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp(prefix="test_backup_"))
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        project = self.work_dir / "project"
+        (project / "sub").mkdir(parents=True)
+        self.files = {
+            "text.txt": b"line of text\n" * 500000,          # Several deflate chunks
+            "random.bin": os.urandom(backup.PARALLEL_CHUNK_SIZE + 1000), # Stored
+            "sub/dump.sql": b"INSERT INTO t VALUES (1);\n" * 20000,
+            "sub/app.log": b"INFO started\n" * 20000,
+            "empty.txt": b"",
+        }
+        for name, data in self.files.items():
+            (project / name).write_bytes(data)
+
+    def _assert_round_trip(self, workers):
+        path = backup.create_backup(str(self.work_dir / "project"), str(self.work_dir / f"backups{workers}"), "Project",
+                                    workers=workers, compression_policy=backup.load_compression_policy(self.POLICY))
+        self.assertIsNotNone(path)
+        with backup.zipfile.ZipFile(path) as zipf:
+            self.assertIsNone(zipf.testzip())
+            self.assertEqual({name: zipf.read(name) for name in zipf.namelist()}, self.files)
+            self.assertEqual(zipf.getinfo("sub/dump.sql").compress_type, backup.zipfile.ZIP_BZIP2)
+            self.assertEqual(zipf.getinfo("sub/app.log").compress_type, backup.zipfile.ZIP_LZMA)
+        self.assertTrue(backup.verify_backup(path, workers=2))
+
+    def test_serial_writer(self):
+        self._assert_round_trip(1)
+
+    def test_parallel_writer(self):
+        self._assert_round_trip(2)
+
+    def test_parallel_writer_without_zipfile_internals(self):
+        internals = backup.ZIPFILE_INTERNALS
+        backup.ZIPFILE_INTERNALS = internals + ((backup.zipfile, '_removed_in_a_future_python'),)
+        try:
+            with self.assertLogs(level="WARNING") as logs:
+                self._assert_round_trip(2)
+        finally:
+            backup.ZIPFILE_INTERNALS = internals
+        self.assertIn("Compressing serially", "\n".join(logs.output))
+
+class CompressionPolicyTest(unittest.TestCase):
+    """Compression levels and codecs the running Python cannot honor are reported."""
+
+    def test_level_of_lzma_is_dropped(self):
+        with self.assertLogs(level="WARNING"):
+            policy = backup.load_compression_policy({'rules': [{'glob': '*.log', 'codec': 'lzma', 'level': 9}]})
+        self.assertEqual(policy['rules'], [('*.log', backup.zipfile.ZIP_LZMA, None)])
+
+    def test_level_of_bzip2_is_kept(self):
+        policy = backup.load_compression_policy({'rules': [{'glob': '*.sql', 'codec': 'bzip2', 'level': 9}]})
+        self.assertEqual(policy['rules'], [('*.sql', backup.zipfile.ZIP_BZIP2, 9)])
+
+    @unittest.skipIf(hasattr(backup.zipfile, 'ZIP_ZSTANDARD'), "zstd is available")
+    def test_unavailable_zstd_is_an_error(self):
+        with self.assertRaisesRegex(ValueError, "3.14"):
+            backup.load_compression_policy({'rules': [{'glob': '*.csv', 'codec': 'zstd'}]})
+
+class ChunkBoundaryTest(unittest.TestCase):
+    """The vectorized boundary search finds the same chunks as the pure Python loop."""
+
+    @unittest.skipIf(backup.np is None, "numpy is not installed")
+    def test_numpy_matches_pure_python(self):
+        text = b"def value(self):\n    return self.data[0]\n" * 100000
+        for data in (os.urandom(backup.CDC_MAX_SIZE), text[:backup.CDC_MAX_SIZE], os.urandom(backup.CDC_MIN_SIZE + 100)):
+            expected = backup._find_chunk_boundary_numpy(data, min(len(data), backup.CDC_MAX_SIZE))
+            numpy = backup.np
+            backup.np = None
+            try:
+                self.assertEqual(backup._find_chunk_boundary(data), expected)
+            finally:
+                backup.np = numpy
+
+class SnapshotStateTest(unittest.TestCase):
+    """A snapshot only becomes visible once the chunks it uses are counted."""
+
+    def test_snapshot_is_not_published_before_its_references_are_saved(self):
+        work_dir = Path(tempfile.mkdtemp(prefix="test_backup_"))
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        (work_dir / "project").mkdir()
+        (work_dir / "project" / "a.txt").write_text("data")
+        save_state = backup._save_chunkstore_state
+        def interrupted(repository_dir, state):
+            raise OSError("interrupted")
+        backup._save_chunkstore_state = interrupted
+        try:
+            self.assertIsNone(backup.create_snapshot(str(work_dir / "project"), str(work_dir / "backups"), "Project"))
+        finally:
+            backup._save_chunkstore_state = save_state
+        self.assertEqual(list((work_dir / "backups" / "Project" / backup.CHUNKSTORE_DIRNAME / "snapshots").glob("*.json")), [])
+
+class CountingLimiter:
+    """Stands in for _RateLimiter and counts the bytes acquired."""
+
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self, amount):
+        self.acquired += amount
+
+class ReadLimiterTest(unittest.TestCase):
+    """Every read of a project file counts against the read limiter."""
+
+    def test_hashing_and_entropy_samples_are_throttled(self):
+        work_dir = Path(tempfile.mkdtemp(prefix="test_backup_"))
+        self.addCleanup(shutil.rmtree, work_dir, True)
+        (work_dir / "project").mkdir()
+        size = 256 * 1024
+        data_file = work_dir / "project" / "data.bin"
+        data_file.write_bytes(os.urandom(size))
+        limiter = CountingLimiter()
+        self.assertIsNotNone(backup.create_backup(str(work_dir / "project"), str(work_dir / "backups"), "Project",
+                                                  mode="incremental", read_limiter=limiter))
+        # Sampled for its entropy, then archived and hashed in one pass
+        self.assertEqual(limiter.acquired, size + backup.ENTROPY_SAMPLE_SIZE)
+
+        time.sleep(1.1) # Archive names have a resolution of one second
+        data_file.write_bytes(os.urandom(size))
+        limiter.acquired = 0
+        self.assertIsNotNone(backup.create_backup(str(work_dir / "project"), str(work_dir / "backups"), "Project",
+                                                  mode="incremental", read_limiter=limiter))
+        # Hashed to detect the change, sampled for its entropy, then archived
+        self.assertEqual(limiter.acquired, 2 * size + backup.ENTROPY_SAMPLE_SIZE)
+
+if __name__ == "__main__":
+    unittest.main()
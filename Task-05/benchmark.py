@@ -0,0 +1,524 @@
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import logging
+import argparse
+import platform
+import datetime
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from pathlib import Path
+
+import boto3
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, inspect
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+BUCKET = 'bench-sales'
+DATA_KEY = 'bench/product_sales.csv'
+PARTS_PREFIX = 'bench/parts/'
+RDS_TABLE = 'product_sales_bench'
+GLUE_DB = 'bench_db'
+GLUE_TABLE = 'product_sales_bench'
+CASES = ['full', 'stream', 'incremental', 'prefix', 'glue']
+# Stages reported per case. Each one counts only its own time, not that of stages it calls.
+STAGES = ['schema', 's3_read', 'parse', 'db_write', 'db_commit', 'parquet_write', 'glue']
+
+# Products in the shape of product_sales.csv
+PRODUCTS = [("Laptop", "Electronics", 1200.00), ("Smartphone", "Electronics", 800.50), ("Coffee Maker", "Home Goods", 75.25),
+            ("Desk Chair", "Furniture", 150.00), ("Headphones", "Electronics", 99.99), ("Blender", "Home Goods", 45.00),
+            ("Bookshelf", "Furniture", 89.90), ("Monitor", "Electronics", 249.00), ("Toaster", "Home Goods", 29.99),
+            ("Office Desk", "Furniture", 320.00)]
+
+# --- Synthetic Data ---
+def generate_sales_csv(paths, rows, seed=0, days=365, block_rows=1000000):
+    """
+    Generates product_sales.csv-shaped data, split evenly over one or more CSV files.
+
+    Rows are ordered by SaleDate over `days` days from 2025-01-01, like daily exports appended
+    to one file, so each file covers its own range of dates. ProductID is unique within a day,
+    as the incremental path's upsert key requires. Files are written in blocks, so memory use
+    does not grow with the number of rows.
+
+    Args:
+        paths (list): The CSV files to write.
+        rows (int): Total number of rows.
+        seed (int): Seed for the generated values, so that runs are comparable.
+        days (int): Number of distinct sale dates.
+        block_rows (int): Rows generated and written at a time.
+    """
+    rng = np.random.default_rng(seed)
+    names = np.array([name for name, _, _ in PRODUCTS])
+    categories = np.array([category for _, category, _ in PRODUCTS])
+    prices = np.array([price for _, _, price in PRODUCTS])
+    start_date = np.datetime64('2025-01-01')
+    # Every day covers a contiguous run of at most this many rows, so their IDs modulo it differ
+    products_per_day = -(-rows // days)
+    for part, path in enumerate(paths):
+        first, last = rows * part // len(paths), rows * (part + 1) // len(paths)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.write("ProductID,ProductName,Category,Price,UnitsSold,SaleDate\n")
+            for start in range(first, last, block_rows):
+                index = np.arange(start, min(start + block_rows, last))
+                product = index % products_per_day
+                kind = product % len(PRODUCTS)
+                pd.DataFrame({
+                    'ProductID': 100 + product,
+                    'ProductName': np.char.add(names[kind], np.char.add(' ', (product // len(PRODUCTS)).astype(str))),
+                    'Category': categories[kind],
+                    'Price': np.round(prices[kind] * rng.uniform(0.8, 1.2, len(index)), 2),
+                    'UnitsSold': rng.integers(1, 50, len(index)),
+                    'SaleDate': start_date + (index * days // rows).astype('timedelta64[D]'),
+                }).to_csv(f, index=False, header=False, float_format='%.2f')
+
+# --- Local AWS Stand-In ---
+def _free_port():
+    """Returns a TCP port that is currently free on the loopback interface."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_moto_server():
+    """
+    Starts moto's S3 and Glue emulation as a local HTTP server in a background thread.
+
+    The benchmark processes reach it through AWS_ENDPOINT_URL like any other endpoint, so the
+    emulated buckets do not count towards their memory use.
+
+    Returns:
+        tuple: (the server, to stop() it later, and its endpoint URL)
+    """
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError as e:
+        raise SystemExit(f"The local S3/Glue stand-in needs moto with its server extras "
+                         f"(pip install 'moto[server]'), or pass --endpoint-url: {e}")
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING) # One log line per request otherwise
+    return server, f"http://127.0.0.1:{port}"
+
+def _aws_client(service, endpoint_url):
+    return boto3.client(service, endpoint_url=endpoint_url, region_name='us-east-1')
+
+def upload_dataset(endpoint_url, data_file, part_files):
+    """Uploads a generated dataset to the benchmark bucket, replacing any earlier one."""
+    s3_client = _aws_client('s3', endpoint_url)
+    try:
+        s3_client.create_bucket(Bucket=BUCKET)
+    except (s3_client.exceptions.BucketAlreadyOwnedByYou, s3_client.exceptions.BucketAlreadyExists):
+        pass
+    _clear_prefix(s3_client, '')
+    if data_file:
+        s3_client.upload_file(str(data_file), BUCKET, DATA_KEY)
+    for part_file in part_files:
+        s3_client.upload_file(str(part_file), BUCKET, f"{PARTS_PREFIX}{part_file.name}")
+
+def _clear_prefix(s3_client, prefix):
+    """Deletes every object under a prefix of the benchmark bucket."""
+    for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=BUCKET, Prefix=prefix):
+        objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if objects:
+            s3_client.delete_objects(Bucket=BUCKET, Delete={'Objects': objects})
+
+def reset_state(endpoint_url, db_url):
+    """
+    Removes what an earlier case left behind: cached schemas, Parquet output, the Glue table
+    and the RDS tables, so that every case starts from the same state.
+    """
+    s3_client = _aws_client('s3', endpoint_url)
+    _clear_prefix(s3_client, '_schemas/')
+    _clear_prefix(s3_client, 'parquet/')
+    glue_client = _aws_client('glue', endpoint_url)
+    try:
+        glue_client.delete_table(DatabaseName=GLUE_DB, Name=GLUE_TABLE)
+    except (glue_client.exceptions.EntityNotFoundException, glue_client.exceptions.InvalidInputException):
+        pass
+    engine = create_engine(db_url)
+    try:
+        with engine.begin() as conn:
+            for table in inspect(engine).get_table_names():
+                if table.startswith(RDS_TABLE) or table == 'ingest_watermarks':
+                    conn.exec_driver_sql(f"DROP TABLE {engine.dialect.identifier_preparer.quote(table)}")
+    finally:
+        engine.dispose()
+
+# --- Measurement ---
+def _peak_rss_mb():
+    """Returns the peak resident set size of this process and its finished children, in MB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1e6 if sys.platform == "darwin" else peak * 1024 / 1e6
+
+class StageTimer:
+    """
+    Times the stages of an ingest by wrapping the functions that implement them.
+
+    Time is exclusive: a stage that calls another, like parsing pulling bytes from S3, is only
+    charged for its own part. Prefix mode loads objects in parallel, so its stage times add
+    up the time of every thread and can exceed the wall-clock time.
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def _enter(self):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0) # Time spent in nested stages
+        return time.perf_counter()
+
+    def _exit(self, stage, start):
+        elapsed = time.perf_counter() - start
+        stack = self._local.stack
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            self.seconds[stage] += elapsed - nested
+
+    def wrap(self, owner, name, stage):
+        """Replaces owner.name with a version that charges its calls to stage."""
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = self._enter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self._exit(stage, start)
+
+        self._patched.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def wrap_generator(self, owner, name, stage):
+        """Like wrap(), for a generator function: every step of the generator is charged to stage."""
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            generator = original(*args, **kwargs)
+            while True:
+                start = self._enter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit(stage, start)
+                yield item
+
+        self._patched.append((owner, name, original))
+        setattr(owner, name, timed)
+
+    def restore(self):
+        """Puts the original functions back."""
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched.clear()
+
+def _instrument(ingest_data):
+    """Wraps the stages of ingest_data in a StageTimer."""
+    timer = StageTimer()
+    timer.wrap(ingest_data, 'load_schema', 'schema')
+    timer.wrap(ingest_data, '_open_s3_object', 's3_read')
+    timer.wrap(ingest_data._S3BodyReader, 'readinto', 's3_read')
+    timer.wrap_generator(ingest_data, 'iter_s3_data', 'parse')
+    timer.wrap(ingest_data, 'get_s3_data', 'parse')
+    timer.wrap(ingest_data.RdsBulkLoader, '_create_staging', 'db_write')
+    timer.wrap(ingest_data.RdsBulkLoader, '_write', 'db_write')
+    for name in ('commit', 'merge', 'ensure_unique_key'):
+        timer.wrap(ingest_data.RdsBulkLoader, name, 'db_commit')
+    timer.wrap(ingest_data, 'write_parquet_partitions', 'parquet_write')
+    timer.wrap(ingest_data, 'fallback_to_glue', 'glue')
+    return timer
+
+def _count_rows(db_url):
+    engine = create_engine(db_url)
+    try:
+        with engine.connect() as conn:
+            return conn.exec_driver_sql(f"SELECT COUNT(*) FROM {RDS_TABLE}").scalar()
+    finally:
+        engine.dispose()
+
+def _run_case(ingest_data, case, settings):
+    """Runs one ingest path of ingest_data the way its __main__ block does, and returns the rows ingested."""
+    chunk_rows = settings['chunk_rows']
+    if case == 'full':
+        schema = ingest_data.load_schema()
+        df = ingest_data.get_s3_data(schema)
+        if df is None or not ingest_data.push_to_rds(df, schema=schema):
+            raise RuntimeError("full load failed")
+        return _count_rows(settings['db_url'])
+    elif case == 'stream':
+        ingest_data.stream_to_rds(chunk_rows or settings['rows'])
+        return _count_rows(settings['db_url'])
+    elif case == 'incremental':
+        if not ingest_data.ingest_incremental(chunk_rows):
+            raise RuntimeError("incremental ingest failed")
+        return _count_rows(settings['db_url'])
+    elif case == 'prefix':
+        results = ingest_data.ingest_prefix(PARTS_PREFIX, chunk_rows, settings['workers'])
+        failed = [key for key, result in results.items() if result['status'] == 'failed']
+        if not results or failed:
+            raise RuntimeError(f"{len(failed)} of {len(results)} objects failed")
+        return _count_rows(settings['db_url'])
+    elif case == 'glue':
+        schema = ingest_data.load_schema()
+        ingest_data.fallback_to_glue(ingest_data.iter_s3_data(chunk_rows, schema=schema), schema=schema)
+        glue_client = _aws_client('glue', settings['endpoint_url'])
+        partitions = sum(len(page['Partitions']) for page in glue_client.get_paginator('get_partitions').paginate(
+            DatabaseName=GLUE_DB, TableName=GLUE_TABLE))
+        if not partitions:
+            raise RuntimeError("no Glue partitions were registered")
+        return settings['rows']
+    raise ValueError(f"unknown case '{case}'")
+
+def case_ingest(case, settings):
+    """
+    Benchmark case: one ingest path against the local S3/Glue stand-in and the database.
+
+    ingest_data reads its configuration from the environment when it is imported, so the
+    environment is set up first and the module is only imported afterwards, in this process.
+    """
+    os.environ.update({
+        'AWS_ENDPOINT_URL': settings['endpoint_url'],
+        'AWS_ACCESS_KEY_ID': os.getenv('AWS_ACCESS_KEY_ID', 'benchmark'),
+        'AWS_SECRET_ACCESS_KEY': os.getenv('AWS_SECRET_ACCESS_KEY', 'benchmark'),
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'S3_BUCKET': BUCKET,
+        'S3_KEY': DATA_KEY,
+        'RDS_URL': settings['db_url'],
+        'RDS_TABLE_NAME': RDS_TABLE,
+        'RDS_LOAD_METHOD': settings['load_method'],
+        'GLUE_DB_NAME': GLUE_DB,
+        'GLUE_TABLE_NAME': GLUE_TABLE,
+        'CSV_CHUNK_ROWS': str(settings['chunk_rows']),
+        'INGEST_MODE': 'incremental' if case == 'incremental' else 'replace',
+    })
+    import ingest_data
+
+    timer = _instrument(ingest_data)
+    profiler = None
+    if settings['profile_dir']:
+        import cProfile
+        profiler = cProfile.Profile()
+    if settings['tracemalloc']:
+        import tracemalloc
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            rows = _run_case(ingest_data, case, settings)
+        finally:
+            if profiler:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.restore()
+    if rows != settings['rows']:
+        raise RuntimeError(f"{rows} of {settings['rows']} rows were ingested")
+
+    result = {
+        'seconds': elapsed,
+        'rows': rows,
+        'rows_per_s': rows / elapsed,
+        'stages': timer.seconds,
+    }
+    if profiler:
+        path = Path(settings['profile_dir']) / f"{case}-{settings['rows']}.prof"
+        profiler.dump_stats(str(path))
+        result['profile'] = str(path)
+    if settings['tracemalloc']:
+        result['traced_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+        top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+        result['top_allocations'] = [f"{stat.size / 1e6:.1f} MB  {stat.traceback}" for stat in top]
+        tracemalloc.stop()
+    return result
+
+def _isolated_entry(connection, function_name, args):
+    """Runs a benchmark function in a fresh process and sends back its result and peak RSS."""
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        result = globals()[function_name](*args)
+        result['peak_rss_mb'] = _peak_rss_mb()
+        connection.send(result)
+    except Exception as e:
+        connection.send({'error': str(e)})
+    finally:
+        connection.close()
+
+def run_isolated(function_name, *args):
+    """
+    Runs one benchmark case in a fresh process, so that its peak memory use is measured on
+    its own and earlier cases do not warm its caches or heap.
+    """
+    context = multiprocessing.get_context("spawn")
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_isolated_entry, args=(child_connection, function_name, args))
+    process.start()
+    child_connection.close()
+    try:
+        result = parent_connection.recv()
+    except EOFError:
+        result = {'error': f"benchmark process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+# --- Results ---
+def _environment():
+    """Describes the machine and code version a result file was produced with."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=Path(__file__).parent).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': datetime.datetime.now().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def compare_results(results, baseline, threshold=None):
+    """
+    Prints the change in duration of every case that also appears in a baseline result file.
+
+    Args:
+        results (list): Results of the current run.
+        baseline (dict): A result file written by an earlier run.
+        threshold (float or None): Slowdown in percent above which a case counts as a regression.
+
+    Returns:
+        list: The cases that got slower by more than threshold.
+    """
+    previous = {r['case']: r for r in baseline['results'] if 'seconds' in r}
+    regressions = []
+    print(f"\nCompared with {baseline['environment'].get('commit') or 'baseline'} from {baseline['environment']['date']}:")
+    for result in results:
+        before = previous.get(result['case'])
+        if before and 'seconds' in result:
+            change = (result['seconds'] - before['seconds']) / before['seconds'] * 100
+            regressed = threshold is not None and change > threshold
+            print(f"  {result['case']:<32} {before['seconds']:8.2f} s -> {result['seconds']:8.2f} s  ({change:+.1f}%)"
+                  f"{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(result['case'])
+    return regressions
+
+def _format_result(result):
+    """Formats one result for the console."""
+    if 'error' in result:
+        return f"{result['case']:<32} FAILED: {result['error']}"
+    parts = [f"{result['case']:<32} {result['seconds']:8.2f} s", f"{result['rows_per_s']:10.0f} rows/s"]
+    if result.get('peak_rss_mb') is not None:
+        parts.append(f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    if result.get('traced_peak_mb') is not None:
+        parts.append(f"traced peak {result['traced_peak_mb']:.0f} MB")
+    lines = ["  ".join(parts)]
+    lines.append("    " + ", ".join(f"{stage} {seconds:.2f} s" for stage, seconds in result['stages'].items() if seconds >= 0.005))
+    if 'profile' in result:
+        lines.append(f"    profile: {result['profile']}")
+    lines.extend(f"    {line}" for line in result.get('top_allocations', []))
+    return "\n".join(lines)
+
+def main():
+    """
+    Runs the benchmark suite: every ingest path of ingest_data.py on synthetic product_sales
+    datasets of increasing size, against a local S3/Glue stand-in and SQLite or MySQL.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark suite for ingest_data.py.")
+    parser.add_argument("--rows", type=int, nargs='+', default=[10000, 100000, 1000000], help="Dataset sizes in rows, e.g. 10000 up to 50000000.")
+    parser.add_argument("--cases", nargs='+', choices=CASES, default=CASES, help="Ingest paths to benchmark.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic datasets.")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="CSV_CHUNK_ROWS for the streaming paths (0 reads whole files).")
+    parser.add_argument("--objects", type=int, default=8, help="Number of objects the dataset is split into for the prefix case.")
+    parser.add_argument("--workers", type=int, default=4, help="INGEST_WORKERS for the prefix case.")
+    parser.add_argument("--load-method", choices=['multirow', 'load_data'], default='multirow', help="RDS_LOAD_METHOD; load_data needs MySQL.")
+    parser.add_argument("--db-url", help="SQLAlchemy URL of a local MySQL database to load into instead of a temporary SQLite file. Its benchmark tables are dropped before every case.")
+    parser.add_argument("--endpoint-url", help="An S3/Glue-compatible endpoint, e.g. LocalStack, to use instead of starting moto's server.")
+    parser.add_argument("--profile", metavar="DIR", help="Write a cProfile file per case to this directory.")
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace Python allocations and report the largest (much slower).")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", help="A results file from an earlier run to compare against.")
+    parser.add_argument("--fail-above", type=float, metavar="PERCENT", help="With --compare, exit with status 1 if a case got slower by more than this.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    # Clients in this process need credentials too, even for the local stand-in
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    server = None
+    results = []
+
+    def record(case, result):
+        result['case'] = case
+        results.append(result)
+        print(_format_result(result))
+
+    try:
+        if args.endpoint_url:
+            endpoint_url = args.endpoint_url
+        else:
+            server, endpoint_url = start_moto_server()
+        print(f"Running on {os.cpu_count()} CPUs, Python {platform.python_version()}, pandas {pd.__version__}\n")
+
+        for rows in args.rows:
+            data_file = work_dir / "product_sales.csv"
+            part_files = [work_dir / f"part-{i:04d}.csv" for i in range(args.objects)] if 'prefix' in args.cases else []
+            print(f"Generating {rows} rows...")
+            generate_sales_csv([data_file], rows, args.seed)
+            if part_files:
+                generate_sales_csv(part_files, rows, args.seed)
+            upload_dataset(endpoint_url, data_file, part_files)
+
+            for case in args.cases:
+                db_url = args.db_url or f"sqlite:///{work_dir / f'{case}-{rows}.db'}"
+                reset_state(endpoint_url, db_url)
+                settings = {
+                    'rows': rows, 'chunk_rows': args.chunk_rows, 'workers': args.workers, 'load_method': args.load_method,
+                    'db_url': db_url, 'endpoint_url': endpoint_url, 'profile_dir': args.profile, 'tracemalloc': args.tracemalloc,
+                }
+                record(f"{case}/{rows}", run_isolated("case_ingest", case, settings))
+                if not args.db_url:
+                    (work_dir / f"{case}-{rows}.db").unlink(missing_ok=True)
+    finally:
+        if server:
+            server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': _environment(), 'settings': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to '{args.output}'.")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(results, json.load(f), args.fail_above)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) got slower by more than {args.fail_above:g}%.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
 # ingest_data.py
 
 import os
+import io
+import json
+import time
+import datetime
+import functools
+import hashlib
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 import boto3
 import pandas as pd
-from sqlalchemy import create_engine
-from io import StringIO
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pandas.tseries.api import guess_datetime_format
+from sqlalchemy import (create_engine, inspect, MetaData, Table, Column, String, Text, Integer, BigInteger, Float,
+                        Boolean, Date, DateTime, select, delete)
 import logging
 
 # Configure logging to show info-level messages
@@ -13,6 +28,9 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # --- Configuration will be loaded from Environment Variables ---
 S3_BUCKET = os.getenv('S3_BUCKET')
 S3_KEY = os.getenv('S3_KEY')
+# When set, every object under this prefix ending in S3_SUFFIX is ingested instead of S3_KEY
+S3_PREFIX = os.getenv('S3_PREFIX')
+S3_SUFFIX = os.getenv('S3_SUFFIX', '.csv')
 RDS_ENDPOINT = os.getenv('RDS_ENDPOINT')
 RDS_USER = os.getenv('RDS_USER')
 RDS_PASSWORD = os.getenv('RDS_PASSWORD')
@@ -21,35 +39,515 @@ RDS_TABLE_NAME = os.getenv('RDS_TABLE_NAME')
 GLUE_DB_NAME = os.getenv('GLUE_DB_NAME')
 GLUE_TABLE_NAME = os.getenv('GLUE_TABLE_NAME')
 AWS_REGION = os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+# Rows per DataFrame when streaming the CSV. 0 reads the whole file into one DataFrame.
+CSV_CHUNK_ROWS = int(os.getenv('CSV_CHUNK_ROWS', '0'))
+# Bytes requested from S3 per read while streaming
+S3_READ_SIZE = 8 * 1024 * 1024
+# Column types are inferred once per run from this many rows of a source. 0 leaves type
+# inference to pandas on every read.
+SCHEMA_SAMPLE_ROWS = int(os.getenv('SCHEMA_SAMPLE_ROWS', '10000'))
+# When set, inferred schemas are also cached as JSON under SCHEMA_CACHE_PREFIX in this bucket,
+# so later runs skip the inference. It may be S3_BUCKET, but nothing is written there unless asked.
+SCHEMA_CACHE_BUCKET = os.getenv('SCHEMA_CACHE_BUCKET')
+SCHEMA_CACHE_PREFIX = os.getenv('SCHEMA_CACHE_PREFIX', '_schemas/')
+# Text columns with at most this share of distinct values in the sample are read as categoricals
+SCHEMA_CATEGORY_RATIO = float(os.getenv('SCHEMA_CATEGORY_RATIO', '0.5'))
+# Integer columns are read as 32-bit if the sample's values are this many times below the int32 limit
+SCHEMA_INT32_HEADROOM = 16
+# Optional SQLAlchemy URL used instead of the RDS_* settings, e.g. 'sqlite:///sales.db' for local runs
+RDS_URL = os.getenv('RDS_URL')
+# 'multirow' for batched multi-row INSERTs, or 'load_data' for MySQL's LOAD DATA LOCAL INFILE
+RDS_LOAD_METHOD = os.getenv('RDS_LOAD_METHOD', 'multirow')
+RDS_BATCH_SIZE = int(os.getenv('RDS_BATCH_SIZE', '5000'))
+# Loads go into '<table>_staging', which replaces the table in one step once every row is in
+STAGING_SUFFIX = '_staging'
+# 'replace' reloads the whole table on every run. 'incremental' skips unchanged S3 objects and
+# upserts only rows at or after the source's watermark, keyed on UPSERT_KEYS.
+INGEST_MODE = os.getenv('INGEST_MODE', 'replace')
+UPSERT_KEYS = [c.strip() for c in os.getenv('UPSERT_KEYS', 'ProductID,SaleDate').split(',')]
+WATERMARK_COLUMN = os.getenv('WATERMARK_COLUMN', 'SaleDate')
+# Rows this many days before the watermark are upserted again, to pick up late corrections
+WATERMARK_LOOKBACK_DAYS = int(os.getenv('WATERMARK_LOOKBACK_DAYS', '0'))
+WATERMARK_TABLE = os.getenv('WATERMARK_TABLE', 'ingest_watermarks')
+# Prefix mode: objects fetched and loaded at the same time, which is also the size of the DB connection pool
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '4'))
+# How often a failed object is retried on its own before it is reported as failed
+INGEST_RETRIES = int(os.getenv('INGEST_RETRIES', '2'))
+INGEST_RETRY_DELAY = 5 # Seconds before the first retry, doubled for every further retry
+# The Glue fallback writes the data as Parquet below this prefix of S3_BUCKET, one
+# 'GLUE_PARTITION_COLUMN=YYYY-MM-DD/' folder per date, and registers it as a partitioned table
+GLUE_PARQUET_PREFIX = os.getenv('GLUE_PARQUET_PREFIX') or f"parquet/{GLUE_TABLE_NAME}/"
+GLUE_PARTITION_COLUMN = os.getenv('GLUE_PARTITION_COLUMN', 'SaleDate')
+GLUE_PARQUET_COMPRESSION = os.getenv('GLUE_PARQUET_COMPRESSION', 'snappy')
+GLUE_PARTITION_BATCH_SIZE = 100 # Most partitions BatchCreatePartition accepts per call
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__' # Partition of rows without a date
 
-def get_s3_data():
-    """Reads a CSV file from S3 into a pandas DataFrame."""
+# Text columns in UPSERT_KEYS become VARCHARs, as MySQL cannot index TEXT columns: twice the longest
+# value of the schema's sample, within these bounds. 255 utf8mb4 characters leave room for three
+# such columns in InnoDB's 3072-byte key limit.
+KEY_STRING_MIN_LENGTH = 64
+KEY_STRING_MAX_LENGTH = 255
+
+# Column types of a schema: the pandas dtype a column is parsed as (None for dates, which are
+# parsed with the schema's format), its SQLAlchemy type in RDS and its type in Glue
+COLUMN_TYPES = {
+    'int32': ('Int64', Integer, 'int'), # Parsed as Int64 and range-checked, as pandas wraps int32 overflows
+    'int64': ('Int64', BigInteger, 'bigint'),
+    'float': ('float64', Float(53), 'double'),
+    'bool': ('boolean', Boolean, 'boolean'),
+    'category': ('category', Text, 'string'),
+    'string': (str, Text, 'string'),
+    'date': (None, Date, 'date'),
+    'timestamp': (None, DateTime, 'timestamp'),
+}
+
+# Schemas loaded during this run, by (key, source)
+_schemas = {}
+
+# One row per source object: its ETag and LastModified when it was last ingested, and the
+# highest WATERMARK_COLUMN value it contained
+_metadata = MetaData()
+watermarks = Table(
+    WATERMARK_TABLE, _metadata,
+    Column('source', String(512), primary_key=True),
+    Column('etag', String(128)),
+    Column('last_modified', String(40)),
+    Column('max_value', String(40)),
+    Column('rows_loaded', BigInteger),
+    Column('updated_at', String(40)),
+)
+
+class _S3BodyReader(io.RawIOBase):
+    """Adapts a boto3 StreamingBody to a raw stream, so it can be buffered and parsed incrementally."""
+
+    def __init__(self, body):
+        self._body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._body.close()
+        super().close()
+
+@functools.lru_cache(maxsize=None)
+def _s3_client():
+    """Returns the S3 client shared by every call and thread; boto3 clients are thread-safe."""
+    return boto3.client('s3')
+
+def _open_s3_object(key=None):
+    """Opens a CSV object in S3 (S3_KEY by default) as a buffered binary stream, without downloading it first."""
+    response = _s3_client().get_object(Bucket=S3_BUCKET, Key=key or S3_KEY)
+    return io.BufferedReader(_S3BodyReader(response['Body']), S3_READ_SIZE)
+
+def list_s3_keys(prefix):
+    """Lists the keys of all objects under a prefix whose names end in S3_SUFFIX."""
+    keys = []
+    for page in _s3_client().get_paginator('list_objects_v2').paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        keys.extend(obj['Key'] for obj in page.get('Contents', [])
+                    if obj['Key'].lower().endswith(S3_SUFFIX.lower()) and obj['Size'] > 0)
+    return keys
+
+def infer_schema(sample):
+    """
+    Infers a compact schema from a sample DataFrame parsed by pandas.
+
+    Integers become 32-bit where the sample leaves plenty of headroom, text columns that parse as
+    dates with one format become dates or timestamps, and text columns with few distinct values
+    become categoricals. Floats stay 64-bit, as downcasting them would change the values stored.
+
+    Returns:
+        dict: {'columns': {column: type in COLUMN_TYPES}, 'formats': {date column: strftime format},
+            'lengths': {text column: length of its longest value}}
+    """
+    columns, formats, lengths = {}, {}, {}
+    for col in sample.columns:
+        values = sample[col].dropna()
+        if pd.api.types.is_bool_dtype(values):
+            columns[col] = 'bool'
+        elif pd.api.types.is_integer_dtype(values):
+            limit = 2 ** 31 // SCHEMA_INT32_HEADROOM
+            columns[col] = 'int32' if len(values) and -limit < values.min() and values.max() < limit else 'int64'
+        elif pd.api.types.is_float_dtype(values):
+            columns[col] = 'float'
+        else:
+            values = values.astype(str)
+            date_format = guess_datetime_format(values.iloc[0]) if len(values) else None
+            if date_format and pd.to_datetime(values, format=date_format, errors='coerce').notna().all():
+                columns[col] = 'timestamp' if any(d in date_format for d in ('%H', '%M', '%S')) else 'date'
+                formats[col] = date_format
+            elif len(values) and values.nunique() <= SCHEMA_CATEGORY_RATIO * len(values):
+                columns[col] = 'category'
+            else:
+                columns[col] = 'string'
+            if col not in formats:
+                lengths[col] = int(values.str.len().max()) if len(values) else 0
+    return {'columns': columns, 'formats': formats, 'lengths': lengths}
+
+def frame_schema(df):
+    """Describes the columns of an already parsed DataFrame as a schema, for data read without one."""
+    columns, lengths = {}, {}
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            columns[col] = 'bool'
+        elif pd.api.types.is_integer_dtype(dtype):
+            columns[col] = 'int32' if dtype.itemsize <= 4 else 'int64'
+        elif pd.api.types.is_float_dtype(dtype):
+            columns[col] = 'float'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            columns[col] = 'timestamp'
+        elif isinstance(dtype, pd.CategoricalDtype):
+            columns[col] = 'category'
+        else:
+            columns[col] = 'string'
+        if columns[col] in ('category', 'string'):
+            values = df[col].dropna().astype(str)
+            lengths[col] = int(values.str.len().max()) if len(values) else 0
+    return {'columns': columns, 'formats': {}, 'lengths': lengths}
+
+def _sql_type(col, schema):
+    """
+    Returns the SQLAlchemy type of a schema column. Text columns in UPSERT_KEYS become VARCHARs
+    sized from the schema's sample, so that a unique key can be put on them.
+    """
+    sql_type = COLUMN_TYPES[schema['columns'][col]][1]
+    if sql_type is not Text or col not in UPSERT_KEYS:
+        return sql_type
+    # Schemas cached by older versions have no lengths
+    longest = schema.get('lengths', {}).get(col, 0)
+    if longest > KEY_STRING_MAX_LENGTH:
+        logging.warning(f"Key column '{col}' has values of up to {longest} characters, but is limited to {KEY_STRING_MAX_LENGTH}.")
+    return String(min(KEY_STRING_MAX_LENGTH, max(KEY_STRING_MIN_LENGTH, 2 * longest)))
+
+def load_schema(key=None, source=None):
+    """
+    Returns the schema of a CSV source in S3, inferring it from a sample of key the first time.
+
+    The schema is kept in memory for the rest of the run. With SCHEMA_CACHE_BUCKET set, it is
+    also cached there as JSON, so later runs only read the object's header to check that its
+    columns have not changed. A schema that could not be loaded is not kept, so the next call
+    tries again.
+
+    Args:
+        key (str or None): The object to sample, S3_KEY by default.
+        source (str or None): What the schema is cached for, e.g. a prefix whose objects share
+            their columns. Defaults to key.
+
+    Returns:
+        dict or None: The schema, see infer_schema, or None to let pandas infer the types.
+    """
+    if not SCHEMA_SAMPLE_ROWS:
+        return None
+    key = key or S3_KEY
+    if (key, source) in _schemas:
+        return _schemas[(key, source)]
+    cache_key = f"{SCHEMA_CACHE_PREFIX}{(source or key).strip('/')}.json"
+    s3_client = _s3_client()
+    schema = None
+    try:
+        if SCHEMA_CACHE_BUCKET:
+            head = s3_client.get_object(Bucket=S3_BUCKET, Key=key, Range='bytes=0-65535')['Body'].read()
+            header = list(pd.read_csv(io.BytesIO(head), nrows=0, encoding='utf-8').columns)
+            try:
+                cached = json.loads(s3_client.get_object(Bucket=SCHEMA_CACHE_BUCKET, Key=cache_key)['Body'].read())
+                if list(cached['columns']) == header:
+                    logging.info(f"Using the cached schema 's3://{SCHEMA_CACHE_BUCKET}/{cache_key}'.")
+                    schema = cached
+                else:
+                    logging.info(f"The columns of '{key}' changed since its schema was cached. Inferring it again...")
+            except s3_client.exceptions.NoSuchKey:
+                pass
+
+        if schema is None:
+            with _open_s3_object(key) as stream:
+                sample = pd.read_csv(stream, encoding='utf-8', nrows=SCHEMA_SAMPLE_ROWS)
+            schema = infer_schema(sample)
+            logging.info(f"Inferred the schema of '{key}' from {len(sample)} rows: "
+                         f"{', '.join(f'{col} {kind}' for col, kind in schema['columns'].items())}")
+            if SCHEMA_CACHE_BUCKET:
+                try:
+                    s3_client.put_object(Bucket=SCHEMA_CACHE_BUCKET, Key=cache_key, Body=json.dumps(schema, indent=2).encode(),
+                                         ContentType='application/json')
+                except Exception as e:
+                    logging.warning(f"Could not cache the schema at 's3://{SCHEMA_CACHE_BUCKET}/{cache_key}': {e}")
+    except Exception as e:
+        logging.warning(f"Could not infer the schema of '{key}', leaving the column types to pandas: {e}")
+        return None
+    _schemas[(key, source)] = schema
+    return schema
+
+def _read_options(schema):
+    """Returns the pd.read_csv arguments that parse a CSV with the types of a schema."""
+    if not schema:
+        return {}
+    dates = [col for col, kind in schema['columns'].items() if COLUMN_TYPES[kind][0] is None]
+    return {
+        'dtype': {col: COLUMN_TYPES[kind][0] for col, kind in schema['columns'].items() if col not in dates},
+        'parse_dates': dates,
+        'date_format': schema['formats'],
+    }
+
+def _apply_schema(df, schema):
+    """Downcasts the int32 columns of a freshly parsed DataFrame, checking that every value fits."""
+    if schema:
+        for col, kind in schema['columns'].items():
+            if kind == 'int32' and col in df:
+                values = df[col].dropna()
+                if len(values) and not (-2 ** 31 <= values.min() and values.max() < 2 ** 31):
+                    hint = (f"Delete the schema under 's3://{SCHEMA_CACHE_BUCKET}/{SCHEMA_CACHE_PREFIX}' to infer it again."
+                            if SCHEMA_CACHE_BUCKET else "Raise SCHEMA_SAMPLE_ROWS to infer it from more rows.")
+                    raise ValueError(f"Column '{col}' has values outside the int32 range of its schema. {hint}")
+                df[col] = df[col].astype('Int32')
+    return df
+
+def get_s3_data(schema=None):
+    """Reads a CSV file from S3 into a pandas DataFrame, with the column types of schema if given."""
     try:
         logging.info(f"Reading '{S3_KEY}' from bucket '{S3_BUCKET}'...")
-        s3_client = boto3.client('s3')
-        # Get the object from S3
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=S3_KEY)
-        # Read the content of the file
-        csv_content = response['Body'].read().decode('utf-8')
-        # Use pandas to read the CSV content into a DataFrame
-        df = pd.read_csv(StringIO(csv_content))
+        # pandas parses straight from the response stream, so no decoded copy of the file is held in memory
+        with _open_s3_object() as stream:
+            df = _apply_schema(pd.read_csv(stream, encoding='utf-8', **_read_options(schema)), schema)
         logging.info("Successfully read data from S3 into a DataFrame.")
         return df
     except Exception as e:
         logging.error(f"Failed to read data from S3: {e}")
         return None
 
-def push_to_rds(df):
-    """Pushes a DataFrame to an RDS MySQL database."""
+def iter_s3_data(chunk_rows, key=None, schema=None):
+    """
+    Streams a CSV file from S3 (S3_KEY by default) as DataFrames of at most chunk_rows rows.
+
+    The object is read and parsed incrementally, so memory use depends on chunk_rows,
+    not on the size of the file. A chunk_rows of 0 yields the whole file as one DataFrame.
+    Columns get the types of schema if given. Read errors are raised to the caller.
+    """
+    key = key or S3_KEY
+    options = _read_options(schema)
+    if not chunk_rows:
+        logging.info(f"Reading '{key}' from bucket '{S3_BUCKET}'...")
+        with _open_s3_object(key) as stream:
+            yield _apply_schema(pd.read_csv(stream, encoding='utf-8', **options), schema)
+        return
+    logging.info(f"Streaming '{key}' from bucket '{S3_BUCKET}' in chunks of {chunk_rows} rows...")
+    with _open_s3_object(key) as stream:
+        for chunk in pd.read_csv(stream, encoding='utf-8', chunksize=chunk_rows, **options):
+            yield _apply_schema(chunk, schema)
+
+def _create_rds_engine(pool_size=None):
+    """
+    Creates the SQLAlchemy engine for the RDS MySQL database, or for RDS_URL if it is set.
+
+    With pool_size, the engine keeps at most that many connections open and hands them
+    out to the threads loading in parallel.
+    """
+    options = {}
+    if pool_size:
+        options.update(pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+    if RDS_URL:
+        if RDS_URL.startswith('sqlite'):
+            options['connect_args'] = {'timeout': 60} # Parallel loads queue up for SQLite's single writer
+        return create_engine(RDS_URL, **options)
+    conn_string = f"mysql+pymysql://{RDS_USER}:{RDS_PASSWORD}@{RDS_ENDPOINT}/{RDS_DB_NAME}"
+    # LOAD DATA LOCAL INFILE has to be enabled on the client side as well
+    return create_engine(conn_string, connect_args={'local_infile': True} if RDS_LOAD_METHOD == 'load_data' else {}, **options)
+
+def _format_dates(df, schema):
+    """Returns a copy of a DataFrame with its datetime columns as text, dates as 'YYYY-MM-DD'."""
+    df = df.copy()
+    for col in df.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        date_only = schema['columns'].get(col) == 'date'
+        df[col] = df[col].dt.strftime('%Y-%m-%d' if date_only else '%Y-%m-%d %H:%M:%S')
+    return df
+
+def _db_rows(df, schema):
+    """Converts a DataFrame into tuples of plain Python values that any DB driver can bind."""
+    df = _format_dates(df, schema)
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+class RdsBulkLoader:
+    """
+    Loads DataFrames into a staging table and then swaps it in for the target table.
+
+    Rows are written with batched multi-row INSERTs (the driver's executemany), or with
+    LOAD DATA LOCAL INFILE on MySQL. The target table stays readable, with its old contents,
+    until commit() replaces it, and a failed load leaves it untouched. Several threads may
+    load into the same loader at once. Column types come from schema, or from the dtypes
+    of the first DataFrame loaded.
+    """
+
+    def __init__(self, engine, table_name, method=RDS_LOAD_METHOD, batch_size=RDS_BATCH_SIZE, staging_name=None,
+                 schema=None):
+        self.engine = engine
+        self.schema = schema
+        self.table_name = table_name
+        self.staging_name = staging_name or f"{table_name}{STAGING_SUFFIX}"
+        self.batch_size = batch_size
+        self.method = method
+        if method == 'load_data' and engine.dialect.name != 'mysql':
+            logging.warning(f"LOAD DATA is only available on MySQL. Using multi-row inserts for {engine.dialect.name}.")
+            self.method = 'multirow'
+        self.rows = 0
+        self._created = False
+        self._start = None
+        self._lock = threading.Lock()
+
+    def _quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _create_staging(self, df):
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._start = time.perf_counter()
+                    if self.schema is None:
+                        self.schema = frame_schema(df)
+                    sql_types = {col: _sql_type(col, self.schema) for col in self.schema['columns'] if col in df}
+                    df.iloc[:0].to_sql(self.staging_name, self.engine, if_exists='replace', index=False, dtype=sql_types)
+                    self._created = True
+
+    def _write(self, conn, df):
+        if self.method == 'load_data':
+            self._load_data_infile(conn, df)
+        else:
+            self._insert_batches(conn, df)
+
+    def load(self, df):
+        """Appends a DataFrame to the staging table, creating it from the first DataFrame's columns."""
+        self._create_staging(df)
+        with self.engine.begin() as conn:
+            self._write(conn, df)
+        with self._lock:
+            self.rows += len(df)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields a load function whose DataFrames are committed together, or not at all.
+
+        Used to load one source object in several chunks, so that a failed object can be
+        retried without leaving half of its rows behind in the staging table.
+        """
+        loaded = []
+        with self.engine.begin() as conn:
+            def load(df):
+                self._create_staging(df)
+                self._write(conn, df)
+                loaded.append(len(df))
+            yield load
+        with self._lock:
+            self.rows += sum(loaded)
+
+    def _insert_batches(self, conn, df):
+        marker = '?' if self.engine.dialect.paramstyle == 'qmark' else '%s'
+        sql = (f"INSERT INTO {self._quote(self.staging_name)} ({', '.join(self._quote(c) for c in df.columns)}) "
+               f"VALUES ({', '.join([marker] * len(df.columns))})")
+        for start in range(0, len(df), self.batch_size):
+            conn.exec_driver_sql(sql, _db_rows(df.iloc[start:start + self.batch_size], self.schema))
+
+    def _load_data_infile(self, conn, df):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8') as f:
+            _format_dates(df, self.schema).to_csv(f, index=False, header=False, na_rep='\\N')
+            f.flush()
+            path = f.name.replace('\\', '/')
+            conn.exec_driver_sql(
+                f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {self._quote(self.staging_name)} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' "
+                f"({', '.join(self._quote(c) for c in df.columns)})"
+            )
+
+    def commit(self):
+        """Replaces the target table with the staging table and reports the load rate."""
+        table, staging = self._quote(self.table_name), self._quote(self.staging_name)
+        exists = inspect(self.engine).has_table(self.table_name)
+        with self.engine.begin() as conn:
+            if self.engine.dialect.name == 'mysql':
+                # MySQL commits DDL implicitly, but a multi-table RENAME is atomic on its own
+                if exists:
+                    old = self._quote(f"{self.table_name}_old")
+                    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {old}")
+                    conn.exec_driver_sql(f"RENAME TABLE {table} TO {old}, {staging} TO {table}")
+                    conn.exec_driver_sql(f"DROP TABLE {old}")
+                else:
+                    conn.exec_driver_sql(f"RENAME TABLE {staging} TO {table}")
+            else:
+                # Transactional DDL (SQLite, PostgreSQL): readers see either the old or the new table
+                if exists:
+                    conn.exec_driver_sql(f"DROP TABLE {table}")
+                conn.exec_driver_sql(f"ALTER TABLE {staging} RENAME TO {table}")
+        elapsed = time.perf_counter() - self._start
+        logging.info(f"Loaded {self.rows} rows into '{self.table_name}' in {elapsed:.2f} s "
+                     f"({self.rows / elapsed if elapsed else 0:.0f} rows/s, {self.method}).")
+
+    def ensure_unique_key(self, key_columns):
+        """Creates a unique index on key_columns in the target table unless one already exists."""
+        insp = inspect(self.engine)
+        existing = [ix['column_names'] for ix in insp.get_indexes(self.table_name) if ix['unique']]
+        existing += [uc['column_names'] for uc in insp.get_unique_constraints(self.table_name)]
+        existing.append(insp.get_pk_constraint(self.table_name)['constrained_columns'])
+        if any(set(columns) == set(key_columns) for columns in existing):
+            return
+        index_name = self._quote(f"ux_{self.table_name}_key")
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(f"CREATE UNIQUE INDEX {index_name} ON {self._quote(self.table_name)} "
+                                 f"({', '.join(self._quote(c) for c in key_columns)})")
+        logging.info(f"Created unique index on {', '.join(key_columns)} in '{self.table_name}'.")
+
+    def merge(self, key_columns):
+        """
+        Upserts the staging table into the target table on key_columns, then drops the staging table.
+
+        Rows whose key already exists are updated in place; all other rows are inserted.
+        """
+        if not self._created:
+            return
+        self.ensure_unique_key(key_columns)
+        columns = [c['name'] for c in inspect(self.engine).get_columns(self.staging_name)]
+        table, staging = self._quote(self.table_name), self._quote(self.staging_name)
+        column_list = ', '.join(self._quote(c) for c in columns)
+        updates = [c for c in columns if c not in key_columns] or key_columns[:1]
+        if self.engine.dialect.name == 'mysql':
+            sql = (f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} "
+                   f"ON DUPLICATE KEY UPDATE {', '.join(f'{self._quote(c)} = VALUES({self._quote(c)})' for c in updates)}")
+        else:
+            # 'WHERE true' keeps SQLite from reading ON CONFLICT as part of the SELECT's join
+            sql = (f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} WHERE true "
+                   f"ON CONFLICT ({', '.join(self._quote(c) for c in key_columns)}) "
+                   f"DO UPDATE SET {', '.join(f'{self._quote(c)} = excluded.{self._quote(c)}' for c in updates)}")
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+        self.abort()
+        elapsed = time.perf_counter() - self._start
+        logging.info(f"Upserted {self.rows} rows into '{self.table_name}' in {elapsed:.2f} s "
+                     f"({self.rows / elapsed if elapsed else 0:.0f} rows/s, {self.method}).")
+
+    def abort(self):
+        """Drops the staging table, leaving the target table as it was."""
+        if self._created:
+            try:
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {self._quote(self.staging_name)}")
+            except Exception as e:
+                logging.warning(f"Could not drop staging table '{self.staging_name}': {e}")
+
+def push_to_rds(df, engine=None, schema=None):
+    """Pushes a DataFrame to an RDS MySQL database, replacing the table's contents in one step."""
     try:
         logging.info(f"Attempting to push data to RDS table '{RDS_TABLE_NAME}'...")
-        # Create the database connection string
-        conn_string = f"mysql+pymysql://{RDS_USER}:{RDS_PASSWORD}@{RDS_ENDPOINT}/{RDS_DB_NAME}"
-        engine = create_engine(conn_string)
+        if engine is None:
+            engine = _create_rds_engine()
         
-        # Push the DataFrame to the SQL table
-        # if_exists='replace' will drop the table first and then create a new one
-        df.to_sql(RDS_TABLE_NAME, engine, if_exists='replace', index=False)
+        loader = RdsBulkLoader(engine, RDS_TABLE_NAME, schema=schema)
+        try:
+            loader.load(df)
+            loader.commit()
+        except Exception:
+            loader.abort()
+            raise
         
         logging.info(f"Successfully pushed {len(df)} rows to RDS table '{RDS_TABLE_NAME}'.")
         return True
@@ -58,10 +556,88 @@ def push_to_rds(df):
         logging.warning(f"Error details: {e}")
         return False
 
-def fallback_to_glue(df):
-    """Creates a table in the AWS Glue Data Catalog as a fallback."""
+def _partition_values(df):
+    """Returns the partition value, 'YYYY-MM-DD', of every row of a DataFrame."""
+    dates = pd.to_datetime(df[GLUE_PARTITION_COLUMN], errors='coerce')
+    return dates.dt.strftime('%Y-%m-%d').fillna(HIVE_DEFAULT_PARTITION)
+
+def write_parquet_partitions(chunks, source, schema=None):
+    """
+    Writes DataFrames to S3 as compressed Parquet files, partitioned by GLUE_PARTITION_COLUMN.
+
+    Files are named after the source and chunk number, so running the fallback again for the same
+    source overwrites its files instead of adding duplicates, and files a previous run left behind
+    in the same partitions are removed.
+
+    Args:
+        chunks (iterable): DataFrames to write.
+        source (str): Identifies the data, e.g. its S3 URI.
+        schema (dict or None): Column types of the data, by default those of the first DataFrame.
+
+    Returns:
+        tuple: (schema of the data or None if there was none, set of partition values written)
+    """
+    s3_client = _s3_client()
+    tag = hashlib.sha1(source.encode()).hexdigest()[:10]
+    written = {}
+    for chunk_no, chunk in enumerate(chunks):
+        if schema is None:
+            schema = frame_schema(chunk)
+        partitions = _partition_values(chunk)
+        for value, part in chunk.drop(columns=[GLUE_PARTITION_COLUMN]).groupby(partitions, sort=False, observed=True):
+            key = f"{GLUE_PARQUET_PREFIX}{GLUE_PARTITION_COLUMN}={value}/{tag}-{chunk_no:05d}.parquet"
+            table = pa.Table.from_pandas(part, preserve_index=False)
+            for col in table.column_names:
+                if schema['columns'].get(col) == 'date':
+                    table = table.set_column(table.schema.get_field_index(col), col, pc.cast(table[col], pa.date32()))
+            buffer = io.BytesIO()
+            pq.write_table(table, buffer, compression=GLUE_PARQUET_COMPRESSION,
+                           coerce_timestamps='ms', allow_truncated_timestamps=True)
+            s3_client.put_object(Bucket=S3_BUCKET, Key=key, Body=buffer.getvalue())
+            written.setdefault(value, set()).add(key)
+
+    for value, keys in written.items():
+        partition_prefix = f"{GLUE_PARQUET_PREFIX}{GLUE_PARTITION_COLUMN}={value}/{tag}-"
+        stale = [{'Key': obj['Key']} for page in s3_client.get_paginator('list_objects_v2').paginate(Bucket=S3_BUCKET, Prefix=partition_prefix)
+                 for obj in page.get('Contents', []) if obj['Key'] not in keys]
+        for start in range(0, len(stale), 1000):
+            s3_client.delete_objects(Bucket=S3_BUCKET, Delete={'Objects': stale[start:start + 1000]})
+    logging.info(f"Wrote {sum(len(keys) for keys in written.values())} Parquet files in {len(written)} partitions "
+                 f"to 's3://{S3_BUCKET}/{GLUE_PARQUET_PREFIX}'.")
+    return schema, set(written)
+
+def _parquet_storage_descriptor(columns, location):
+    """Returns a Glue StorageDescriptor for Parquet files at location."""
+    return {
+        'Columns': columns,
+        'Location': location,
+        'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+        'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+        'SerdeInfo': {
+            'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
+            'Parameters': {'serialization.format': '1'}
+        },
+    }
+
+def fallback_to_glue(data, source=None, schema=None):
+    """
+    Makes the data queryable through AWS Glue/Athena as a fallback: writes it to S3 as Parquet
+    partitioned by date and registers it as a partitioned table in the Glue Data Catalog.
+
+    The table is created once and updated in place afterwards; new partitions are added in batches.
+
+    Args:
+        data (DataFrame or iterable): The data, as one DataFrame or as DataFrame chunks.
+        source (str or None): Identifies the data, by default the S3 URI of S3_KEY.
+        schema (dict or None): Column types of the data, by default those of its first DataFrame.
+    """
     try:
         logging.info(f"Fallback initiated. Registering dataset in AWS Glue as '{GLUE_TABLE_NAME}'...")
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        schema, partitions = write_parquet_partitions(chunks, source or f"s3://{S3_BUCKET}/{S3_KEY}", schema)
+        if schema is None:
+            logging.warning("No data to register in AWS Glue.")
+            return
         glue_client = boto3.client('glue', region_name=AWS_REGION)
         
         # Ensure the Glue Database exists, create if not
@@ -71,61 +647,331 @@ def fallback_to_glue(df):
         except glue_client.exceptions.AlreadyExistsException:
             logging.info(f"Glue database '{GLUE_DB_NAME}' already exists.")
             
-        # Define the Glue table schema by converting pandas dtypes to Glue types
-        column_definitions = []
-        for col, dtype in df.dtypes.items():
-            if 'int' in str(dtype):
-                glue_type = 'bigint'
-            elif 'float' in str(dtype):
-                glue_type = 'double'
-            elif 'datetime' in str(dtype):
-                glue_type = 'timestamp'
-            else:
-                glue_type = 'string'
-            column_definitions.append({'Name': col, 'Type': glue_type})
+        # Define the Glue table schema from the same column types the data was parsed with
+        column_definitions = [{'Name': col, 'Type': COLUMN_TYPES[kind][2]}
+                              for col, kind in schema['columns'].items() if col != GLUE_PARTITION_COLUMN]
+        partition_keys = [{'Name': GLUE_PARTITION_COLUMN, 'Type': 'date'}]
+        s3_location = f"s3://{S3_BUCKET}/{GLUE_PARQUET_PREFIX}"
+        table_input = {
+            'Name': GLUE_TABLE_NAME,
+            'Description': 'Table created via automated fallback process.',
+            'StorageDescriptor': _parquet_storage_descriptor(column_definitions, s3_location),
+            'PartitionKeys': partition_keys,
+            'TableType': 'EXTERNAL_TABLE',
+            'Parameters': {'classification': 'parquet', 'parquet.compression': GLUE_PARQUET_COMPRESSION.upper()}
+        }
 
-        # The S3 location for Glue should point to the folder containing the file(s)
-        s3_location = f"s3://{S3_BUCKET}/"
-        
-        # Create or update the Glue table
-        # Using a try-except block to handle table updates
         try:
-            glue_client.delete_table(DatabaseName=GLUE_DB_NAME, Name=GLUE_TABLE_NAME)
-            logging.info(f"Deleted existing Glue table '{GLUE_TABLE_NAME}' to update it.")
+            existing = glue_client.get_table(DatabaseName=GLUE_DB_NAME, Name=GLUE_TABLE_NAME)['Table']
         except glue_client.exceptions.EntityNotFoundException:
-            pass # Table didn't exist, which is fine
-
-        glue_client.create_table(
-            DatabaseName=GLUE_DB_NAME,
-            TableInput={
-                'Name': GLUE_TABLE_NAME,
-                'Description': 'Table created via automated fallback process.',
-                'StorageDescriptor': {
-                    'Columns': column_definitions,
-                    'Location': s3_location,
-                    'InputFormat': 'org.apache.hadoop.mapred.TextInputFormat',
-                    'OutputFormat': 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat',
-                    'SerdeInfo': {
-                        'SerializationLibrary': 'org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe',
-                        'Parameters': {'field.delim': ','}
-                    },
-                },
-                'TableType': 'EXTERNAL_TABLE',
-                'Parameters': {
-                    'skip.header.line.count': '1'
-                }
-            }
-        )
-        logging.info(f"Successfully created/updated Glue table: {GLUE_TABLE_NAME}")
+            existing = None
+        if existing and existing.get('PartitionKeys', []) != partition_keys:
+            # Partition keys cannot be changed in place, e.g. on a table from the old CSV fallback
+            glue_client.delete_table(DatabaseName=GLUE_DB_NAME, Name=GLUE_TABLE_NAME)
+            logging.info(f"Deleted Glue table '{GLUE_TABLE_NAME}' to recreate it with partitions.")
+            existing = None
+        if existing is None:
+            glue_client.create_table(DatabaseName=GLUE_DB_NAME, TableInput=table_input)
+            logging.info(f"Created Glue table: {GLUE_TABLE_NAME}")
+        elif (existing['StorageDescriptor'].get('Columns') != column_definitions or
+              existing['StorageDescriptor'].get('Location') != s3_location):
+            glue_client.update_table(DatabaseName=GLUE_DB_NAME, TableInput=table_input)
+            logging.info(f"Updated the schema of Glue table '{GLUE_TABLE_NAME}'.")
+
+        # Partitions that are already registered come back as AlreadyExistsException errors and are left as they are
+        added = 0
+        partition_inputs = [{
+            'Values': [value],
+            'StorageDescriptor': _parquet_storage_descriptor(column_definitions, f"{s3_location}{GLUE_PARTITION_COLUMN}={value}/"),
+        } for value in sorted(partitions)]
+        for start in range(0, len(partition_inputs), GLUE_PARTITION_BATCH_SIZE):
+            batch = partition_inputs[start:start + GLUE_PARTITION_BATCH_SIZE]
+            response = glue_client.batch_create_partition(DatabaseName=GLUE_DB_NAME, TableName=GLUE_TABLE_NAME,
+                                                          PartitionInputList=batch)
+            errors = [e for e in response.get('Errors', []) if e['ErrorDetail'].get('ErrorCode') != 'AlreadyExistsException']
+            for error in errors:
+                logging.warning(f"Could not add partition {error['PartitionValues']}: {error['ErrorDetail'].get('ErrorMessage')}")
+            added += len(batch) - len(response.get('Errors', []))
+        logging.info(f"Successfully created/updated Glue table: {GLUE_TABLE_NAME} ({added} new of {len(partitions)} partitions)")
     except Exception as e:
         logging.error(f"Failed to execute Glue fallback operation: {e}")
 
+def _ensure_watermark_table(engine):
+    """Creates the watermark table if it does not exist yet."""
+    _metadata.create_all(engine, tables=[watermarks], checkfirst=True)
+
+def load_watermark(engine, source):
+    """Returns the stored watermark of a source object as a dict, or None if it was never ingested."""
+    with engine.connect() as conn:
+        row = conn.execute(select(watermarks).where(watermarks.c.source == source)).mappings().first()
+    return dict(row) if row else None
+
+def save_watermark(engine, source, etag, last_modified, max_value, rows_loaded):
+    """Records that a source object has been ingested up to max_value."""
+    with engine.begin() as conn:
+        conn.execute(delete(watermarks).where(watermarks.c.source == source))
+        conn.execute(watermarks.insert().values(
+            source=source, etag=etag, last_modified=last_modified.isoformat() if last_modified else None,
+            max_value=max_value.isoformat() if max_value is not None else None, rows_loaded=rows_loaded,
+            updated_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        ))
+
+def _ingest_object_incremental(key, engine, chunk_rows, replace_first_load=True, staging_name=None, schema=None):
+    """
+    Ingests one S3 object incrementally, using the watermark stored for it.
+
+    An object whose ETag matches the watermark is skipped without being read. Otherwise only rows
+    whose WATERMARK_COLUMN is at or after the previous maximum (minus WATERMARK_LOOKBACK_DAYS) are
+    upserted on UPSERT_KEYS; older rows are assumed not to change. The first load of an object
+    replaces the table if replace_first_load is set, and is upserted like any other load otherwise.
+    The watermark is only advanced after the rows are in, and upserts are idempotent, so an
+    interrupted load is simply repeated.
+
+    Returns:
+        dict: {'status': 'loaded' or 'skipped', 'rows': number of rows written}
+
+    Raises:
+        Exception: If the object cannot be read or loaded.
+    """
+    source = f"s3://{S3_BUCKET}/{key}"
+    loader = RdsBulkLoader(engine, RDS_TABLE_NAME, staging_name=staging_name, schema=schema)
+    head = _s3_client().head_object(Bucket=S3_BUCKET, Key=key)
+    watermark = load_watermark(engine, source)
+    if watermark and watermark['etag'] == head['ETag']:
+        logging.info(f"'{source}' is unchanged since it was last ingested (ETag {head['ETag']}). Skipping it.")
+        return {'status': 'skipped', 'rows': 0}
+    since = None
+    if watermark and watermark['max_value']:
+        since = pd.Timestamp(watermark['max_value']) - pd.Timedelta(days=WATERMARK_LOOKBACK_DAYS)
+        logging.info(f"Upserting rows of '{source}' with {WATERMARK_COLUMN} on or after {since.date()}...")
+    else:
+        logging.info(f"No watermark for '{source}' yet. Loading the whole file.")
+
+    try:
+        total_rows = 0
+        max_value = None
+        for chunk in iter_s3_data(chunk_rows, key, schema):
+            chunk[WATERMARK_COLUMN] = pd.to_datetime(chunk[WATERMARK_COLUMN])
+            total_rows += len(chunk)
+            if len(chunk):
+                chunk_max = chunk[WATERMARK_COLUMN].max()
+                max_value = chunk_max if max_value is None or chunk_max > max_value else max_value
+            if since is not None:
+                chunk = chunk[chunk[WATERMARK_COLUMN] >= since]
+            if len(chunk):
+                loader.load(chunk)
+
+        if since is None and replace_first_load:
+            if loader.rows:
+                loader.commit()
+                loader.ensure_unique_key(UPSERT_KEYS)
+        else:
+            loader.merge(UPSERT_KEYS)
+    except Exception:
+        loader.abort()
+        raise
+    save_watermark(engine, source, head['ETag'], head.get('LastModified'), max_value, loader.rows)
+    logging.info(f"Incremental ingest of '{source}' loaded {loader.rows} of {total_rows} rows.")
+    return {'status': 'loaded', 'rows': loader.rows}
+
+def ingest_incremental(chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Ingests S3_KEY into RDS incrementally, falling back to Glue if loading fails.
+
+    Returns:
+        bool: True if the object was ingested or skipped, False if loading into RDS failed.
+    """
+    engine = _create_rds_engine()
+    schema = load_schema()
+    try:
+        _ensure_watermark_table(engine)
+        _ingest_object_incremental(S3_KEY, engine, chunk_rows, schema=schema)
+        return True
+    except Exception as e:
+        logging.warning(f"Incremental ingest of 's3://{S3_BUCKET}/{S3_KEY}' failed: {e}")
+        fallback_to_glue(iter_s3_data(chunk_rows, schema=schema), schema=schema)
+        return False
+    finally:
+        engine.dispose()
+
+def _load_object(key, loader, chunk_rows, schema=None):
+    """Loads one S3 object into a shared staging table, committing all of its rows or none of them."""
+    rows = 0
+    with loader.transaction() as load:
+        for chunk in iter_s3_data(chunk_rows, key, schema):
+            load(chunk)
+            rows += len(chunk)
+    return {'status': 'loaded', 'rows': rows}
+
+def _with_retries(func, key):
+    """
+    Runs func(key), retrying it on its own with an increasing delay when it fails.
+
+    Returns:
+        dict: The result of func, or {'status': 'failed'}, with 'attempts' and 'error' added.
+    """
+    for attempt in range(1, INGEST_RETRIES + 2):
+        try:
+            return {**func(key), 'attempts': attempt, 'error': None}
+        except Exception as e:
+            if attempt > INGEST_RETRIES:
+                return {'status': 'failed', 'rows': 0, 'attempts': attempt, 'error': str(e) or type(e).__name__}
+            delay = INGEST_RETRY_DELAY * 2 ** (attempt - 1)
+            logging.warning(f"Ingest of '{key}' failed, retrying in {delay} seconds ({attempt}/{INGEST_RETRIES}): {e}")
+            time.sleep(delay)
+
+def ingest_prefix(prefix=S3_PREFIX, chunk_rows=CSV_CHUNK_ROWS, workers=INGEST_WORKERS):
+    """
+    Ingests every CSV object under an S3 prefix, fetching, parsing and loading several at a time.
+
+    All objects share one S3 client, one small pool of database connections and one schema,
+    inferred from the first object.
+    A failed object is retried on its own. In 'replace' mode all objects are loaded into one
+    staging table that replaces the table only if every object succeeded. In 'incremental' mode
+    each object is upserted and watermarked separately, so objects that failed, and only those,
+    are picked up again by the next run. If the table does not exist yet, the first object
+    creates it, and the others are not attempted when that fails.
+
+    Returns:
+        dict: Per-object results by key, each with 'status' ('loaded', 'skipped' or 'failed'),
+            'rows', 'attempts' and 'error'.
+    """
+    try:
+        keys = list_s3_keys(prefix)
+    except Exception as e:
+        logging.error(f"Failed to list objects under 's3://{S3_BUCKET}/{prefix}': {e}")
+        return {}
+    if not keys:
+        logging.warning(f"No '{S3_SUFFIX}' objects found under 's3://{S3_BUCKET}/{prefix}'.")
+        return {}
+    logging.info(f"Ingesting {len(keys)} objects under 's3://{S3_BUCKET}/{prefix}' with {workers} worker(s)...")
+    start_time = time.perf_counter()
+    schema = load_schema(keys[0], prefix)
+    # One connection more than workers, so the staging table can be created while every worker holds a transaction
+    engine = _create_rds_engine(pool_size=workers + 1)
+    results = {}
+    loader = None
+    try:
+        if INGEST_MODE == 'incremental':
+            _ensure_watermark_table(engine)
+            if inspect(engine).has_table(RDS_TABLE_NAME):
+                RdsBulkLoader(engine, RDS_TABLE_NAME).ensure_unique_key(UPSERT_KEYS)
+            else:
+                # The first object creates the table; the others can then be upserted into it in parallel
+                first, keys = keys[0], keys[1:]
+                results[first] = _with_retries(functools.partial(
+                    _ingest_object_incremental, engine=engine, chunk_rows=chunk_rows, schema=schema), first)
+                if results[first]['status'] == 'failed':
+                    # Without the table every other object would fail too, for a reason unrelated to its data
+                    logging.error(f"Ingest of '{first}' failed after {results[first]['attempts']} attempt(s), so RDS table "
+                                  f"'{RDS_TABLE_NAME}' could not be created: {results[first]['error']}. "
+                                  f"The other {len(keys)} object(s) are left for the next run.")
+                    for key in keys:
+                        results[key] = {'status': 'failed', 'rows': 0, 'attempts': 0,
+                                        'error': f"Not attempted, as '{first}' could not create the table."}
+                    keys = []
+
+            def task(key):
+                # Each object gets its own staging table, so parallel upserts do not see each other's rows
+                staging_name = f"{RDS_TABLE_NAME}{STAGING_SUFFIX}_{hashlib.sha1(key.encode()).hexdigest()[:10]}"
+                return _ingest_object_incremental(key, engine, chunk_rows, replace_first_load=False,
+                                                  staging_name=staging_name, schema=schema)
+        else:
+            loader = RdsBulkLoader(engine, RDS_TABLE_NAME, schema=schema)
+            task = functools.partial(_load_object, loader=loader, chunk_rows=chunk_rows, schema=schema)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest') as pool:
+            futures = {pool.submit(_with_retries, task, key): key for key in keys}
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key] = result = future.result()
+                if result['status'] == 'failed':
+                    logging.error(f"Ingest of '{key}' failed after {result['attempts']} attempt(s): {result['error']}")
+
+        failed = sorted(key for key, result in results.items() if result['status'] == 'failed')
+        if loader:
+            if failed:
+                loader.abort()
+                logging.error(f"RDS table '{RDS_TABLE_NAME}' was left unchanged because {len(failed)} object(s) failed.")
+            else:
+                loader.commit()
+    except Exception as e:
+        logging.error(f"Ingest of 's3://{S3_BUCKET}/{prefix}' failed: {e}")
+        if loader:
+            loader.abort()
+        for key in keys:
+            results.setdefault(key, {'status': 'failed', 'rows': 0, 'attempts': 0, 'error': str(e)})
+    finally:
+        engine.dispose()
+
+    counts = {status: sum(1 for r in results.values() if r['status'] == status) for status in ('loaded', 'skipped', 'failed')}
+    rows = sum(r['rows'] for r in results.values())
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"Ingested 's3://{S3_BUCKET}/{prefix}' in {elapsed:.2f} s: {counts['loaded']} loaded, "
+                 f"{counts['skipped']} skipped, {counts['failed']} failed, {rows} rows "
+                 f"({rows / elapsed if elapsed else 0:.0f} rows/s).")
+    return results
+
+def stream_to_rds(chunk_rows):
+    """
+    Streams the CSV from S3 into RDS chunk by chunk, falling back to Glue if RDS fails.
+
+    Each chunk is written to the staging table as soon as it is parsed, so only one chunk is held
+    in memory at a time. The table is replaced once the whole file has been loaded.
+    """
+    engine = _create_rds_engine()
+    schema = load_schema()
+    loader = RdsBulkLoader(engine, RDS_TABLE_NAME, schema=schema)
+    loaded = False
+    chunks = iter_s3_data(chunk_rows, schema=schema)
+    try:
+        while True:
+            try:
+                chunk = next(chunks, None)
+            except Exception as e:
+                logging.error(f"Failed to stream data from S3 after {loader.rows} rows: {e}")
+                loader.abort()
+                return
+            if chunk is None:
+                break
+            loaded = True
+            loader.load(chunk)
+        if not loaded:
+            logging.warning(f"'{S3_KEY}' contains no rows. RDS table '{RDS_TABLE_NAME}' was left unchanged.")
+            return
+        loader.commit()
+    except Exception as e:
+        logging.warning(f"Failed to push data to RDS after {loader.rows} rows. This could be due to an unavailable DB or wrong credentials.")
+        logging.warning(f"Error details: {e}")
+        loader.abort()
+        if loaded:
+            # The chunks already loaded are gone, so the file is streamed again for Glue
+            fallback_to_glue(iter_s3_data(chunk_rows, schema=schema), schema=schema)
+        return
+    finally:
+        chunks.close()
+        engine.dispose()
+    logging.info(f"Streamed {loader.rows} rows from S3 to RDS table '{RDS_TABLE_NAME}'.")
+
 if __name__ == "__main__":
-    dataframe = get_s3_data()
-    
-    if dataframe is not None:
-        # Try to push to RDS first
-        if not push_to_rds(dataframe):
-            # If RDS push fails, execute the fallback to Glue
-            fallback_to_glue(dataframe)
+    if S3_PREFIX:
+        results = ingest_prefix()
+        if results and all(r['status'] == 'failed' for r in results.values()):
+            # Nothing could be loaded into RDS, so make the data queryable through Glue instead
+            schema = load_schema(next(iter(results)), S3_PREFIX)
+            chunks = itertools.chain.from_iterable(iter_s3_data(CSV_CHUNK_ROWS, key, schema) for key in results)
+            fallback_to_glue(chunks, f"s3://{S3_BUCKET}/{S3_PREFIX}", schema)
+    elif INGEST_MODE == 'incremental':
+        ingest_incremental()
+    elif CSV_CHUNK_ROWS > 0:
+        stream_to_rds(CSV_CHUNK_ROWS)
+    else:
+        schema = load_schema()
+        dataframe = get_s3_data(schema)
+        
+        if dataframe is not None:
+            # Try to push to RDS first
+            if not push_to_rds(dataframe, schema=schema):
+                # If RDS push fails, execute the fallback to Glue
+                fallback_to_glue(dataframe, schema=schema)
 
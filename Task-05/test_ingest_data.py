@@ -0,0 +1,262 @@
+import os
+import io
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import boto3
+import pandas as pd
+from moto import mock_aws
+from sqlalchemy import create_engine
+
+import ingest_data
+
+BUCKET = 'test-sales'
+TABLE = 'product_sales'
+PRODUCTS = ["Laptop", "Smartphone", "Coffee Maker", "Desk Chair", "Headphones"]
+
+def sales_csv(days, start_day=1, price=10.0):
+    """Returns product_sales.csv-shaped data with one row per product and day of July 2025."""
+    lines = ["ProductID,ProductName,Category,Price,UnitsSold,SaleDate"]
+    for day in range(start_day, start_day + days):
+        for product_id, name in enumerate(PRODUCTS, start=101):
+            lines.append(f"{product_id},{name},Electronics,{price:.2f},{day},2025-07-{day:02d}")
+    return ("\n".join(lines) + "\n").encode()
+
+class IngestTestCase(unittest.TestCase):
+    """Runs ingest_data against moto's S3 and a SQLite database standing in for RDS."""
+
+    settings = {}
+
+    def setUp(self):
+        self.aws = mock_aws()
+        self.aws.start()
+        self.addCleanup(self.aws.stop)
+        ingest_data._s3_client.cache_clear()
+        self.addCleanup(ingest_data._s3_client.cache_clear)
+        schemas = mock.patch.dict(ingest_data._schemas, clear=True)
+        schemas.start()
+        self.addCleanup(schemas.stop)
+        self.s3 = boto3.client('s3')
+        self.s3.create_bucket(Bucket=BUCKET)
+
+        self.work_dir = tempfile.mkdtemp(prefix="test_ingest_")
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        db_url = f"sqlite:///{self.work_dir}/sales.db"
+        settings = {'S3_BUCKET': BUCKET, 'S3_KEY': 'sales.csv', 'RDS_URL': db_url, 'RDS_TABLE_NAME': TABLE,
+                    'INGEST_RETRY_DELAY': 0, **self.settings}
+        patcher = mock.patch.multiple(ingest_data, **settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.engine = create_engine(db_url)
+        self.addCleanup(self.engine.dispose)
+
+    def put(self, key, data):
+        self.s3.put_object(Bucket=BUCKET, Key=key, Body=data)
+
+    def table(self):
+        """Returns the RDS table ordered by its upsert key."""
+        return pd.read_sql_table(TABLE, self.engine).sort_values(['SaleDate', 'ProductID']).reset_index(drop=True)
+
+class IterS3DataTest(IngestTestCase):
+    """The CSV is streamed from S3 in chunks of bounded size."""
+
+    def test_chunks_have_at_most_chunk_rows(self):
+        self.put('sales.csv', sales_csv(5))
+        chunks = list(ingest_data.iter_s3_data(10))
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), pd.read_csv(io.BytesIO(sales_csv(5))))
+
+    def test_zero_chunk_rows_yields_the_whole_file(self):
+        self.put('sales.csv', sales_csv(5))
+        self.assertEqual([len(chunk) for chunk in ingest_data.iter_s3_data(0)], [25])
+
+    def test_small_reads_do_not_split_rows(self):
+        self.put('other.csv', sales_csv(20))
+        with mock.patch.object(ingest_data, 'S3_READ_SIZE', 100):
+            chunks = list(ingest_data.iter_s3_data(7, key='other.csv'))
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), pd.read_csv(io.BytesIO(sales_csv(20))))
+
+    def test_chunks_get_the_schema_types(self):
+        self.put('sales.csv', sales_csv(3))
+        schema = ingest_data.infer_schema(pd.read_csv(io.BytesIO(sales_csv(3))))
+        chunk = next(ingest_data.iter_s3_data(4, schema=schema))
+        self.assertEqual(str(chunk['ProductID'].dtype), 'Int32')
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(chunk['SaleDate']))
+
+    def test_missing_object_raises(self):
+        with self.assertRaises(self.s3.exceptions.NoSuchKey):
+            list(ingest_data.iter_s3_data(10, key='missing.csv'))
+
+class LoadSchemaTest(IngestTestCase):
+    """Schemas are inferred once per run, and cached in S3 only where asked to."""
+
+    def test_schema_is_inferred_once(self):
+        self.put('sales.csv', sales_csv(3))
+        schema = ingest_data.load_schema()
+        self.assertEqual(schema['columns']['SaleDate'], 'date')
+        with mock.patch.object(ingest_data, '_open_s3_object', side_effect=AssertionError("sampled again")):
+            self.assertIs(ingest_data.load_schema(), schema)
+
+    def test_failure_is_not_remembered(self):
+        self.assertIsNone(ingest_data.load_schema())
+        self.put('sales.csv', sales_csv(3))
+        self.assertIsNotNone(ingest_data.load_schema())
+
+    def test_nothing_is_written_to_the_source_bucket(self):
+        self.put('sales.csv', sales_csv(3))
+        ingest_data.load_schema()
+        self.assertEqual([obj['Key'] for obj in self.s3.list_objects_v2(Bucket=BUCKET)['Contents']], ['sales.csv'])
+
+    @mock.patch.object(ingest_data, 'SCHEMA_CACHE_BUCKET', 'schema-cache')
+    def test_cache_bucket_is_used_by_later_runs(self):
+        self.s3.create_bucket(Bucket='schema-cache')
+        self.put('sales.csv', sales_csv(3))
+        schema = ingest_data.load_schema()
+        self.s3.head_object(Bucket='schema-cache', Key='_schemas/sales.csv.json')
+        ingest_data._schemas.clear() # A later run
+        with mock.patch.object(ingest_data, '_open_s3_object', side_effect=AssertionError("sampled again")):
+            self.assertEqual(ingest_data.load_schema(), schema)
+
+class WatermarkTest(IngestTestCase):
+    """Incremental ingestion skips unchanged objects and upserts only rows from the watermark on."""
+
+    settings = {'INGEST_MODE': 'incremental', 'UPSERT_KEYS': ['ProductID', 'SaleDate']}
+
+    def ingest(self):
+        engine = ingest_data._create_rds_engine()
+        self.addCleanup(engine.dispose)
+        ingest_data._ensure_watermark_table(engine)
+        return ingest_data._ingest_object_incremental('sales.csv', engine, 4)
+
+    def test_first_load_creates_the_table(self):
+        self.put('sales.csv', sales_csv(3))
+        self.assertEqual(self.ingest(), {'status': 'loaded', 'rows': 15})
+        self.assertEqual(len(self.table()), 15)
+        engine = ingest_data._create_rds_engine()
+        self.addCleanup(engine.dispose)
+        watermark = ingest_data.load_watermark(engine, f"s3://{BUCKET}/sales.csv")
+        self.assertEqual(watermark['max_value'][:10], "2025-07-03")
+        self.assertEqual(watermark['rows_loaded'], 15)
+
+    def test_unchanged_object_is_skipped(self):
+        self.put('sales.csv', sales_csv(3))
+        self.ingest()
+        with mock.patch.object(ingest_data, 'iter_s3_data', side_effect=AssertionError("object read again")):
+            self.assertEqual(self.ingest(), {'status': 'skipped', 'rows': 0})
+
+    def test_only_rows_from_the_watermark_on_are_upserted(self):
+        self.put('sales.csv', sales_csv(3, price=10))
+        self.ingest()
+        # Days 1 to 3 again with new prices, and days 4 and 5
+        self.put('sales.csv', sales_csv(5, price=20))
+        self.assertEqual(self.ingest(), {'status': 'loaded', 'rows': 15})
+        table = self.table()
+        self.assertEqual(len(table), 25)
+        prices = table.groupby(table['SaleDate'].astype(str).str[:10])['Price'].unique().map(list).to_dict()
+        self.assertEqual(prices, {'2025-07-01': [10.0], '2025-07-02': [10.0], '2025-07-03': [20.0],
+                                  '2025-07-04': [20.0], '2025-07-05': [20.0]})
+
+    def test_lookback_upserts_earlier_days(self):
+        self.put('sales.csv', sales_csv(3, price=10))
+        self.ingest()
+        self.put('sales.csv', sales_csv(3, price=20))
+        with mock.patch.object(ingest_data, 'WATERMARK_LOOKBACK_DAYS', 1):
+            self.assertEqual(self.ingest(), {'status': 'loaded', 'rows': 10})
+        self.assertEqual(sorted(self.table()['Price'].unique()), [10.0, 20.0])
+        self.assertEqual(len(self.table()), 15)
+
+class KeyColumnTypeTest(IngestTestCase):
+    """Text key columns are created as VARCHARs, as MySQL cannot put a unique key on TEXT."""
+
+    settings = {'INGEST_MODE': 'incremental', 'UPSERT_KEYS': ['ProductName', 'SaleDate']}
+
+    def column_types(self):
+        return {c['name']: str(c['type']) for c in ingest_data.inspect(self.engine).get_columns(TABLE)}
+
+    def test_key_column_is_sized_from_the_sample(self):
+        self.put('sales.csv', sales_csv(3))
+        self.assertTrue(ingest_data.ingest_incremental(4))
+        types = self.column_types()
+        self.assertEqual(types['ProductName'], f"VARCHAR({ingest_data.KEY_STRING_MIN_LENGTH})")
+        self.assertEqual(types['Category'], "TEXT")
+
+    @mock.patch.object(ingest_data, 'SCHEMA_SAMPLE_ROWS', 0)
+    def test_key_column_without_schema(self):
+        self.put('sales.csv', sales_csv(3).replace(b"Laptop", b"Laptop" * 20))
+        self.assertTrue(ingest_data.ingest_incremental(4))
+        self.assertEqual(self.column_types()['ProductName'], "VARCHAR(240)")
+
+    def test_mysql_key_columns_are_not_text(self):
+        from sqlalchemy.dialects import mysql
+        from sqlalchemy.schema import CreateTable
+        schema = ingest_data.infer_schema(pd.read_csv(io.BytesIO(sales_csv(3))))
+        table = ingest_data.Table('t', ingest_data.MetaData(),
+                                  *(ingest_data.Column(col, ingest_data._sql_type(col, schema)) for col in schema['columns']))
+        ddl = str(CreateTable(table).compile(dialect=mysql.dialect()))
+        self.assertIn("`ProductName` VARCHAR(64)", ddl)
+        self.assertIn("`Category` TEXT", ddl)
+
+class IngestPrefixTest(IngestTestCase):
+    """Every CSV object under a prefix is ingested, several at a time."""
+
+    def setUp(self):
+        super().setUp()
+        for i, key in enumerate(['parts/a.csv', 'parts/b.csv', 'parts/c.csv']):
+            self.put(key, sales_csv(2, start_day=1 + 2 * i))
+        self.put('parts/README.txt', b"not a CSV")
+
+    def ingest(self):
+        return ingest_data.ingest_prefix('parts/', chunk_rows=4, workers=2)
+
+    def fail_reading(self, failing_key):
+        """Makes every read of failing_key fail."""
+        read = ingest_data.iter_s3_data
+        def iter_s3_data(chunk_rows, key=None, schema=None):
+            if key == failing_key:
+                raise OSError("connection reset")
+            return read(chunk_rows, key, schema)
+        patcher = mock.patch.object(ingest_data, 'iter_s3_data', iter_s3_data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replace_loads_every_object(self):
+        results = self.ingest()
+        self.assertEqual(sorted(results), ['parts/a.csv', 'parts/b.csv', 'parts/c.csv'])
+        self.assertEqual({r['status'] for r in results.values()}, {'loaded'})
+        self.assertEqual(len(self.table()), 30)
+
+    def test_replace_keeps_the_table_when_an_object_fails(self):
+        self.ingest()
+        self.put('parts/d.csv', sales_csv(1, start_day=20))
+        self.fail_reading('parts/b.csv')
+        results = self.ingest()
+        self.assertEqual(results['parts/b.csv']['status'], 'failed')
+        self.assertEqual(results['parts/b.csv']['attempts'], ingest_data.INGEST_RETRIES + 1)
+        self.assertEqual(len(self.table()), 30)
+
+    @mock.patch.multiple(ingest_data, INGEST_MODE='incremental', UPSERT_KEYS=['ProductID', 'SaleDate'])
+    def test_incremental_skips_ingested_objects(self):
+        self.assertEqual({r['status'] for r in self.ingest().values()}, {'loaded'})
+        self.put('parts/d.csv', sales_csv(1, start_day=20))
+        results = self.ingest()
+        self.assertEqual({key: r['status'] for key, r in results.items()},
+                         {'parts/a.csv': 'skipped', 'parts/b.csv': 'skipped', 'parts/c.csv': 'skipped', 'parts/d.csv': 'loaded'})
+        self.assertEqual(len(self.table()), 35)
+
+    @mock.patch.multiple(ingest_data, INGEST_MODE='incremental', UPSERT_KEYS=['ProductID', 'SaleDate'])
+    def test_incremental_stops_when_the_first_object_cannot_create_the_table(self):
+        self.fail_reading('parts/a.csv')
+        results = self.ingest()
+        self.assertEqual(results['parts/a.csv']['attempts'], ingest_data.INGEST_RETRIES + 1)
+        self.assertEqual({key: (r['status'], r['attempts']) for key, r in results.items() if key != 'parts/a.csv'},
+                         {'parts/b.csv': ('failed', 0), 'parts/c.csv': ('failed', 0)})
+        self.assertFalse(ingest_data.inspect(self.engine).has_table(TABLE))
+
+if __name__ == "__main__":
+    unittest.main()